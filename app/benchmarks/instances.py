@@ -0,0 +1,155 @@
+import glob
+import json
+import math
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.fleet_sizing import estimate_min_fleet
+from app.services.matrix_cache import CACHE_DIR, load_matrix
+from app.services.travel_time_estimator import SpeedModel, estimate_distance_matrix
+
+# multi_vrp_solver ile aynı varsayılanlar
+WORK_START = 8 * 3600
+WORK_END = 17 * 3600
+SERVICE_TIME_PER_DESI = 2
+VEHICLE_CAPACITY = 15000
+
+# İstanbul Avrupa yakası, Esenyurt deposu civarı
+CENTER_LAT, CENTER_LON = 41.040641, 28.660911
+RADIUS_DEG = 0.08
+
+SYNTHETIC_SIZES = [50, 200, 1000, 5000]
+
+
+def _vehicle_count(matrix, service_times, demands) -> int:
+    lower_bound = estimate_min_fleet(matrix, service_times, demands, VEHICLE_CAPACITY, WORK_END - WORK_START)
+    return int(math.ceil(lower_bound * 1.5)) + 1
+
+
+def _demands_and_windows(rng: np.random.Generator, size: int, window_share: float):
+    demands = np.rint(rng.lognormal(mean=4.5, sigma=0.8, size=size)).clip(1, 2000)
+    demands[0] = 0
+    service_times = (demands * SERVICE_TIME_PER_DESI).astype(np.int64)
+
+    time_windows = np.tile([WORK_START, WORK_END], (size, 1))
+    # Durakların bir kısmı 2 saatlik pencere ister
+    narrow = np.flatnonzero(rng.random(size) < window_share)
+    narrow = narrow[narrow != 0]
+    starts = rng.integers(WORK_START, WORK_END - 2 * 3600, size=narrow.size)
+    time_windows[narrow, 0] = starts
+    time_windows[narrow, 1] = starts + 2 * 3600
+    return demands, service_times, time_windows
+
+
+def _scatter_locations(rng: np.random.Generator, size: int) -> List[str]:
+    radius = RADIUS_DEG * np.sqrt(rng.random(size))
+    angle = rng.random(size) * 2 * np.pi
+    lats = CENTER_LAT + radius * np.sin(angle)
+    lons = CENTER_LON + radius * np.cos(angle) / np.cos(np.radians(CENTER_LAT))
+    lats[0], lons[0] = CENTER_LAT, CENTER_LON
+    return [f"{lat:.6f},{lon:.6f}" for lat, lon in zip(lats, lons)]
+
+
+def synthetic_locations(size: int, seed: int = 0) -> List[str]:
+    """Locations of `synthetic_instance(size, seed)` without building its matrix."""
+    return _scatter_locations(np.random.default_rng(seed), size)
+
+
+def synthetic_instance(size: int, seed: int = 0, window_share: float = 0.3) -> Dict:
+    """
+    Generates a reproducible instance of `size` nodes (depot included).
+
+    Stops are scattered uniformly in a disc around the Esenyurt depot and the
+    matrix comes from the offline estimator with the default (uncalibrated)
+    speed model, so the instance depends only on `size` and `seed`.
+
+    Args:
+        size (int): Number of nodes including the depot.
+        seed (int): Random seed.
+        window_share (float): Share of stops with a 2-hour time window.
+
+    Returns:
+        Dict: Solver inputs plus "name" and "locations".
+    """
+    rng = np.random.default_rng(seed)
+    locations = _scatter_locations(rng, size)
+    matrix = estimate_distance_matrix(locations, SpeedModel())
+    demands, service_times, time_windows = _demands_and_windows(rng, size, window_share)
+
+    return {
+        "name": f"synthetic-{size}-s{seed}",
+        "locations": locations,
+        "distance_matrix": matrix,
+        "service_times": service_times.tolist(),
+        "order_demands": demands.tolist(),
+        "time_windows": time_windows.tolist(),
+        "vehicle_count": _vehicle_count(matrix, service_times, demands),
+        "vehicle_capacity": VEHICLE_CAPACITY,
+        "depot_index": 0,
+    }
+
+
+def cached_branches(cache_dir: str = CACHE_DIR) -> List[str]:
+    """Names of branches with a cached real matrix (binary or legacy JSON)."""
+    names = set()
+    for pattern in ("*_distance_matrix.npy", "*_distance_matrix.json"):
+        for path in glob.glob(os.path.join(cache_dir, pattern)):
+            names.add(os.path.basename(path).split("_distance_matrix")[0])
+    return sorted(names)
+
+
+def cached_instance(branch_name: str, seed: int = 0, cache_dir: str = CACHE_DIR) -> Dict:
+    """
+    Builds an instance on a real cached Istanbul matrix.
+
+    The cache stores travel times only, so demands and time windows are
+    generated from `seed` exactly as for synthetic instances.
+
+    Args:
+        branch_name (str): Branch whose cached matrix is used.
+        seed (int): Random seed for demands and windows.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Dict: Solver inputs plus "name".
+    """
+    try:
+        matrix, _ = load_matrix(branch_name, cache_dir)
+    except FileNotFoundError:
+        with open(os.path.join(cache_dir, f"{branch_name}_distance_matrix.json"), "r") as f:
+            matrix = np.asarray(json.load(f), dtype=np.int32)
+
+    size = len(matrix)
+    rng = np.random.default_rng(seed)
+    demands, service_times, time_windows = _demands_and_windows(rng, size, window_share=0.0)
+
+    return {
+        "name": f"cached-{branch_name}",
+        "distance_matrix": np.ascontiguousarray(matrix),
+        "service_times": service_times.tolist(),
+        "order_demands": demands.tolist(),
+        "time_windows": time_windows.tolist(),
+        "vehicle_count": _vehicle_count(matrix, service_times, demands),
+        "vehicle_capacity": VEHICLE_CAPACITY,
+        "depot_index": 0,
+    }
+
+
+def make_instance(spec: Dict) -> Dict:
+    """
+    Builds an instance from a small picklable spec.
+
+    Args:
+        spec (Dict): {"kind": "synthetic", "size": int, "seed": int} or
+            {"kind": "cached", "branch": str, "seed": int}.
+
+    Returns:
+        Dict: Solver inputs plus "name".
+    """
+    if spec["kind"] == "synthetic":
+        return synthetic_instance(spec["size"], spec.get("seed", 0))
+    if spec["kind"] == "cached":
+        return cached_instance(spec["branch"], spec.get("seed", 0))
+    raise ValueError(f"Unknown instance kind: {spec['kind']}")
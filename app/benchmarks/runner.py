@@ -0,0 +1,403 @@
+"""
+Reproducible solver benchmarks.
+
+Runs every (instance, solver, first-solution strategy, metaheuristic)
+combination in a fresh process and writes a JSON report:
+
+    python -m app.benchmarks.runner --sizes 50 200 --cached --time-limit 10 -o bench.json
+    python -m app.benchmarks.runner --compare baseline.json bench.json
+
+The report also times the offline travel-time estimate on synthetic
+locations (`--estimate-sizes`) against its 5,000-node target.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.benchmarks.instances import SYNTHETIC_SIZES, cached_branches, make_instance, synthetic_locations
+
+SOLVERS = ["time_windows", "basic", "simple"]
+DEFAULT_STRATEGIES = ["PATH_CHEAPEST_ARC", "SAVINGS", "PARALLEL_CHEAPEST_INSERTION"]
+DEFAULT_METAHEURISTICS = ["AUTOMATIC", "GUIDED_LOCAL_SEARCH"]
+
+# Çevrimdışı tahmin hedefi: 5000×5000 matris 1 saniyenin altında
+ESTIMATE_TARGET_SIZE = 5000
+ESTIMATE_TARGET_SECONDS = 1.0
+ESTIMATE_REPEATS = 3
+
+# Süre ölçümleri gürültülü: daha geniş bağıl pay ve mutlak alt sınır
+TIME_TOLERANCE = 0.25
+TIME_NOISE_SECONDS = 0.05
+TIME_METRICS = ("build_seconds", "first_solution_seconds", "solve_seconds")
+
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS: bytes
+
+
+def _run_time_windows(instance: Dict, strategy: str, metaheuristic: str, time_limit: int) -> Dict:
+    from app.services.vrp_solver import build_time_window_model, make_search_parameters
+
+    start = time.perf_counter()
+    manager, routing, _ = build_time_window_model(
+        instance["distance_matrix"], instance["service_times"], instance["vehicle_count"],
+        instance["vehicle_capacity"], instance["order_demands"], instance["depot_index"],
+        instance["time_windows"]
+    )
+    build_seconds = time.perf_counter() - start
+
+    trace = []
+    solve_start = time.perf_counter()
+    routing.AddAtSolutionCallback(
+        lambda: trace.append([round(time.perf_counter() - solve_start, 4), routing.CostVar().Value()])
+    )
+    solution = routing.SolveWithParameters(make_search_parameters(strategy, metaheuristic, time_limit))
+    solve_seconds = time.perf_counter() - solve_start
+
+    result = {
+        "status": "OK" if solution else "No solution found",
+        "build_seconds": round(build_seconds, 4),
+        "solve_seconds": round(solve_seconds, 4),
+        "first_solution_seconds": trace[0][0] if trace else None,
+        "objective_trace": trace,
+    }
+    if solution:
+        result["objective"] = solution.ObjectiveValue()
+        result["vehicles_used"] = sum(
+            not routing.IsEnd(solution.Value(routing.NextVar(routing.Start(v))))
+            for v in range(instance["vehicle_count"])
+        )
+        result.update(_evaluate(instance, _solution_routes(routing, manager, solution, instance["vehicle_count"])))
+    return result
+
+
+def _solution_routes(routing, manager, solution, vehicle_count: int) -> List[List[int]]:
+    routes = []
+    for v in range(vehicle_count):
+        route, index = [], solution.Value(routing.NextVar(routing.Start(v)))
+        while not routing.IsEnd(index):
+            route.append(manager.IndexToNode(index))
+            index = solution.Value(routing.NextVar(index))
+        routes.append(route)
+    return routes
+
+
+def _evaluate(instance: Dict, routes: List[List[int]]) -> Dict:
+    # Çözücüden bağımsız puanlama: tüm çözücüler aynı ölçütlerle karşılaştırılır
+    from app.services.route_evaluator import evaluate_plan
+
+    totals, _ = evaluate_plan(
+        routes, instance["distance_matrix"], instance["order_demands"], instance["service_times"],
+        instance["time_windows"], instance["vehicle_capacity"], depot_index=instance["depot_index"],
+    )
+    return {
+        "travel_time": totals["travel_time"],
+        "idle_time": totals["idle_time"],
+        "feasible": totals["feasible"],
+        "violations": {key: totals[key] for key in (
+            "capacity_excess", "late_stops", "missing", "duplicates"
+        ) if totals[key]},
+    }
+
+
+def _run_basic(instance: Dict) -> Dict:
+    from app.services.vrp_solver import solve_vrp
+
+    start = time.perf_counter()
+    routes = solve_vrp(instance["distance_matrix"], instance["vehicle_count"], instance["depot_index"])
+    return {
+        "status": "OK" if routes else "No solution found",
+        "solve_seconds": round(time.perf_counter() - start, 4),
+        "vehicles_used": sum(len(route) > 2 for route in routes),
+        **(_evaluate(instance, routes) if routes else {}),
+    }
+
+
+def _run_simple(instance: Dict) -> Dict:
+    from app.services.simple_vrp import solve_simple_vrp
+
+    start = time.perf_counter()
+    result = solve_simple_vrp(
+        instance["distance_matrix"], instance["order_demands"], instance["vehicle_count"],
+        instance["vehicle_capacity"], instance["depot_index"]
+    )
+    routes = result.get("routes", [])
+    return {
+        "status": result["status"],
+        "solve_seconds": round(time.perf_counter() - start, 4),
+        "vehicles_used": sum(len(route) > 2 for route in routes),
+        **(_evaluate(instance, routes) if routes else {}),
+    }
+
+
+def run_case(case: Dict) -> Dict:
+    """
+    Runs one benchmark case; meant to be executed in its own process so that
+    peak RSS belongs to this case alone.
+
+    Args:
+        case (Dict): {"instance": spec, "solver": str, "strategy": str,
+            "metaheuristic": str, "time_limit": int}.
+
+    Returns:
+        Dict: The case merged with its measurements.
+    """
+    start = time.perf_counter()
+    instance = make_instance(case["instance"])
+    instance_seconds = time.perf_counter() - start
+
+    try:
+        if case["solver"] == "time_windows":
+            metrics = _run_time_windows(instance, case["strategy"], case["metaheuristic"], case["time_limit"])
+        elif case["solver"] == "basic":
+            metrics = _run_basic(instance)
+        elif case["solver"] == "simple":
+            metrics = _run_simple(instance)
+        else:
+            raise ValueError(f"Unknown solver: {case['solver']}")
+    except Exception as e:
+        metrics = {"status": "Error", "error": str(e)}
+
+    return {
+        **case,
+        "instance_name": instance["name"],
+        "nodes": len(instance["distance_matrix"]),
+        "vehicle_count": instance["vehicle_count"],
+        "instance_seconds": round(instance_seconds, 4),
+        **metrics,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def run_estimate(size: int, seed: int = 0, repeats: int = ESTIMATE_REPEATS) -> Dict:
+    """
+    Times `estimate_distance_matrix` on `size` synthetic locations.
+
+    The default speed model is passed explicitly so calibration I/O is not
+    timed. The target scales with the element count from
+    ESTIMATE_TARGET_SECONDS at ESTIMATE_TARGET_SIZE and is checked against
+    the first (cold) call, which is what a one-shot solve pays.
+
+    Args:
+        size (int): Number of locations.
+        seed (int): Random seed for the locations.
+        repeats (int): Number of timed calls.
+
+    Returns:
+        Dict: Cold and median seconds, the target and whether it was met.
+    """
+    from app.services.travel_time_estimator import SpeedModel, estimate_distance_matrix
+
+    locations = synthetic_locations(size, seed)
+    model = SpeedModel()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        estimate_distance_matrix(locations, model)
+        timings.append(time.perf_counter() - start)
+
+    target = ESTIMATE_TARGET_SECONDS * (size / ESTIMATE_TARGET_SIZE) ** 2
+    return {
+        "size": size,
+        "first_seconds": round(timings[0], 4),
+        "median_seconds": round(statistics.median(timings), 4),
+        "target_seconds": round(target, 4),
+        "within_target": timings[0] <= target,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def build_cases(
+    instance_specs: List[Dict],
+    solvers: List[str],
+    strategies: List[str],
+    metaheuristics: List[str],
+    time_limit: int,
+) -> List[Dict]:
+    """Expands the benchmark grid; strategy options only apply to "time_windows"."""
+    cases = []
+    for spec, solver in itertools.product(instance_specs, solvers):
+        if solver == "time_windows":
+            for strategy, metaheuristic in itertools.product(strategies, metaheuristics):
+                cases.append({"instance": spec, "solver": solver, "strategy": strategy,
+                              "metaheuristic": metaheuristic, "time_limit": time_limit})
+        else:
+            cases.append({"instance": spec, "solver": solver, "strategy": None,
+                          "metaheuristic": None, "time_limit": None})
+    return cases
+
+
+def run_benchmarks(
+    cases: List[Dict],
+    output_path: Optional[str] = None,
+    estimate_sizes: Optional[List[int]] = None,
+    seed: int = 0,
+) -> Dict:
+    """
+    Runs every case in a fresh spawned process and writes the JSON report.
+
+    Args:
+        cases (List[Dict]): Cases from `build_cases`.
+        output_path (Optional[str]): Where to write the report.
+        estimate_sizes (Optional[List[int]]): Sizes for `run_estimate`.
+        seed (int): Random seed for the estimate locations.
+
+    Returns:
+        Dict: The report ({"meta": ..., "results": [...], "estimate": [...]}).
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for i, case in enumerate(cases, start=1):
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            result = pool.apply(run_case, (case,))
+        results.append(result)
+        print(f"[{i}/{len(cases)}] {result['instance_name']} {case['solver']} "
+              f"{case['strategy'] or ''} {case['metaheuristic'] or ''}: {result['status']} "
+              f"obj={result.get('objective')} t={result.get('solve_seconds')}s")
+
+    estimates = []
+    for size in estimate_sizes or []:
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            estimate = pool.apply(run_estimate, (size, seed))
+        estimates.append(estimate)
+        print(f"[estimate] {size}x{size}: first={estimate['first_seconds']}s "
+              f"median={estimate['median_seconds']}s target={estimate['target_seconds']}s "
+              f"{'OK' if estimate['within_target'] else 'MISSED'}")
+
+    report = {"meta": _report_meta(), "results": results, "estimate": estimates}
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def _report_meta() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    try:
+        import ortools
+        ortools_version = ortools.__version__
+    except ImportError:
+        ortools_version = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "ortools": ortools_version,
+        "machine": platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+    }
+
+
+def _case_key(result: Dict):
+    return (result["instance_name"], result["solver"], result["strategy"], result["metaheuristic"])
+
+
+def compare_reports(
+    baseline: Dict, current: Dict, tolerance: float = 0.05, time_tolerance: float = TIME_TOLERANCE
+) -> List[str]:
+    """
+    Lists regressions of `current` against `baseline`.
+
+    A case regresses when it lost its solution, its routes stopped passing
+    the route evaluator's checks, its objective or peak RSS grew by more
+    than `tolerance`, or its model-build, first-solution or solve time grew
+    by more than `time_tolerance` (relative) and TIME_NOISE_SECONDS. The
+    time-windows solver searches until its time limit, so its solve time is
+    not compared. Offline estimate timings of `current` that miss their
+    target are reported as well.
+
+    Args:
+        baseline (Dict): Earlier report.
+        current (Dict): New report.
+        tolerance (float): Allowed relative growth of objective and peak RSS.
+        time_tolerance (float): Allowed relative growth of timings.
+
+    Returns:
+        List[str]: One line per regression.
+    """
+    previous = {_case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(_case_key(result))
+        if before is None:
+            continue
+        name = " ".join(str(part) for part in _case_key(result) if part)
+        if before["status"] == "OK" and result["status"] != "OK":
+            regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+            continue
+        if before.get("feasible") and result.get("feasible") is False:
+            regressions.append(f"{name}: routes no longer feasible {result.get('violations')}")
+        for metric in ("objective", "peak_rss_kb") + TIME_METRICS:
+            if metric == "solve_seconds" and result["solver"] == "time_windows":
+                continue
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if metric in TIME_METRICS:
+                regressed = new > old * (1 + time_tolerance) and new - old > TIME_NOISE_SECONDS
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.1f}%)")
+    for estimate in current.get("estimate", []):
+        if not estimate["within_target"]:
+            regressions.append(
+                f"estimate {estimate['size']}x{estimate['size']}: {estimate['first_seconds']}s "
+                f"over the {estimate['target_seconds']}s target"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=SYNTHETIC_SIZES[:2])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cached", action="store_true", help="include the cached branch matrices")
+    parser.add_argument("--solvers", nargs="+", default=SOLVERS, choices=SOLVERS)
+    parser.add_argument("--strategies", nargs="+", default=DEFAULT_STRATEGIES)
+    parser.add_argument("--metaheuristics", nargs="+", default=DEFAULT_METAHEURISTICS)
+    parser.add_argument("--time-limit", type=int, default=10)
+    parser.add_argument("--estimate-sizes", type=int, nargs="*", default=[ESTIMATE_TARGET_SIZE],
+                        help="time the offline travel-time estimate at these sizes")
+    parser.add_argument("-o", "--output", default="bench_output.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two reports and exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed objective / peak RSS growth")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE, help="allowed timing growth")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare_reports(baseline, current, args.tolerance, args.time_tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        print(f"[INFO] {len(regressions)} regressions")
+        sys.exit(1 if regressions else 0)
+
+    specs = [{"kind": "synthetic", "size": size, "seed": args.seed} for size in args.sizes]
+    if args.cached:
+        specs += [{"kind": "cached", "branch": branch, "seed": args.seed} for branch in cached_branches()]
+
+    cases = build_cases(specs, args.solvers, args.strategies, args.metaheuristics, args.time_limit)
+    run_benchmarks(cases, args.output, args.estimate_sizes, args.seed)
+    print(f"[INFO] Report written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,22 @@ load_dotenv()
 class Settings:
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./master_vrp.db")
+    # Pair store key precision in decimal degrees (5 -> ~1 m)
+    DISTANCE_CACHE_PRECISION: int = int(os.getenv("DISTANCE_CACHE_PRECISION", "5"))
 
-    GOOGLE_DISTANCE_MATRIX_URL: str = "https://maps.googleapis.com/maps/api/distancematrix/json"
+    GOOGLE_DISTANCE_MATRIX_URL: str = os.getenv(
+        "GOOGLE_DISTANCE_MATRIX_URL", "https://maps.googleapis.com/maps/api/distancematrix/json"
+    )
+
+    # "google" (cache + API) veya "estimate" (offline haversine + hız modeli)
+    DISTANCE_MATRIX_SOURCE: str = os.getenv("DISTANCE_MATRIX_SOURCE", "google")
+
+    # Distance Matrix fetcher: paralellik, hız limiti ve istek başına limitler
+    DISTANCE_MATRIX_WORKERS: int = int(os.getenv("DISTANCE_MATRIX_WORKERS", "8"))
+    DISTANCE_MATRIX_QPS: float = float(os.getenv("DISTANCE_MATRIX_QPS", "10"))
+    DISTANCE_MATRIX_MAX_RETRIES: int = int(os.getenv("DISTANCE_MATRIX_MAX_RETRIES", "5"))
+    DISTANCE_MATRIX_MAX_ELEMENTS: int = int(os.getenv("DISTANCE_MATRIX_MAX_ELEMENTS", "100"))
+    DISTANCE_MATRIX_MAX_ORIGINS: int = int(os.getenv("DISTANCE_MATRIX_MAX_ORIGINS", "25"))
+    DISTANCE_MATRIX_MAX_DESTINATIONS: int = int(os.getenv("DISTANCE_MATRIX_MAX_DESTINATIONS", "25"))
 
 settings = Settings()
\ No newline at end of file
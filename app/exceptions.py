@@ -26,4 +26,11 @@ class DistanceMatrixAPIError(MasterVRPException):
 class NoRoutesFoundError(MasterVRPException):
     """Raised when OR-Tools does not find any route."""
     def __init__(self):
-        super().__init__("No routes found by VRP solver.")
\ No newline at end of file
+        super().__init__("No routes found by VRP solver.")
+
+
+class JobQueueFullError(MasterVRPException):
+    """Raised when the solve service already holds its maximum number of jobs."""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        super().__init__(f"Job queue is full ({capacity} jobs running or queued).")
@@ -0,0 +1,90 @@
+"""
+Checks a saved or imported plan with the route evaluator.
+
+    python -m app.scripts.check_plan Esenyurt
+    python -m app.scripts.check_plan Esenyurt --plan imported_plan.json --per-route
+
+The plan has the layout of app/outputs/{branch}_solution.json ("routes" of
+steps with "location_index" and "arrival_time", plus "locations", "demands"
+and "service_times"). Travel times come from the branch's cached matrix;
+locations it does not cover are estimated offline. Every stop must be served
+inside its window (the step's "time_window", otherwise WORK_START-WORK_END),
+no vehicle may exceed VEHICLE_CAPACITY and every order must be visited
+exactly once. Exits non-zero when the plan is infeasible.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.scripts.multi_vrp_solver import LUNCH_BREAK, LUNCH_BREAKS_ENABLED, OUTPUT_DIR, VEHICLE_CAPACITY, WORK_END, WORK_START
+from app.services.distance_matrix import solution_matrix_nodes
+from app.services.insertion import PlanTravelTimes
+from app.services.route_evaluator import evaluate_plan
+from app.utils import setup_logger
+
+logger = setup_logger("check_plan")
+
+
+def check_plan(branch: str, plan_path: Optional[str] = None) -> Dict:
+    """
+    Scores a plan of a branch and lists its violations.
+
+    Args:
+        branch (str): Branch whose matrix and settings apply.
+        plan_path (Optional[str]): Plan file; defaults to the branch's
+            solution in OUTPUT_DIR.
+
+    Returns:
+        Dict: {"totals": plan figures, "routes": figures per route}.
+
+    Raises:
+        FileNotFoundError: If the plan file does not exist.
+        ValueError: If the plan has no routes, locations or per-order demands.
+    """
+    plan_path = plan_path or f"{OUTPUT_DIR}/{branch.lower()}_solution.json"
+    with open(plan_path, "r") as f:
+        plan = json.load(f)
+    missing = [key for key in ("routes", "locations", "demands", "service_times") if key not in plan]
+    if missing:
+        raise ValueError(f"{plan_path} is missing {', '.join(missing)}; re-solve or re-export the plan")
+
+    matrix, nodes = solution_matrix_nodes(plan, branch)
+    travel = PlanTravelTimes(plan["locations"], matrix, nodes)
+    size = len(plan["locations"])
+    # Tam matris tek seferde: eşlenen yaylar matristen, kalanı tahminden
+    full = travel(np.repeat(np.arange(size), size), np.tile(np.arange(size), size)).reshape(size, size)
+
+    windows = np.tile([WORK_START, WORK_END], (size, 1))
+    for route in plan["routes"]:
+        for step in route:
+            if "time_window" in step:
+                windows[step["location_index"]] = step["time_window"]
+
+    totals, per_route = evaluate_plan(
+        plan["routes"], full, plan["demands"], plan["service_times"], windows, VEHICLE_CAPACITY,
+        lunch_break=LUNCH_BREAK if LUNCH_BREAKS_ENABLED else None,
+    )
+    logger.info(f"{branch} plan: {totals['vehicles_used']} vehicles, travel {totals['travel_time']} s, "
+                f"{'feasible' if totals['feasible'] else 'INFEASIBLE'}")
+    return {"totals": totals, "routes": per_route}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("branch")
+    parser.add_argument("--plan", default=None, help="plan file; the branch's saved solution by default")
+    parser.add_argument("--per-route", action="store_true", help="also print the figures of every route")
+    args = parser.parse_args()
+
+    report = check_plan(args.branch, args.plan)
+    if not args.per_route:
+        report.pop("routes")
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["totals"]["feasible"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Local stand-in for the Google Distance Matrix API.
+
+Serves the same JSON shape as the real endpoint with durations derived from
+straight-line distance, enforces the per-request limits, and can inject
+transient failures (HTTP 429, HTTP 503 or OVER_QUERY_LIMIT) so the fetcher's retry
+path can be exercised offline:
+
+    python -m app.scripts.fake_distance_matrix_server --port 8765 --fail-rate 0.1
+    GOOGLE_DISTANCE_MATRIX_URL=http://127.0.0.1:8765/maps/api/distancematrix/json python main.py
+"""
+import argparse
+import json
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlparse
+
+EARTH_RADIUS_M = 6371000.0
+SPEED_MPS = 30 / 3.6  # 30 km/h şehir içi ortalama
+DETOUR_FACTOR = 1.3
+
+
+def _duration(origin: str, destination: str) -> Tuple[int, int]:
+    lat1, lon1 = (math.radians(float(v)) for v in origin.split(","))
+    lat2, lon2 = (math.radians(float(v)) for v in destination.split(","))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    meters = 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a)) * DETOUR_FACTOR
+    return int(meters), int(meters / SPEED_MPS)
+
+
+class FakeDistanceMatrixHandler(BaseHTTPRequestHandler):
+    max_elements = 100
+    max_dimension = 25
+    fail_rate = 0.0
+    request_count = 0
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        with self._lock:
+            type(self).request_count += 1
+
+        if random.random() < self.fail_rate:
+            self._send_failure(random.choice((429, 503, 200)))
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        origins = query.get("origins", [""])[0].split("|")
+        destinations = query.get("destinations", [""])[0].split("|")
+
+        if (len(origins) > self.max_dimension or len(destinations) > self.max_dimension
+                or len(origins) * len(destinations) > self.max_elements):
+            self._send(200, {"status": "MAX_ELEMENTS_EXCEEDED", "rows": []})
+            return
+
+        try:
+            rows = []
+            for origin in origins:
+                elements = []
+                for destination in destinations:
+                    meters, seconds = _duration(origin, destination)
+                    elements.append({
+                        "status": "OK",
+                        "distance": {"value": meters, "text": f"{meters / 1000:.1f} km"},
+                        "duration": {"value": seconds, "text": f"{seconds // 60} mins"},
+                    })
+                rows.append({"elements": elements})
+        except ValueError:
+            self._send(200, {"status": "INVALID_REQUEST", "rows": []})
+            return
+
+        self._send(200, {
+            "status": "OK",
+            "origin_addresses": origins,
+            "destination_addresses": destinations,
+            "rows": rows,
+        })
+
+    def _send_failure(self, code: int):
+        # 200 ile gelen OVER_QUERY_LIMIT da geçici hata sayılır
+        if code == 200:
+            self._send(200, {"status": "OVER_QUERY_LIMIT", "rows": []})
+        else:
+            self._send(code, {"status": "UNKNOWN_ERROR"})
+
+    def _send(self, code: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, fail_rate: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the stand-in server on a background thread.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        fail_rate (float): Fraction of requests answered with a transient error.
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: The running server and the endpoint URL
+        to use as `GOOGLE_DISTANCE_MATRIX_URL`.
+    """
+    handler = type("Handler", (FakeDistanceMatrixHandler,), {"fail_rate": fail_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_address[1]}/maps/api/distancematrix/json"
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    handler = type("Handler", (FakeDistanceMatrixHandler,), {"fail_rate": args.fail_rate})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"[INFO] Fake Distance Matrix API on http://{args.host}:{args.port}/maps/api/distancematrix/json")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
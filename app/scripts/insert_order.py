@@ -0,0 +1,195 @@
+"""
+Inserts an urgent order into a branch's current plan without re-solving.
+
+    python -m app.scripts.insert_order Esenyurt 41.03 28.67 --demand 12 --now 11:30
+    python -m app.scripts.insert_order Esenyurt 41.03 28.67 --demand 12 --window 13:00-15:00 --progress 0=4 3=7
+
+The routes come from app/outputs/{branch}_solution.json. Only the arcs
+between the new order and its nearest planned stops are requested (or
+estimated with DISTANCE_MATRIX_SOURCE=estimate); every other arc is read
+from the branch matrix the plan was solved with. The order goes to the
+cheapest position that keeps capacities and time windows feasible, and the
+updated plan is written back.
+"""
+import argparse
+import json
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.scripts.multi_vrp_solver import (
+    BRANCH_VEHICLES, OUTPUT_DIR, SERVICE_TIME_PER_DESI, VEHICLE_CAPACITY, VEHICLE_FIXED_COST, WORK_END, WORK_START
+)
+from app.services.distance_matrix import fetch_location_arcs, solution_matrix_nodes
+from app.services.insertion import (
+    PlanTravelTimes, apply_insertion, cheapest_feasible_insertion, first_free_step, repair_route
+)
+from app.utils import file_lock, setup_logger, write_json_atomic
+
+logger = setup_logger("insert_order")
+
+# Yeni siparişe gerçek süreleri çekilen en yakın planlı durak sayısı (+ depo)
+INSERTION_CANDIDATES = 25
+# Eklemeden sonra sadece değişen rotada yapılan sınırlı iyileştirme
+REPAIR_SECONDS = 0.05
+
+
+def _seconds_of_day(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def _connect_new_location(travel: PlanTravelTimes, node: int, routes: List[List[Dict]], source: str) -> int:
+    # Yeni sipariş ile en yakın durakların (ve depo) arasındaki yaylar API'den gelir
+    if source != "google":
+        return 0
+    planned = sorted({step["location_index"] for route in routes for step in route} | {0})
+    planned = np.array(planned, dtype=np.int64)
+    nearest = planned[np.argsort(travel(node, planned), kind="stable")[:INSERTION_CANDIDATES]]
+    candidates = sorted(set(nearest.tolist()) | {0})
+
+    outgoing, incoming = fetch_location_arcs(
+        travel.locations[node], [travel.locations[i] for i in candidates]
+    )
+    travel.set_arcs([node] * len(candidates), candidates, outgoing)
+    travel.set_arcs(candidates, [node] * len(candidates), incoming)
+    return 2 * len(candidates)
+
+
+def insert_order(
+    branch: str,
+    latitude: float,
+    longitude: float,
+    demand: float,
+    time_window: Optional[Tuple[int, int]] = None,
+    now: Optional[int] = None,
+    progress: Optional[Dict[int, int]] = None,
+    repair: bool = True,
+    source: Optional[str] = None,
+    solution_path: Optional[str] = None,
+    write: bool = True,
+) -> Dict:
+    """
+    Inserts one order into the saved plan of a branch.
+
+    Args:
+        branch (str): Branch whose plan is updated.
+        latitude (float): Order latitude.
+        longitude (float): Order longitude.
+        demand (float): Order demand (desi).
+        time_window (Optional[Tuple[int, int]]): Allowed service start in
+            seconds since midnight; from `now` until WORK_END when omitted.
+        now (Optional[int]): Current time in seconds since midnight; the
+            local clock when omitted.
+        progress (Optional[Dict[int, int]]): Route index -> steps already
+            started (depot departure included), as reported by the drivers;
+            inferred from the planned arrival times when omitted.
+        repair (bool): Run a short local search on the modified route.
+        source (Optional[str]): "google" or "estimate"; defaults to
+            `settings.DISTANCE_MATRIX_SOURCE`.
+        solution_path (Optional[str]): Plan file; defaults to the branch's
+            solution in OUTPUT_DIR.
+        write (bool): Write the updated plan back to `solution_path`.
+
+    Returns:
+        Dict: {"status": "OK", "vehicle", "position", "arrival_time",
+        "cost_delta", "elapsed_ms", "routes"}, or {"status": "No feasible
+        insertion", "elapsed_ms"} when no vehicle can take the order.
+
+    Raises:
+        FileNotFoundError: If the branch has no saved plan.
+        ValueError: If the plan has no routes or per-order demands.
+    """
+    started = time.perf_counter()
+    source = source or settings.DISTANCE_MATRIX_SOURCE
+    solution_path = solution_path or f"{OUTPUT_DIR}/{branch.lower()}_solution.json"
+    # Okuma-ekleme-yazma şubenin çözüm kilidi altında: eşzamanlı eklemeler ve çözüm işleri
+    # birbirinin planını ezmez
+    with file_lock(solution_path) if write else nullcontext():
+        with open(solution_path, "r") as f:
+            solution = json.load(f)
+        if solution.get("status") != "OK" or "demands" not in solution:
+            raise ValueError(f"{solution_path} has no routes with per-order demands; re-solve the branch first")
+
+        if now is None:
+            clock = datetime.now()
+            now = clock.hour * 3600 + clock.minute * 60 + clock.second
+        time_window = tuple(time_window or (now, WORK_END))
+        routes = solution["routes"]
+
+        matrix, nodes = solution_matrix_nodes(solution, branch)
+        travel = PlanTravelTimes(solution["locations"], matrix, nodes)
+        node = travel.append_location(f"{latitude},{longitude}")
+        demands = solution["demands"] + [demand]
+        service_times = solution["service_times"] + [int(demand * SERVICE_TIME_PER_DESI)]
+        fetched = _connect_new_location(travel, node, routes, source)
+
+        insertion = cheapest_feasible_insertion(
+            routes, travel, service_times, demands, node, VEHICLE_CAPACITY, now, time_window,
+            WORK_START, WORK_END, max_vehicles=BRANCH_VEHICLES.get(branch),
+            vehicle_fixed_cost=VEHICLE_FIXED_COST, progress=progress,
+        )
+        if insertion is None:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            logger.warning(f"No feasible insertion for the new {branch} order ({elapsed_ms} ms)")
+            return {"status": "No feasible insertion", "elapsed_ms": elapsed_ms}
+
+        step = {"location_index": node, "time_window": list(time_window), "inserted": True}
+        routes = apply_insertion(routes, insertion, step, travel, service_times, WORK_START, WORK_END)
+        if repair and insertion.vehicle < len(solution["routes"]):
+            route = routes[insertion.vehicle]
+            first = first_free_step(route, service_times, now, (progress or {}).get(insertion.vehicle))
+            routes[insertion.vehicle] = repair_route(
+                route, first, travel, service_times, WORK_START, WORK_END, time_budget=REPAIR_SECONDS
+            )
+        position = next(i for i, s in enumerate(routes[insertion.vehicle]) if s["location_index"] == node)
+        arrival = routes[insertion.vehicle][position]["arrival_time"]
+
+        solution.update(routes=routes, locations=travel.locations, demands=demands, service_times=service_times)
+        if write:
+            write_json_atomic(solution_path, solution)
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Inserted order into {branch} vehicle {insertion.vehicle} at position {position} "
+                    f"(+{insertion.cost_delta} s, {fetched} arcs fetched, {elapsed_ms} ms)")
+        return {
+            "status": "OK",
+            "vehicle": insertion.vehicle,
+            "position": position,
+            "arrival_time": arrival,
+            "cost_delta": insertion.cost_delta,
+            "elapsed_ms": elapsed_ms,
+            "routes": routes,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("branch")
+    parser.add_argument("latitude", type=float)
+    parser.add_argument("longitude", type=float)
+    parser.add_argument("--demand", type=float, required=True)
+    parser.add_argument("--window", help="HH:MM-HH:MM allowed service start")
+    parser.add_argument("--now", help="HH:MM; the local clock by default")
+    parser.add_argument("--progress", nargs="*", default=[], help="route=steps_started pairs")
+    parser.add_argument("--no-repair", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="do not write the updated plan")
+    args = parser.parse_args()
+
+    window = tuple(_seconds_of_day(part) for part in args.window.split("-")) if args.window else None
+    progress = {int(route): int(steps) for route, steps in (pair.split("=") for pair in args.progress)}
+    result = insert_order(
+        args.branch, args.latitude, args.longitude, args.demand, window,
+        _seconds_of_day(args.now) if args.now else None, progress or None,
+        repair=not args.no_repair, write=not args.dry_run,
+    )
+    result.pop("routes", None)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
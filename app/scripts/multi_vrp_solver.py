@@ -1,9 +1,24 @@
+import numpy as np
 import pandas as pd
-from app.services.distance_matrix import load_or_build_distance_matrix
-from app.services.vrp_solver import solve_vrp_with_time_windows
-from app.utils import load_depots, setup_logger
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Union
+from app.services.aggregation import aggregate_stops, expand_routes
+from app.services.decomposition import solve_decomposed
+from app.services.distance_matrix import (
+    load_or_build_distance_matrix, load_or_build_multi_depot_matrix, load_or_build_sparse_distance_matrix,
+    load_or_build_travel_tensor
+)
+from app.services.matrix_cache import slice_index
+from app.services.metrics import MetricsRecorder
+from app.services.fleet_sizing import estimate_min_fleet, solve_with_fleet_sizing
+from app.services.multi_depot import assign_regions, split_fleet
+from app.services.route_output import RouteTableWriter, matrix_nodes, write_route_table
+from app.services.vrp_solver import SearchOptions, solve_vrp_with_time_windows
+from app.services.warm_start import complete_routes, load_previous_routes
+from app.utils import (
+    OrderColumns, file_lock, load_depots, load_orders, orders_from_frame, setup_logger, write_json_atomic
+)
 import os
-import json
 
 logger = setup_logger("multi_vrp")
 
@@ -18,55 +33,447 @@ DEPOTS_JSON = "/Users/reyyansarikaya/Desktop/Projects/master_vrp/app/data/depots
 WORK_START = 8 * 3600  # 08:00 in seconds
 WORK_END = 17 * 3600   # 17:00 in seconds
 LUNCH_BREAK = (12 * 3600, 13 * 3600)
+# Açıkken her araç LUNCH_BREAK başlangıcı ile bitişi arasında başlayan bir mola verir
+LUNCH_BREAKS_ENABLED = False
 SERVICE_TIME_PER_DESI = 2
 VEHICLE_CAPACITY = 15000
 
+# Şube başına en fazla araç; AUTO_FLEET_SIZING açıkken üst sınır olarak kullanılır
 BRANCH_VEHICLES = {
     "Esenyurt": 100,
     "Haramidere": 100
 }
 
-def solve_branch_vrp(branch: str, orders_df: pd.DataFrame, depots: dict):
+# Filo boyutu alt sınırdan başlar, çözüm bulunamazsa FLEET_GROWTH_FACTOR ile büyür
+AUTO_FLEET_SIZING = True
+FLEET_GROWTH_FACTOR = 1.25
+# Kullanılan her araç için amaç fonksiyonuna eklenen sabit maliyet (saniye cinsinden)
+VEHICLE_FIXED_COST = 0
+
+# Önceki günün app/outputs/{branch}_solution.json rotalarından sıcak başlangıç
+WARM_START = False
+OUTPUT_DIR = "app/outputs"
+# Rota tablosu ({branch}_routes): "csv" veya "parquet" (pyarrow gerekir, yoksa CSV'ye düşer)
+ROUTE_OUTPUT_FORMAT = "csv"
+
+# "fixed": 60 sn sabit limit; "adaptive": boyuta göre limit + iyileşme durunca erken bitir.
+# Her iyileşen çözüm app/outputs/{branch}_best.json dosyasına yazılır.
+SOLVE_MODE = "fixed"
+PLATEAU_WINDOW_SECONDS = 10
+PLATEAU_MIN_IMPROVEMENT_PCT = 0.5
+
+# Bu sayının üzerindeki duraklarda önce kümele, sonra her kümeyi ayrı çöz
+DECOMPOSE_ABOVE_STOPS = 1000
+CLUSTER_METHOD = "sweep"  # "sweep" veya "kmeans"
+CLUSTER_SIZE = 300
+
+# Çok büyük şubelerde sadece en yakın SPARSE_NEIGHBORS komşu + depo yayları API'den çekilir,
+# diğer yaylar tahmin * SPARSE_PENALTY olur ve yerel arama bu komşularla sınırlanır
+SPARSE_ABOVE_STOPS = 2000
+SPARSE_NEIGHBORS = 20
+SPARSE_PENALTY = 1.5
+
+# Saatlik trafik: WORK_START-WORK_END arası her TIME_SLICE_SECONDS için ayrı matris çekilir
+# (API maliyeti dilim sayısıyla çarpılır). Araçlar DEPARTURE_WAVES saatlerine sırayla dağıtılır
+# ve her araç çıkış saatinin dilimini kullanır.
+TIME_SLICED_MATRIX = False
+TIME_SLICE_SECONDS = 3600
+DEPARTURE_WAVES = [WORK_START]
+
+# Aynı noktadaki siparişleri tek durakta birleştir (toleransı metre cinsinden). Açıkça açılır:
+# birleşen duraklar arasındaki yol süresi modelde yer almaz.
+AGGREGATE_STOPS = False
+AGGREGATION_TOLERANCE_M = 10
+
+# Tüm şubelerin siparişleri ve araçları tek modelde çözülür; her araç kendi deposundan çıkıp
+# kendi deposuna döner. Sipariş en yakın depo bölgesine düşer; başka bir depoya uzaklığı en
+# yakınınkinin BOUNDARY_RATIO katını geçmeyen sınır durakları her iki deponun araçlarına açıktır.
+MULTI_DEPOT = False
+BOUNDARY_RATIO = 1.25
+
+# Aynı anda çözülecek şube sayısı (her şube bir süreç / bir çekirdek)
+MAX_BRANCH_WORKERS = os.cpu_count() or 1
+
+
+def cluster_worker_budget(parallel_solves: int) -> int:
+    """Cluster worker processes one branch may use while `parallel_solves` solves share the cores."""
+    return max(1, (os.cpu_count() or 1) // max(1, parallel_solves))
+
+
+def search_options(snapshot_path: Optional[str] = None, neighbors: Optional[int] = None) -> SearchOptions:
+    """SOLVE_MODE and the plateau settings as solver options; snapshots are only written in adaptive mode."""
+    adaptive = SOLVE_MODE == "adaptive"
+    return SearchOptions(
+        adaptive=adaptive,
+        plateau_window=PLATEAU_WINDOW_SECONDS,
+        plateau_min_improvement=PLATEAU_MIN_IMPROVEMENT_PCT,
+        snapshot_path=snapshot_path if adaptive else None,
+        neighbors=neighbors,
+    )
+
+
+def solve_branch_vrp(
+    branch: str,
+    orders: Union[OrderColumns, pd.DataFrame],
+    depots: dict,
+    metrics: Optional[MetricsRecorder] = None,
+    persist: bool = True,
+    workers: Optional[int] = None
+):
+    # persist=False: servisin özel sipariş işleri – şubenin matris önbelleğine ve çıktı
+    # dosyalarına (çözüm, best, metrics, rota tablosu) dokunulmaz, sonuç sadece döndürülür
+    # workers: büyük şubenin kümeleri için süreç bütçesi (paralel şube çözümlerinde çekirdek payı)
+    metrics = metrics or MetricsRecorder(branch=branch)
+    if isinstance(orders, pd.DataFrame):
+        with metrics.span("load_orders"):
+            orders = orders_from_frame(orders)
+
     logger.info(f"\n\n=== Solving for branch: {branch} ===")
-    logger.info(f"{len(orders_df)} orders assigned to {branch}")
+    logger.info(f"{len(orders)} orders assigned to {branch}")
 
     depot = depots[branch]
     depot_coord = f"{depot.lat},{depot.lon}"
 
-    order_coords = [f"{row['latitude']},{row['longtitude']}" for _, row in orders_df.iterrows()]
-    locations = [depot_coord] + order_coords
+    order_locations = orders.coordinates()
+    order_service_times = orders.service_times(SERVICE_TIME_PER_DESI)
 
-    service_times = [0] + [int(row["total_used_desi"] * SERVICE_TIME_PER_DESI) for _, row in orders_df.iterrows()]
-    demands = [0] + [row["total_used_desi"] for _, row in orders_df.iterrows()]
+    stops = None
+    if AGGREGATE_STOPS:
+        # Aynı / çok yakın koordinattaki siparişler tek durak olur
+        with metrics.span("aggregate_stops"):
+            stops = aggregate_stops(
+                orders.latitude, orders.longitude, orders.total_used_desi,
+                order_service_times, VEHICLE_CAPACITY, AGGREGATION_TOLERANCE_M
+            )
+        logger.info(f"Aggregated {len(orders)} orders into {len(stops.stop_orders)} stops")
+        locations = [depot_coord] + [order_locations[i] for i in stops.representatives()]
+        service_times = [0] + stops.service_time.tolist()
+        demands = [0] + stops.demand.tolist()
+    else:
+        locations = [depot_coord] + order_locations
+        service_times = [0] + order_service_times.tolist()
+        demands = [0] + orders.total_used_desi.tolist()
 
     logger.info(f"Total demand: {sum(demands)}")
     logger.info(f"Total capacity: {BRANCH_VEHICLES[branch] * VEHICLE_CAPACITY}")
 
-    matrix = load_or_build_distance_matrix(locations, branch)
-
-    result = solve_vrp_with_time_windows(
-        distance_matrix=matrix,
-        service_times=service_times,
-        order_demands=demands,
-        vehicle_count=BRANCH_VEHICLES[branch],
-        vehicle_capacity=VEHICLE_CAPACITY,
-        depot_index=0,
-        time_windows=[[WORK_START, WORK_END]] * len(locations),
-        lunch_breaks=[LUNCH_BREAK] * BRANCH_VEHICLES[branch]
+    sparse = len(locations) - 1 > SPARSE_ABOVE_STOPS
+    tensor, slice_starts = None, None
+    with metrics.span("distance_matrix", nodes=len(locations)):
+        if sparse:
+            matrix = load_or_build_sparse_distance_matrix(locations, branch, SPARSE_NEIGHBORS, SPARSE_PENALTY)
+        elif TIME_SLICED_MATRIX:
+            slice_starts = list(range(WORK_START, WORK_END, TIME_SLICE_SECONDS))
+            tensor = load_or_build_travel_tensor(locations, branch, slice_starts, cache=persist)
+            # Filo tahmini, sıcak başlangıç ve kümeleme ilk dalganın dilimini kullanır
+            matrix = tensor[slice_index(slice_starts, DEPARTURE_WAVES[0])]
+        else:
+            matrix = load_or_build_distance_matrix(locations, branch, cache=persist)
+    solution_path = f"{OUTPUT_DIR}/{branch.lower()}_solution.json"
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    previous_routes = []
+    if WARM_START:
+        previous_routes = load_previous_routes(solution_path, locations)
+        logger.info(f"Warm start: {sum(map(len, previous_routes))} stops in {len(previous_routes)} previous routes")
+
+    search = search_options(
+        f"{OUTPUT_DIR}/{branch.lower()}_best.json" if persist else None, SPARSE_NEIGHBORS if sparse else None
     )
 
-    output_dir = "app/outputs"
-    os.makedirs(output_dir, exist_ok=True)
-    with open(f"{output_dir}/{branch.lower()}_solution.json", "w") as f:
-        json.dump(result, f, indent=2)
+    # Rota tablosu sipariş bazında: location_index her zaman [depo] + siparişler
+    order_demands = [0] + orders.total_used_desi.tolist()
+    order_service_list = [0] + order_service_times.tolist()
+    # Zaman dilimli tensörde her rota çıkış saatinin dilimiyle yazılır
+    route_matrix = matrix
+    if tensor is not None:
+        route_matrix = lambda route: tensor[slice_index(slice_starts, route[0]["arrival_time"])]
+    route_writer = None
+
+    def stream_route(route: List[Dict]):
+        # Rotalar OR-Tools çözümünden okunurken araç araç tabloya yazılır
+        nonlocal route_writer
+        if route_writer is None:
+            route_writer = RouteTableWriter(f"{OUTPUT_DIR}/{branch.lower()}_routes", ROUTE_OUTPUT_FORMAT)
+        if stops is not None:
+            route = expand_routes([route], stops, order_service_times)[0]
+        route_writer.write_route(branch, route, route_matrix, order_demands, order_service_list)
 
+    def solve(vehicle_count: int):
+        initial_routes = None
+        if previous_routes:
+            initial_routes = complete_routes(
+                previous_routes, matrix, demands, vehicle_count, VEHICLE_CAPACITY
+            )
+        return solve_vrp_with_time_windows(
+            distance_matrix=matrix if tensor is None else tensor,
+            service_times=service_times,
+            order_demands=demands,
+            vehicle_count=vehicle_count,
+            vehicle_capacity=VEHICLE_CAPACITY,
+            depot_index=0,
+            time_windows=[[WORK_START, WORK_END]] * len(locations),
+            lunch_breaks=[LUNCH_BREAK] * vehicle_count if LUNCH_BREAKS_ENABLED else [],
+            search=search,
+            vehicle_fixed_cost=VEHICLE_FIXED_COST,
+            initial_routes=initial_routes,
+            slice_starts=slice_starts,
+            vehicle_departures=[DEPARTURE_WAVES[v % len(DEPARTURE_WAVES)] for v in range(vehicle_count)],
+            metrics=metrics,
+            on_route=stream_route if persist else None
+        )
+
+    max_vehicles = BRANCH_VEHICLES[branch]
+    if len(locations) - 1 > DECOMPOSE_ABOVE_STOPS:
+        with metrics.span("solve_decomposed"):
+            result = solve_decomposed(
+                matrix, locations, service_times, demands, VEHICLE_CAPACITY, max_vehicles,
+                [[WORK_START, WORK_END]] * len(locations),
+                method=CLUSTER_METHOD, cluster_size=CLUSTER_SIZE, workers=workers, search=search,
+                initial_routes=previous_routes or None,
+                lunch_break=LUNCH_BREAK if LUNCH_BREAKS_ENABLED else None,
+                tensor=tensor, slice_starts=slice_starts, departure_waves=DEPARTURE_WAVES,
+                fleet_sizing=AUTO_FLEET_SIZING, growth_factor=FLEET_GROWTH_FACTOR
+            )
+    elif AUTO_FLEET_SIZING:
+        min_vehicles = estimate_min_fleet(
+            matrix, service_times, demands, VEHICLE_CAPACITY, WORK_END - WORK_START
+        )
+        logger.info(f"Fleet lower bound: {min_vehicles} vehicles")
+        result = solve_with_fleet_sizing(solve, min_vehicles, max_vehicles, FLEET_GROWTH_FACTOR)
+    else:
+        result = solve(max_vehicles)
+
+    # Rotalar sipariş bazına geri açılır; location_index her zaman [depo] + siparişler
+    if stops is not None and result["status"] == "OK":
+        result["routes"] = expand_routes(result["routes"], stops, order_service_times)
+
+    # Koordinatlar bir sonraki günün sıcak başlangıcı için saklanır
+    result["locations"] = [depot_coord] + order_locations
+    # Acil sipariş eklerken (insert_order) rota yükü ve süreleri bunlardan hesaplanır
+    result["demands"] = order_demands
+    result["service_times"] = order_service_list
+    if not persist:
+        result["metrics"] = metrics.to_dict()
+        return result
+
+    route_file = None
+    # Aynı şubenin eşzamanlı işleri ve sipariş eklemeleri (insert_order) sırayla yazar
+    with metrics.span("write_output"), file_lock(solution_path):
+        write_json_atomic(solution_path, result)
+        if route_writer is not None:
+            route_file = route_writer.close()
+            logger.info(f"Saved {route_writer.route_count} routes to {route_file}")
+        elif result["status"] == "OK":
+            # Kümelere bölünmüş çözümün rotaları işçi süreçlerinden liste olarak gelir
+            route_file = write_route_table(
+                f"{OUTPUT_DIR}/{branch.lower()}_routes", branch, result["routes"],
+                [matrix_nodes(route) for route in result["routes"]], route_matrix,
+                result["demands"], result["service_times"], ROUTE_OUTPUT_FORMAT
+            )
+
+    # Ölçümler çözüm dosyasına değil, ayrı dosyaya yazılır
+    metrics.write_json(f"{OUTPUT_DIR}/{branch.lower()}_metrics.json")
+    result["metrics"] = metrics.to_dict()
+    result["route_file"] = route_file
     return result
 
-def run_all_branches():
+
+def _solve_branch_job(branch: str, csv_path: str, depots: dict, workers: Optional[int] = None):
+    metrics = MetricsRecorder(branch=branch)
+    with metrics.span("load_orders"):
+        orders = load_orders(csv_path)
+    return solve_branch_vrp(branch, orders, depots, metrics, workers=workers)
+
+
+def _branch_solution(routes: list, depot: int, depot_count: int, depot_coord: str,
+                     order_locations: list, order_demands: np.ndarray, order_service_times: np.ndarray):
+    # Ortak çözümün bir deposunun rotaları, şubenin kendi numaralandırmasına çevrilir:
+    # 0 depo, ardından bu deponun araçlarının ziyaret ettiği siparişler
+    local = {depot: 0}
+    for route in routes:
+        for step in route:
+            local.setdefault(step["location_index"], len(local))
+    orders = np.array([node - depot_count for node in local if node != depot], dtype=np.int64)
+    return orders, {
+        "status": "OK",
+        "routes": [[{**step, "location_index": local[step["location_index"]]} for step in route] for route in routes],
+        "locations": [depot_coord] + [order_locations[order] for order in orders.tolist()],
+        "demands": [0] + order_demands[orders].tolist(),
+        "service_times": [0] + order_service_times[orders].tolist(),
+    }
+
+
+def solve_joint_vrp(depots: dict, metrics: Optional[MetricsRecorder] = None) -> dict:
+    """
+    Solves all branches as one multi-depot model.
+
+    The orders of every branch CSV are pooled and each stop is assigned to
+    its nearest depot; stops in the boundary region (see BOUNDARY_RATIO)
+    may be served by the vehicles of any depot, the rest only by their own
+    depot's vehicles. Real durations are fetched per depot block (depot,
+    its region and the boundary stops), never across regions. The routes
+    are written back per branch, so every order ends up in the solution of
+    the depot that serves it.
+
+    Args:
+        depots (dict): Branch name -> depot.
+        metrics (Optional[MetricsRecorder]): Receives the stage spans.
+
+    Returns:
+        dict: Branch name -> solver result with its depot's routes, in
+        ORDERS_CSVS order.
+    """
+    branches = list(ORDERS_CSVS)
+    depot_count = len(branches)
+    metrics = metrics or MetricsRecorder(branch="joint")
+    with metrics.span("load_orders"):
+        branch_orders = [load_orders(ORDERS_CSVS[branch]) for branch in branches]
+    logger.info(f"\n\n=== Solving {', '.join(branches)} jointly ===")
+
+    latitude = np.concatenate([orders.latitude for orders in branch_orders])
+    longitude = np.concatenate([orders.longitude for orders in branch_orders])
+    order_demands = np.concatenate([orders.total_used_desi for orders in branch_orders])
+    order_service_times = np.concatenate([orders.service_times(SERVICE_TIME_PER_DESI) for orders in branch_orders])
+    order_branch = np.concatenate([np.full(len(orders), d) for d, orders in enumerate(branch_orders)])
+    order_locations = [location for orders in branch_orders for location in orders.coordinates()]
+    depot_coords = [f"{depots[branch].lat},{depots[branch].lon}" for branch in branches]
+
+    stops = None
+    if AGGREGATE_STOPS:
+        with metrics.span("aggregate_stops"):
+            stops = aggregate_stops(
+                latitude, longitude, order_demands, order_service_times, VEHICLE_CAPACITY, AGGREGATION_TOLERANCE_M
+            )
+        stop_locations = [order_locations[i] for i in stops.representatives()]
+        service_times = [0] * depot_count + stops.service_time.tolist()
+        demands = [0] * depot_count + stops.demand.tolist()
+    else:
+        stop_locations = order_locations
+        service_times = [0] * depot_count + order_service_times.tolist()
+        demands = [0] * depot_count + order_demands.tolist()
+    locations = depot_coords + stop_locations
+
+    regions = assign_regions(depot_coords, stop_locations, BOUNDARY_RATIO)
+    logger.info(f"{len(order_demands)} orders in {len(stop_locations)} stops, "
+                f"{int(regions.boundary.sum())} in boundary regions")
+    blocks = [regions.block_nodes(d, depot_count) for d in range(depot_count)]
+    with metrics.span("distance_matrix", nodes=len(locations)):
+        matrix = load_or_build_multi_depot_matrix(
+            locations, blocks, branches, SPARSE_PENALTY, SPARSE_ABOVE_STOPS, SPARSE_NEIGHBORS
+        )
+    sparse = len(stop_locations) > SPARSE_ABOVE_STOPS
+
+    # Filo alt sınırı depo başına, kendi bölgesindeki (sınır dahil en yakın olduğu) duraklarla
+    lower_bounds = []
+    for d in range(depot_count):
+        own = np.concatenate([[d], np.flatnonzero(regions.nearest == d) + depot_count])
+        lower_bounds.append(estimate_min_fleet(
+            matrix[np.ix_(own, own)], [service_times[i] for i in own], [demands[i] for i in own],
+            VEHICLE_CAPACITY, WORK_END - WORK_START
+        ))
+    maxima = [BRANCH_VEHICLES[branch] for branch in branches]
+    fleets = {}
+
+    def solve(vehicle_count: int):
+        fleets[vehicle_count] = split_fleet(vehicle_count, lower_bounds, maxima)
+        vehicle_depots = [d for d, count in enumerate(fleets[vehicle_count]) for _ in range(count)]
+        logger.info(f"Vehicles per depot: {dict(zip(branches, fleets[vehicle_count]))}")
+        return solve_vrp_with_time_windows(
+            distance_matrix=matrix,
+            service_times=service_times,
+            order_demands=demands,
+            vehicle_count=len(vehicle_depots),
+            vehicle_capacity=VEHICLE_CAPACITY,
+            depot_index=0,
+            time_windows=[[WORK_START, WORK_END]] * len(locations),
+            lunch_breaks=[LUNCH_BREAK] * len(vehicle_depots) if LUNCH_BREAKS_ENABLED else [],
+            search=search_options(f"{OUTPUT_DIR}/joint_best.json", SPARSE_NEIGHBORS if sparse else None),
+            vehicle_fixed_cost=VEHICLE_FIXED_COST,
+            metrics=metrics,
+            vehicle_depots=vehicle_depots,
+            allowed_vehicles=regions.allowed_vehicles(vehicle_depots, depot_count),
+        )
+
+    if AUTO_FLEET_SIZING:
+        logger.info(f"Fleet lower bounds: {dict(zip(branches, lower_bounds))}")
+        result = solve_with_fleet_sizing(
+            solve, max(depot_count, sum(lower_bounds)), sum(maxima), FLEET_GROWTH_FACTOR
+        )
+    else:
+        result = solve(sum(maxima))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    metrics.write_json(f"{OUTPUT_DIR}/joint_metrics.json")
+    if result["status"] != "OK":
+        return {branch: {"status": result["status"]} for branch in branches}
+
+    routes = result["routes"]
+    if stops is not None:
+        routes = expand_routes(routes, stops, order_service_times, depot_count=depot_count)
+
+    fleet = fleets[result.get("fleet_size", sum(maxima))]
+    results = {}
+    for d, branch in enumerate(branches):
+        depot_routes = [route for route in routes if route[0]["location_index"] == d]
+        orders, branch_result = _branch_solution(
+            depot_routes, d, depot_count, depot_coords[d], order_locations, order_demands, order_service_times
+        )
+        branch_result["fleet_size"] = fleet[d]
+        # Sipariş ekleme / plan kontrolü bu şubenin ortak çözümdeki blok matrisini kullanır
+        branch_result["matrix_cache"] = f"{branch}_block"
+        moved = int(np.count_nonzero(order_branch[orders] != d))
+        logger.info(f"{branch}: {len(branch_result['routes'])} routes, {moved} orders taken over from other branches")
+        solution_path = f"{OUTPUT_DIR}/{branch.lower()}_solution.json"
+        with metrics.span("write_output", branch=branch), file_lock(solution_path):
+            write_json_atomic(solution_path, branch_result)
+            # Süreler ortak matristen, ortak numaralandırmadaki düğümlerle okunur
+            branch_result["route_file"] = write_route_table(
+                f"{OUTPUT_DIR}/{branch.lower()}_routes", branch, branch_result["routes"],
+                [matrix_nodes(route) for route in depot_routes], matrix,
+                branch_result["demands"], branch_result["service_times"], ROUTE_OUTPUT_FORMAT
+            )
+        results[branch] = branch_result
+
+    # Tek ortak çözüm: ölçümler bir kez raporlanır
+    results[branches[0]]["metrics"] = metrics.to_dict()
+    return results
+
+
+def run_all_branches(max_workers: Optional[int] = None):
+    """
+    Solves every branch in parallel worker processes.
+
+    Each branch is an independent OR-Tools solve bounded by its own time
+    limit, so with enough workers the total wall time is about one solve.
+    A failing branch is reported as {"status": "Error", "error": ...} and
+    does not affect the others. With MULTI_DEPOT all branches are solved
+    together instead (see `solve_joint_vrp`).
+
+    Args:
+        max_workers (Optional[int]): Process count; defaults to MAX_BRANCH_WORKERS.
+
+    Returns:
+        dict: Branch name -> solver result, in ORDERS_CSVS order.
+    """
     depots = {depot.name: depot for depot in load_depots(DEPOTS_JSON)}
+    if MULTI_DEPOT:
+        return solve_joint_vrp(depots)
+    workers = max(1, min(max_workers or MAX_BRANCH_WORKERS, len(ORDERS_CSVS)))
+
     results = {}
-    for branch, csv_path in ORDERS_CSVS.items():
-        orders_df = pd.read_csv(csv_path)
-        result = solve_branch_vrp(branch, orders_df, depots)
-        results[branch] = result
-    return results
\ No newline at end of file
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_solve_branch_job, branch, csv_path, depots, cluster_worker_budget(workers)): branch
+            for branch, csv_path in ORDERS_CSVS.items()
+        }
+        for future in as_completed(futures):
+            branch = futures[future]
+            try:
+                results[branch] = future.result()
+                logger.info(f"Branch {branch} finished: {results[branch]['status']}")
+            except Exception as e:
+                logger.exception(f"Branch {branch} failed: {e}")
+                results[branch] = {"status": "Error", "error": str(e)}
+
+    return {branch: results[branch] for branch in ORDERS_CSVS}
@@ -0,0 +1,266 @@
+"""
+What-if scenario sweeps for one branch.
+
+Every combination of the given overrides is solved in parallel worker
+processes that all read the branch matrix from one shared-memory block:
+
+    python -m app.scripts.scenarios Esenyurt --vehicles 40 60 --capacity 12000 15000
+    python -m app.scripts.scenarios Esenyurt --service-rate 2 3 --shift 08:00-17:00 08:00-18:00 --lunch none 12:00-13:00
+
+Options that are not given keep the values from multi_vrp_solver. The
+comparison table (vehicles used, total route time, travel and idle time,
+and lateness, i.e. time vehicles are back at the depot after the shift end,
+all scored by the route evaluator) is printed and written to
+app/outputs/{branch}_scenarios.csv.
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.scripts.multi_vrp_solver import (
+    AGGREGATE_STOPS, AGGREGATION_TOLERANCE_M, AUTO_FLEET_SIZING, BRANCH_VEHICLES, DEPOTS_JSON,
+    FLEET_GROWTH_FACTOR, LUNCH_BREAK, LUNCH_BREAKS_ENABLED, MAX_BRANCH_WORKERS, ORDERS_CSVS, OUTPUT_DIR,
+    SERVICE_TIME_PER_DESI, SPARSE_ABOVE_STOPS, SPARSE_NEIGHBORS, SPARSE_PENALTY, VEHICLE_CAPACITY,
+    VEHICLE_FIXED_COST, WORK_END, WORK_START
+)
+from app.services.aggregation import aggregate_stops
+from app.services.distance_matrix import load_or_build_distance_matrix, load_or_build_sparse_distance_matrix
+from app.services.fleet_sizing import estimate_min_fleet, solve_with_fleet_sizing
+from app.services.route_evaluator import evaluate_plan
+from app.services.shared_matrix import SharedMatrix
+from app.services.vrp_solver import SearchOptions, solve_vrp_with_time_windows
+from app.utils import load_depots, load_orders, setup_logger
+
+logger = setup_logger("scenarios")
+
+SCENARIO_TIME_LIMIT = 30
+TABLE_COLUMNS = [
+    "scenario", "vehicles", "capacity", "service_rate", "shift", "lunch",
+    "status", "vehicles_used", "total_time", "travel_time", "idle_time", "lateness", "late_vehicles",
+    "feasible", "solve_seconds",
+]
+
+# İşçi süreci durumu: paylaşılan matris + durak bilgisi (initializer ile bir kez gelir)
+_worker: Dict = {}
+
+
+def scenario_grid(overrides: Dict[str, Sequence], defaults: Dict) -> List[Dict]:
+    """
+    Expands per-parameter value lists into every combination.
+
+    Args:
+        overrides (Dict[str, Sequence]): Parameter -> values to try.
+        defaults (Dict): Value of each parameter that is not overridden.
+
+    Returns:
+        List[Dict]: One full parameter set per scenario, numbered from 0.
+    """
+    keys = list(defaults)
+    values = [list(overrides.get(key) or [defaults[key]]) for key in keys]
+    return [
+        {"scenario": i, **dict(zip(keys, combination))}
+        for i, combination in enumerate(itertools.product(*values))
+    ]
+
+
+def _attach_worker(handle, stop_orders, order_demands, sparse):
+    _worker["matrix"] = SharedMatrix.attach(handle)
+    _worker["stop_orders"] = stop_orders
+    _worker["order_demands"] = np.asarray(order_demands, dtype=np.float64)
+    _worker["sparse"] = sparse
+
+
+def solve_scenario(scenario: Dict, time_limit: int = SCENARIO_TIME_LIMIT) -> Dict:
+    """
+    Solves one scenario inside a worker attached by `run_scenarios`.
+
+    Args:
+        scenario (Dict): Parameter set from `scenario_grid`.
+        time_limit (int): Search limit per solve in seconds.
+
+    Returns:
+        Dict: The scenario merged with its status and route summary.
+    """
+    start = time.perf_counter()
+    matrix = _worker["matrix"].array
+    order_demands = _worker["order_demands"]
+    # Servis süresi sipariş bazında kesilir, sonra durak bazında toplanır
+    order_service = (order_demands * scenario["service_rate"]).astype(np.int64)
+    stop_orders = _worker["stop_orders"]
+    service_times = [0] + [int(order_service[orders].sum()) for orders in stop_orders]
+    demands = [0] + [float(order_demands[orders].sum()) for orders in stop_orders]
+    shift = list(scenario["shift"])
+    lunch = tuple(scenario["lunch"]) if scenario["lunch"] else None
+
+    def solve(vehicle_count: int):
+        return solve_vrp_with_time_windows(
+            distance_matrix=matrix,
+            service_times=service_times,
+            order_demands=demands,
+            vehicle_count=vehicle_count,
+            vehicle_capacity=int(scenario["capacity"]),
+            depot_index=0,
+            time_windows=[shift] * len(matrix),
+            lunch_breaks=[lunch] * vehicle_count if lunch else [],
+            search=SearchOptions(
+                time_limit=time_limit, neighbors=SPARSE_NEIGHBORS if _worker["sparse"] else None
+            ),
+            vehicle_fixed_cost=VEHICLE_FIXED_COST,
+            # Vardiya senaryosu her aracın çıkışını sınırlar
+            bound_starts=True,
+        )
+
+    if AUTO_FLEET_SIZING:
+        min_vehicles = estimate_min_fleet(
+            matrix, service_times, demands, scenario["capacity"], shift[1] - shift[0]
+        )
+        result = solve_with_fleet_sizing(
+            solve, min(min_vehicles, scenario["vehicles"]), scenario["vehicles"], FLEET_GROWTH_FACTOR
+        )
+    else:
+        result = solve(scenario["vehicles"])
+
+    row = {**scenario, "status": result["status"]}
+    if result["status"] == "OK":
+        totals, _ = evaluate_plan(
+            result["routes"], matrix, demands, service_times, [shift] * len(matrix),
+            scenario["capacity"], lunch_break=lunch,
+        )
+        row.update(totals, lateness=totals["overrun"])
+    row["solve_seconds"] = round(time.perf_counter() - start, 2)
+    return row
+
+
+def run_scenarios(
+    branch: str,
+    overrides: Dict[str, Sequence],
+    workers: Optional[int] = None,
+    time_limit: int = SCENARIO_TIME_LIMIT,
+    output_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Solves every scenario of the grid in parallel and compares them.
+
+    The branch matrix is loaded once (cache, pair store or API as in a
+    normal solve) and placed in shared memory; each worker process maps it
+    without copying. Stops are aggregated with the smallest capacity of the
+    grid so one matrix fits every scenario.
+
+    Args:
+        branch (str): Branch in ORDERS_CSVS.
+        overrides (Dict[str, Sequence]): Values to try for "vehicles",
+            "capacity", "service_rate", "shift" ((start, end) in seconds since
+            midnight) and "lunch" ((start, end) or None); the rest keep the
+            configured values.
+        workers (Optional[int]): Worker processes; defaults to MAX_BRANCH_WORKERS.
+        time_limit (int): Search limit per solve in seconds.
+        output_path (Optional[str]): CSV destination; defaults to
+            `{OUTPUT_DIR}/{branch}_scenarios.csv`.
+
+    Returns:
+        pd.DataFrame: One row per scenario, in grid order.
+    """
+    defaults = {
+        "vehicles": BRANCH_VEHICLES[branch],
+        "capacity": VEHICLE_CAPACITY,
+        "service_rate": SERVICE_TIME_PER_DESI,
+        "shift": (WORK_START, WORK_END),
+        "lunch": LUNCH_BREAK if LUNCH_BREAKS_ENABLED else None,
+    }
+    scenarios = scenario_grid(overrides, defaults)
+
+    depot = {depot.name: depot for depot in load_depots(DEPOTS_JSON)}[branch]
+    orders = load_orders(ORDERS_CSVS[branch])
+    order_locations = orders.coordinates()
+    if AGGREGATE_STOPS:
+        stops = aggregate_stops(
+            orders.latitude, orders.longitude, orders.total_used_desi,
+            np.zeros(len(orders), dtype=np.int64),
+            min(scenario["capacity"] for scenario in scenarios), AGGREGATION_TOLERANCE_M
+        )
+        stop_orders = stops.stop_orders
+    else:
+        stop_orders = [np.array([i]) for i in range(len(orders))]
+    locations = [f"{depot.lat},{depot.lon}"] + [order_locations[group[0]] for group in stop_orders]
+
+    sparse = len(locations) - 1 > SPARSE_ABOVE_STOPS
+    if sparse:
+        matrix = load_or_build_sparse_distance_matrix(locations, branch, SPARSE_NEIGHBORS, SPARSE_PENALTY)
+    else:
+        matrix = load_or_build_distance_matrix(locations, branch)
+
+    workers = max(1, min(workers or MAX_BRANCH_WORKERS, len(scenarios)))
+    logger.info(f"Running {len(scenarios)} scenarios for {branch} on {len(locations)} nodes with {workers} workers")
+    rows = []
+    with SharedMatrix.create(matrix) as shared:
+        del matrix
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach_worker,
+            initargs=(shared.handle, stop_orders, orders.total_used_desi, sparse),
+        ) as pool:
+            futures = {pool.submit(solve_scenario, scenario, time_limit): scenario for scenario in scenarios}
+            for future in as_completed(futures):
+                scenario = futures[future]
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    logger.exception(f"Scenario {scenario['scenario']} failed: {e}")
+                    rows.append({**scenario, "status": "Error"})
+                logger.info(f"Scenario {scenario['scenario']} finished: {rows[-1]['status']}")
+
+    table = pd.DataFrame(rows, columns=TABLE_COLUMNS).sort_values("scenario").reset_index(drop=True)
+    output_path = output_path or os.path.join(OUTPUT_DIR, f"{branch.lower()}_scenarios.csv")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    table.to_csv(output_path, index=False)
+    logger.info(f"Scenario table written to {output_path}")
+    return table
+
+
+def _span(value: str) -> Optional[tuple]:
+    # "HH:MM-HH:MM" -> (başlangıç, bitiş) saniye; "none" -> None
+    if value.lower() == "none":
+        return None
+    start, end = (int(part[:2]) * 3600 + int(part[3:]) * 60 for part in value.split("-"))
+    return start, end
+
+
+def _clock(seconds) -> str:
+    return f"{int(seconds) // 3600:02d}:{int(seconds) % 3600 // 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("branch", choices=list(ORDERS_CSVS))
+    parser.add_argument("--vehicles", type=int, nargs="+")
+    parser.add_argument("--capacity", type=int, nargs="+")
+    parser.add_argument("--service-rate", type=float, nargs="+", help="service seconds per desi")
+    parser.add_argument("--shift", nargs="+", help="HH:MM-HH:MM working hours")
+    parser.add_argument("--lunch", nargs="+", help="HH:MM-HH:MM break window, or none")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--time-limit", type=int, default=SCENARIO_TIME_LIMIT)
+    parser.add_argument("-o", "--output", default=None)
+    args = parser.parse_args()
+
+    overrides = {
+        "vehicles": args.vehicles,
+        "capacity": args.capacity,
+        "service_rate": args.service_rate,
+        "shift": [_span(value) for value in args.shift or []],
+        "lunch": [_span(value) for value in args.lunch or []],
+    }
+
+    table = run_scenarios(args.branch, overrides, args.workers, args.time_limit, args.output)
+    spans = lambda span: f"{_clock(span[0])}-{_clock(span[1])}" if span else "-"
+    shown = table.assign(shift=table["shift"].map(spans), lunch=table["lunch"].map(spans))
+    print(shown.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
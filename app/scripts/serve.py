@@ -0,0 +1,255 @@
+"""
+Resident solve service: a local HTTP API that keeps worker processes,
+depots and distance matrices warm between solves.
+
+    python -m app.scripts.serve --port 8000 --workers 2 --max-queued 8
+
+    curl -X POST localhost:8000/jobs -d '{"branch": "Esenyurt"}'
+    curl -X POST localhost:8000/jobs -d '{"branch": "Esenyurt", "orders": [{"latitude": 41.03, "longitude": 28.67, "total_used_desi": 12}]}'
+    curl localhost:8000/jobs/<job_id>
+
+Endpoints:
+    GET  /health          worker and queue usage
+    POST /jobs            {"branch": str, "orders": optional list of order rows}
+                          -> 202 {"id": ...}; 429 when the queue is full
+    GET  /jobs            all known jobs, without results
+    GET  /jobs/{id}       job status, plus the solver result once done. Jobs with
+                          custom orders write no files and leave the branch's
+                          matrix cache and saved plan untouched
+    POST /insert          {"branch", "latitude", "longitude", "demand", optional
+                          "time_window": [start, end], "now", "progress": {route: steps}}
+                          -> 200 with the updated routes; 409 if no vehicle can take it.
+                          Answered directly (no queue), see app.scripts.insert_order
+    GET  /metrics         Prometheus text: stage timings and solver progress of
+                          the latest finished job per branch, plus queue gauges
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from app.exceptions import JobQueueFullError
+from app.scripts.insert_order import insert_order
+from app.scripts.multi_vrp_solver import (
+    DEPOTS_JSON, MAX_BRANCH_WORKERS, ORDERS_CSVS, _solve_branch_job, cluster_worker_budget, solve_branch_vrp
+)
+from app.services.distance_matrix import preload_branch_caches
+from app.services.job_queue import JOB_DONE, JobQueue
+from app.services.metrics import render_prometheus
+from app.utils import load_depots, setup_logger
+
+logger = setup_logger("serve")
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+
+def _solve_orders_job(branch: str, orders: List[Dict], depots: dict, workers: Optional[int] = None):
+    # Özel sipariş kümesi şubenin önbelleğini ve planını ezmez; sonuç iş kaydında döner
+    return solve_branch_vrp(branch, pd.DataFrame(orders), depots, persist=False, workers=workers)
+
+
+def _warm_worker():
+    # Her işçi süreci başlarken şube matrislerini belleğe alır
+    preload_branch_caches(list(ORDERS_CSVS))
+
+
+class SolveRequestHandler(BaseHTTPRequestHandler):
+    jobs: JobQueue = None
+    depots: dict = {}
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            self._send(200, {
+                "status": "ok",
+                "workers": self.jobs.max_workers,
+                "max_queued": self.jobs.max_queued,
+                "active_jobs": self.jobs.active,
+            })
+        elif path == "/metrics":
+            self._send_text(200, self._render_metrics())
+        elif path == "/jobs":
+            self._send(200, {"jobs": self.jobs.list()})
+        elif path.startswith("/jobs/"):
+            job = self.jobs.get(path[len("/jobs/"):])
+            if job is None:
+                self._send(404, {"error": "Unknown job"})
+            else:
+                self._send(200, job)
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path not in ("/jobs", "/insert"):
+            self._send(404, {"error": "Not found"})
+            return
+
+        payload = self._read_json()
+        if payload is None:
+            return
+        if path == "/insert":
+            self._insert(payload)
+            return
+        branch = payload.get("branch")
+        orders = payload.get("orders")
+
+        if branch not in self.depots:
+            self._send(400, {"error": f"Unknown branch: {branch}"})
+            return
+        if orders is not None and (not isinstance(orders, list) or not orders):
+            self._send(400, {"error": "orders must be a non-empty list of order rows"})
+            return
+        if orders is None and branch not in ORDERS_CSVS:
+            self._send(400, {"error": f"No order file configured for branch {branch}; send orders"})
+            return
+
+        try:
+            if orders is None:
+                job_id = self.jobs.submit(
+                    _solve_branch_job, branch, ORDERS_CSVS[branch], self.depots,
+                    cluster_worker_budget(self.jobs.max_workers),
+                    description={"branch": branch, "orders": "file"},
+                )
+            else:
+                job_id = self.jobs.submit(
+                    _solve_orders_job, branch, orders, self.depots,
+                    cluster_worker_budget(self.jobs.max_workers),
+                    description={"branch": branch, "orders": len(orders)},
+                )
+        except JobQueueFullError as e:
+            self._send(429, {"error": str(e)})
+            return
+
+        logger.info(f"Queued job {job_id} for {branch}")
+        self._send(202, {"id": job_id, "status_url": f"/jobs/{job_id}"})
+
+    def _insert(self, payload: dict):
+        branch = payload.get("branch")
+        if branch not in self.depots:
+            self._send(400, {"error": f"Unknown branch: {branch}"})
+            return
+        try:
+            latitude, longitude = float(payload["latitude"]), float(payload["longitude"])
+            demand = float(payload["demand"])
+            window = payload.get("time_window")
+            progress = {int(route): int(steps) for route, steps in (payload.get("progress") or {}).items()}
+            now = payload.get("now")
+        except (KeyError, TypeError, ValueError):
+            self._send(400, {"error": "latitude, longitude and demand are required numbers"})
+            return
+
+        try:
+            # insert_order çözüm dosyasını şube kilidiyle (file_lock) günceller; aynı şubenin
+            # eklemeleri ve işçi süreçlerindeki çözüm işleri sırayla yazar
+            result = insert_order(
+                branch, latitude, longitude, demand,
+                tuple(window) if window else None, int(now) if now is not None else None, progress or None,
+            )
+        except FileNotFoundError:
+            self._send(404, {"error": f"No saved plan for {branch}; solve it first"})
+            return
+        except ValueError as e:
+            self._send(409, {"error": str(e)})
+            return
+        self._send(200 if result["status"] == "OK" else 409, result)
+
+    def _render_metrics(self) -> str:
+        latest = {}
+        for job in self.jobs.list():
+            if job["status"] == JOB_DONE:
+                result = (self.jobs.get(job["id"]) or {}).get("result") or {}
+                if "metrics" in result:
+                    latest[job["branch"]] = result["metrics"]
+        return render_prometheus(latest.values(), {
+            "vrp_service_active_jobs": self.jobs.active,
+            "vrp_service_workers": self.jobs.max_workers,
+        })
+
+    def _read_json(self) -> Optional[dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": "Request body too large"})
+            return None
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "Body must be JSON"})
+            return None
+        if not isinstance(payload, dict):
+            self._send(400, {"error": "Body must be a JSON object"})
+            return None
+        return payload
+
+    def _send(self, code: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, code: int, text: str):
+        body = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: Optional[int] = None,
+    max_queued: int = 16,
+    depots_path: str = DEPOTS_JSON,
+):
+    """
+    Builds the HTTP server and its job queue.
+
+    Args:
+        host (str): Interface to bind; localhost by default.
+        port (int): Port to bind; 0 picks a free port.
+        workers (Optional[int]): Solver processes; defaults to MAX_BRANCH_WORKERS.
+        max_queued (int): Jobs allowed to wait for a free worker.
+        depots_path (str): Depot JSON file, loaded once.
+
+    Returns:
+        Tuple[ThreadingHTTPServer, JobQueue]: Server (not yet serving) and its queue.
+    """
+    depots = {depot.name: depot for depot in load_depots(depots_path)}
+    jobs = JobQueue(workers or MAX_BRANCH_WORKERS, max_queued, initializer=_warm_worker)
+    handler = type("Handler", (SolveRequestHandler,), {"jobs": jobs, "depots": depots})
+    return ThreadingHTTPServer((host, port), handler), jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-queued", type=int, default=16)
+    parser.add_argument("--depots", default=DEPOTS_JSON)
+    args = parser.parse_args()
+
+    server, jobs = create_server(args.host, args.port, args.workers, args.max_queued, args.depots)
+    logger.info(f"Solve service on http://{args.host}:{server.server_address[1]} "
+                f"({jobs.max_workers} workers, {jobs.max_queued} queued)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from app.services.travel_time_estimator import EARTH_RADIUS_M, nearest_neighbors
+
+# Yarıçap içindeki komşular bu sayıdan başlayarak aranır; yetmezse ikiye katlanır
+RADIUS_NEIGHBORS = 8
+
+
+class StopAggregation(NamedTuple):
+    """
+    Orders merged into routing stops.
+
+    Attributes:
+        stop_orders (List[np.ndarray]): Order indices served at each stop.
+        demand (np.ndarray): Summed demand per stop.
+        service_time (np.ndarray): Summed service seconds per stop.
+    """
+    stop_orders: List[np.ndarray]
+    demand: np.ndarray
+    service_time: np.ndarray
+
+    def representatives(self) -> np.ndarray:
+        """Index of the first order of each stop, whose coordinates the stop uses."""
+        return np.array([orders[0] for orders in self.stop_orders], dtype=np.int64)
+
+
+def _split_by_capacity(orders: np.ndarray, demands: np.ndarray, capacity: float) -> List[np.ndarray]:
+    pieces, current, load = [], [], 0.0
+    for order in orders.tolist():
+        if current and load + demands[order] > capacity:
+            pieces.append(np.array(current))
+            current, load = [], 0.0
+        current.append(order)
+        load += demands[order]
+    pieces.append(np.array(current))
+    return pieces
+
+
+def _pair_meters(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _radius_labels(latitude: np.ndarray, longitude: np.ndarray, tolerance_m: float) -> np.ndarray:
+    # Her siparişin yarıçap içindeki tüm komşuları bulunana kadar k büyütülür
+    size = len(latitude)
+    locations = [f"{lat},{lon}" for lat, lon in zip(latitude.tolist(), longitude.tolist())]
+    k = min(RADIUS_NEIGHBORS, size - 1)
+    while True:
+        neighbors = nearest_neighbors(locations, k)
+        within = _pair_meters(
+            latitude[:, None], longitude[:, None], latitude[neighbors], longitude[neighbors]
+        ) <= tolerance_m
+        if k >= size - 1 or not within[:, -1].any():
+            break
+        k = min(2 * k, size - 1)
+
+    # Union-find: yarıçap içindeki her çift aynı kümeye düşer
+    parent = list(range(size))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows, cols = np.nonzero(within)
+    for i, j in zip(rows.tolist(), neighbors[rows, cols].tolist()):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([find(i) for i in range(size)], dtype=np.int64)
+
+
+def aggregate_stops(
+    latitude: np.ndarray,
+    longitude: np.ndarray,
+    demands: np.ndarray,
+    service_times: np.ndarray,
+    vehicle_capacity: float,
+    tolerance_m: float = 10.0,
+) -> StopAggregation:
+    """
+    Merges orders at identical or near-identical coordinates into one stop.
+
+    Orders within `tolerance_m` meters (great-circle) of each other are
+    linked and every connected group becomes one stop with summed demand
+    and service time (exact coordinate match when 0). Linking is transitive,
+    so a chain of orders each within the tolerance of the next merges even
+    if its ends are farther apart. A stop whose demand exceeds
+    `vehicle_capacity` is split into several stops at the same place, each
+    within capacity (an order larger than a vehicle still stays on its own).
+
+    Args:
+        latitude (np.ndarray): Order latitudes.
+        longitude (np.ndarray): Order longitudes.
+        demands (np.ndarray): Order demands.
+        service_times (np.ndarray): Order service seconds.
+        vehicle_capacity (float): Capacity of one vehicle.
+        tolerance_m (float): Linking radius in meters.
+
+    Returns:
+        StopAggregation: Stops in order of their first order.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    demands = np.asarray(demands, dtype=np.float64)
+    service_times = np.asarray(service_times, dtype=np.int64)
+
+    if tolerance_m > 0 and len(latitude) > 1:
+        keys = _radius_labels(latitude, longitude, tolerance_m)[:, None]
+    else:
+        keys = np.column_stack([latitude, longitude])
+
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # Durakları ilk siparişlerinin sırasına göre numaralandır
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    group = rank[inverse]
+
+    order_by_group = np.argsort(group, kind="stable")
+    boundaries = np.flatnonzero(np.diff(group[order_by_group])) + 1
+    groups = np.split(order_by_group, boundaries) if len(order_by_group) else []
+
+    group_demand = np.bincount(group, weights=demands, minlength=len(first))
+    stop_orders = []
+    for g, orders in enumerate(groups):
+        if group_demand[g] > vehicle_capacity and len(orders) > 1:
+            stop_orders.extend(_split_by_capacity(orders, demands, vehicle_capacity))
+        else:
+            stop_orders.append(orders)
+
+    return StopAggregation(
+        stop_orders=stop_orders,
+        demand=np.array([demands[orders].sum() for orders in stop_orders]),
+        service_time=np.array([service_times[orders].sum() for orders in stop_orders], dtype=np.int64),
+    )
+
+
+def expand_routes(
+    routes: List[List[Dict]],
+    aggregation: StopAggregation,
+    order_service_times: Sequence[int],
+    depot_index: int = 0,
+    depot_count: int = 1,
+) -> List[List[Dict]]:
+    """
+    Expands stop-level routes back to individual orders.
+
+    Stop node `s` (1-based, depot is 0) becomes its orders' nodes `1 + order`,
+    in the same node numbering as an unaggregated solve; with several depots
+    (nodes 0 to `depot_count` - 1) both offsets are `depot_count`. Orders at
+    one stop are served back to back, so each arrival is the stop arrival
+    plus the service time of the orders before it.
+
+    Args:
+        routes (List[List[Dict]]): Solver routes over stop nodes.
+        aggregation (StopAggregation): Result of `aggregate_stops`.
+        order_service_times (Sequence[int]): Service seconds per order.
+        depot_index (int): Index of the depot node.
+        depot_count (int): Number of depot nodes in front of the stops.
+
+    Returns:
+        List[List[Dict]]: Routes over order nodes, each step also carrying
+        its `stop_index`.
+    """
+    expanded = []
+    for route in routes:
+        steps = []
+        for step in route:
+            node = step["location_index"]
+            if node == depot_index or node < depot_count:
+                steps.append(step)
+                continue
+            arrival = step["arrival_time"]
+            for order in aggregation.stop_orders[node - depot_count].tolist():
+                steps.append({
+                    **step, "location_index": order + depot_count, "arrival_time": arrival, "stop_index": node
+                })
+                arrival += int(order_service_times[order])
+        expanded.append(steps)
+    return expanded
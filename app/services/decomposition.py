@@ -0,0 +1,472 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.fleet_sizing import estimate_min_fleet, solve_with_fleet_sizing
+from app.services.matrix_cache import slice_index
+from app.services.travel_time_estimator import parse_locations
+from app.services.vrp_solver import SearchOptions, solve_vrp_with_time_windows
+from app.services.warm_start import complete_routes
+from app.utils import setup_logger
+
+logger = setup_logger("multi_vrp")
+
+
+def sweep_clusters(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    demands: np.ndarray,
+    depot_index: int,
+    max_nodes: int,
+    max_demand: float,
+) -> List[np.ndarray]:
+    """
+    Sweep partition: stops sorted by polar angle around the depot are cut
+    into consecutive sectors holding at most `max_nodes` stops and
+    `max_demand` demand.
+
+    Returns:
+        List[np.ndarray]: Node indices of each cluster (depot excluded).
+    """
+    stops = np.array([i for i in range(len(lats)) if i != depot_index])
+    angles = np.arctan2(
+        lats[stops] - lats[depot_index],
+        (lons[stops] - lons[depot_index]) * np.cos(np.radians(lats[depot_index])),
+    )
+    order = stops[np.argsort(angles, kind="stable")]
+
+    clusters, current, load = [], [], 0.0
+    for node in order:
+        if current and (len(current) >= max_nodes or load + demands[node] > max_demand):
+            clusters.append(np.array(current))
+            current, load = [], 0.0
+        current.append(node)
+        load += demands[node]
+    if current:
+        clusters.append(np.array(current))
+    return clusters
+
+
+def kmeans_clusters(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    demands: np.ndarray,
+    depot_index: int,
+    max_nodes: int,
+    max_demand: float,
+    iterations: int = 20,
+    seed: int = 0,
+) -> List[np.ndarray]:
+    """
+    Capacity-aware k-means on the stop coordinates.
+
+    Each Lloyd iteration assigns (stop, center) pairs in order of increasing
+    distance while the center still has room for the stop's node count and
+    demand, so no cluster exceeds `max_nodes` or `max_demand`.
+
+    Returns:
+        List[np.ndarray]: Node indices of each non-empty cluster (depot excluded).
+    """
+    stops = np.array([i for i in range(len(lats)) if i != depot_index])
+    points = np.column_stack([lats[stops], lons[stops] * np.cos(np.radians(lats[depot_index]))])
+    stop_demands = demands[stops]
+
+    k = max(math.ceil(len(stops) / max_nodes), math.ceil(stop_demands.sum() / max_demand), 1)
+    # Kümelerde biraz boşluk bırak ki her durak bir yere sığsın
+    node_cap = min(math.ceil(len(stops) / k * 1.1), max_nodes)
+    demand_cap = min(max_demand, stop_demands.sum() / k * 1.1)
+
+    rng = np.random.default_rng(seed)
+    centers = points[rng.choice(len(points), size=k, replace=False)]
+    labels = np.full(len(points), -1)
+
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        flat_order = np.argsort(distances, axis=None, kind="stable")
+        point_of, center_of = np.unravel_index(flat_order, distances.shape)
+
+        new_labels = np.full(len(points), -1)
+        counts = np.zeros(k, dtype=int)
+        loads = np.zeros(k)
+        for p, c in zip(point_of.tolist(), center_of.tolist()):
+            if new_labels[p] != -1:
+                continue
+            if counts[c] < node_cap and loads[c] + stop_demands[p] <= demand_cap:
+                new_labels[p] = c
+                counts[c] += 1
+                loads[c] += stop_demands[p]
+        # Hiçbir kümeye sığmayanlar: en yakın kümeye
+        unassigned = new_labels == -1
+        new_labels[unassigned] = distances[unassigned].argmin(axis=1)
+
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = points[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+
+    return [stops[labels == c] for c in range(k) if np.any(labels == c)]
+
+
+def partition_stops(
+    locations: Sequence[str],
+    demands: Sequence[float],
+    vehicle_capacity: float,
+    depot_index: int = 0,
+    method: str = "sweep",
+    cluster_size: int = 300,
+    vehicles_per_cluster: Optional[int] = None,
+) -> List[np.ndarray]:
+    """
+    Partitions stops into geographic clusters.
+
+    Args:
+        locations (Sequence[str]): "lat,lon" strings, depot first.
+        demands (Sequence[float]): Per-node demands.
+        vehicle_capacity (float): Capacity of one vehicle.
+        depot_index (int): Index of the depot node.
+        method (str): "sweep" or "kmeans".
+        cluster_size (int): Maximum stops per cluster.
+        vehicles_per_cluster (Optional[int]): If set, caps each cluster's
+            demand at this many vehicle loads.
+
+    Returns:
+        List[np.ndarray]: Node indices of each cluster (depot excluded).
+    """
+    lats, lons = parse_locations(locations)
+    demands = np.asarray(demands, dtype=np.float64)
+    max_demand = vehicle_capacity * vehicles_per_cluster if vehicles_per_cluster else float("inf")
+
+    if method == "sweep":
+        return sweep_clusters(lats, lons, demands, depot_index, cluster_size, max_demand)
+    if method == "kmeans":
+        if not vehicles_per_cluster:
+            max_demand = max(demands.sum(), 1.0)
+        return kmeans_clusters(lats, lons, demands, depot_index, cluster_size, max_demand)
+    raise ValueError(f"Unknown clustering method: {method}")
+
+
+def route_cost(route: Sequence[int], distance_matrix, depot_index: int = 0) -> int:
+    """Travel time of a depot-to-depot route given as node indices (depot excluded)."""
+    path = np.array([depot_index, *route, depot_index])
+    return int(np.asarray(distance_matrix)[path[:-1], path[1:]].sum())
+
+
+def _solve_subproblem(
+    nodes: List[int],
+    sub_matrix: np.ndarray,
+    service_times: List[int],
+    demands: List[float],
+    time_windows: List[List[int]],
+    vehicle_capacity: int,
+    max_vehicles: int,
+    search: SearchOptions,
+    initial_routes: Optional[List[List[int]]] = None,
+    lunch_break: Optional[Tuple[int, int]] = None,
+    slice_starts: Optional[Sequence[int]] = None,
+    departure_waves: Optional[Sequence[int]] = None,
+    fleet_sizing: bool = True,
+    growth_factor: float = 1.25,
+) -> Dict:
+    """
+    Solves one sub-VRP over `nodes` (depot first) and maps the routes back to
+    global node indices. Runs in a worker process.
+
+    With `slice_starts`, `sub_matrix` is an (S, n, n) tensor and vehicle v
+    departs at `departure_waves[v % len(departure_waves)]`, as in a branch
+    solve; fleet bounds and warm starts use the first wave's slice.
+    """
+    waves = list(departure_waves or [time_windows[0][0]])
+    matrix = sub_matrix if slice_starts is None else sub_matrix[slice_index(slice_starts, waves[0])]
+    local_of = {node: i for i, node in enumerate(nodes)}
+    local_initial = None
+    if initial_routes:
+        local_initial = [[local_of[node] for node in route] for route in initial_routes]
+
+    def solve(vehicle_count: int):
+        warm = None
+        if local_initial:
+            warm = complete_routes(local_initial, matrix, demands, vehicle_count, vehicle_capacity)
+        return solve_vrp_with_time_windows(
+            distance_matrix=sub_matrix,
+            service_times=service_times,
+            vehicle_count=vehicle_count,
+            vehicle_capacity=vehicle_capacity,
+            order_demands=demands,
+            depot_index=0,
+            time_windows=time_windows,
+            lunch_breaks=[lunch_break] * vehicle_count if lunch_break else [],
+            search=search,
+            initial_routes=warm,
+            slice_starts=slice_starts,
+            vehicle_departures=[waves[v % len(waves)] for v in range(vehicle_count)],
+        )
+
+    if not fleet_sizing:
+        result = solve(max_vehicles)
+    else:
+        if local_initial:
+            min_vehicles = len(local_initial)
+        else:
+            min_vehicles = estimate_min_fleet(
+                matrix, service_times, demands, vehicle_capacity,
+                time_windows[0][1] - time_windows[0][0]
+            )
+        result = solve_with_fleet_sizing(solve, min_vehicles, max_vehicles, growth_factor)
+    if result["status"] != "OK":
+        return result
+
+    for route in result["routes"]:
+        for step in route:
+            step["location_index"] = nodes[step["location_index"]]
+    return result
+
+
+def cluster_fleet_caps(lower_bounds: Sequence[int], max_vehicles: int) -> Optional[List[int]]:
+    """
+    Splits the branch fleet over clusters so the merged plan stays within it.
+
+    Every cluster gets its fleet lower bound, and the vehicles left over are
+    shared in proportion to those bounds.
+
+    Args:
+        lower_bounds (Sequence[int]): `estimate_min_fleet` of each cluster.
+        max_vehicles (int): Vehicles available to the whole branch.
+
+    Returns:
+        Optional[List[int]]: Vehicle cap per cluster (summing to at most
+        `max_vehicles`), or None if the bounds alone exceed the fleet.
+    """
+    bounds = np.asarray(lower_bounds, dtype=np.int64)
+    if bounds.sum() > max_vehicles:
+        return None
+    share = (max_vehicles - bounds.sum()) * bounds / max(bounds.sum(), 1)
+    caps = bounds + np.floor(share).astype(np.int64)
+    # Kalan araçlar kesirli payı en büyük kümelere
+    for i in np.argsort(np.floor(share) - share, kind="stable")[:max_vehicles - caps.sum()]:
+        caps[i] += 1
+    return caps.tolist()
+
+
+def _subproblem_args(nodes, travel_times, service_times, demands, time_windows,
+                     vehicle_capacity, max_vehicles, search, initial_routes=None):
+    # Matris (N, N) ya da zaman dilimli tensör (S, N, N): son iki eksen düğümler
+    index = np.asarray(nodes)
+    return (
+        list(nodes),
+        np.ascontiguousarray(np.asarray(travel_times)[..., index[:, None], index[None, :]]),
+        [service_times[i] for i in nodes],
+        [demands[i] for i in nodes],
+        [time_windows[i] for i in nodes],
+        vehicle_capacity,
+        max_vehicles,
+        search,
+        initial_routes,
+    )
+
+
+def _stops(routes: List[List[Dict]], depot_index: int) -> List[List[int]]:
+    return [[step["location_index"] for step in route if step["location_index"] != depot_index]
+            for route in routes]
+
+
+def solve_decomposed(
+    distance_matrix,
+    locations: Sequence[str],
+    service_times: Sequence[int],
+    order_demands: Sequence[float],
+    vehicle_capacity: int,
+    max_vehicles: int,
+    time_windows: Sequence[Sequence[int]],
+    depot_index: int = 0,
+    method: str = "sweep",
+    cluster_size: int = 300,
+    workers: Optional[int] = None,
+    search: SearchOptions = SearchOptions(),
+    repair_time_limit: int = 10,
+    initial_routes: Optional[List[List[int]]] = None,
+    lunch_break: Optional[Tuple[int, int]] = None,
+    tensor: Optional[np.ndarray] = None,
+    slice_starts: Optional[Sequence[int]] = None,
+    departure_waves: Optional[Sequence[int]] = None,
+    fleet_sizing: bool = True,
+    growth_factor: float = 1.25,
+) -> Dict:
+    """
+    Cluster-first, route-second solve for large branches.
+
+    Stops are partitioned geographically, each cluster is solved as an
+    independent sub-VRP in a worker process, and then a boundary-repair pass
+    re-solves each pair of neighboring clusters together (warm-started from
+    their current routes, with a short time limit), keeping the result when
+    it lowers their total travel time. Pairs are repaired in two phases of
+    disjoint pairs so each phase also runs in parallel.
+
+    `max_vehicles` is split over the clusters (see `cluster_fleet_caps`), so
+    the merged plan never uses more vehicles than the branch has. Vehicles a
+    cluster leaves unused go to the clusters that were infeasible with their
+    share, which are solved once more; a repaired pair keeps its route count.
+
+    Every sub-problem gets the branch's search options, lunch break, warm
+    start (the previous routes cut down to the cluster's stops), departure
+    waves and time slices, so a decomposed solve models the same day as a
+    single one. Snapshots are the exception: clusters do not write
+    `search.snapshot_path`.
+
+    Args:
+        distance_matrix: Full square travel-time matrix (may be memory-mapped).
+        locations (Sequence[str]): "lat,lon" strings, depot first.
+        service_times (Sequence[int]): Per-node service times in seconds.
+        order_demands (Sequence[float]): Per-node demands.
+        vehicle_capacity (int): Capacity of one vehicle.
+        max_vehicles (int): Vehicles available to the whole branch.
+        time_windows (Sequence[Sequence[int]]): Per-node [start, end] windows.
+        depot_index (int): Index of the depot node.
+        method (str): "sweep" or "kmeans".
+        cluster_size (int): Maximum stops per cluster.
+        workers (Optional[int]): Worker processes (default: CPU count). Pass
+            a share of the cores when several branches are solved at once.
+        search (SearchOptions): Search options of every cluster solve
+            (time limit, adaptive mode, neighbor restriction).
+        repair_time_limit (int): Search limit per boundary pair in seconds.
+        initial_routes (Optional[List[List[int]]]): Warm-start routes of
+            global node indices, depot excluded.
+        lunch_break (Optional[Tuple[int, int]]): Break window every vehicle
+            takes (see `add_lunch_breaks`).
+        tensor (Optional[np.ndarray]): (S, N, N) time-sliced travel times the
+            sub-problems are solved on; `distance_matrix` (the first wave's
+            slice) still drives clustering, fleet bounds and repair costs.
+        slice_starts (Optional[Sequence[int]]): Start time of each slice of
+            `tensor`.
+        departure_waves (Optional[Sequence[int]]): Departure times assigned
+            round-robin to each sub-problem's vehicles.
+        fleet_sizing (bool): Grow each cluster's fleet from its lower bound
+            (`solve_with_fleet_sizing`); otherwise solve with its whole cap.
+        growth_factor (float): Fleet growth factor while sizing.
+
+    Returns:
+        Dict: {"status": "OK", "routes": [...]} with global location indices,
+        or {"status": "No solution found", ...} if a cluster failed or the
+        clusters' fleet lower bounds exceed `max_vehicles`.
+    """
+    clusters = partition_stops(
+        locations, order_demands, vehicle_capacity, depot_index, method, cluster_size
+    )
+    logger.info(f"Decomposed {len(locations) - 1} stops into {len(clusters)} {method} clusters")
+
+    # Komşuluk için kümeleri depo etrafındaki açıya göre sırala
+    lats, lons = parse_locations(locations)
+    lon_scale = np.cos(np.radians(lats[depot_index]))
+    angles = [
+        np.arctan2(lats[c].mean() - lats[depot_index], (lons[c].mean() - lons[depot_index]) * lon_scale)
+        for c in clusters
+    ]
+    clusters = [clusters[i] for i in np.argsort(angles, kind="stable")]
+    cluster_of = {node: i for i, cluster in enumerate(clusters) for node in cluster.tolist()}
+
+    if search.snapshot_path:
+        logger.warning("Snapshots are not written for decomposed solves")
+    cluster_search = search._replace(snapshot_path=None)
+    repair_search = cluster_search._replace(time_limit=repair_time_limit)
+    travel_times = distance_matrix if tensor is None else tensor
+    options = {
+        "lunch_break": lunch_break, "slice_starts": slice_starts, "departure_waves": departure_waves,
+        "fleet_sizing": fleet_sizing, "growth_factor": growth_factor,
+    }
+
+    def submit(pool, nodes, vehicles, limits, initial=None):
+        return pool.submit(_solve_subproblem, *_subproblem_args(
+            nodes, travel_times, service_times, order_demands, time_windows, vehicle_capacity,
+            vehicles, limits, initial
+        ), **options)
+
+    # Önceki günün rotaları kümelere bölünür: her rota, kümenin duraklarıyla sınırlanır
+    cluster_initial = [None] * len(clusters)
+    if initial_routes:
+        cluster_initial = [
+            [route for route in ([node for node in route if cluster_of.get(node) == i]
+                                 for route in initial_routes) if route] or None
+            for i in range(len(clusters))
+        ]
+
+    cluster_nodes = [[depot_index, *cluster.tolist()] for cluster in clusters]
+    shift_seconds = time_windows[depot_index][1] - time_windows[depot_index][0]
+    bounds = []
+    for nodes in cluster_nodes:
+        index = np.asarray(nodes)
+        bounds.append(estimate_min_fleet(
+            np.asarray(distance_matrix)[np.ix_(index, index)], [service_times[i] for i in nodes],
+            [order_demands[i] for i in nodes], vehicle_capacity, shift_seconds
+        ))
+    caps = cluster_fleet_caps(bounds, max_vehicles)
+    if caps is None:
+        logger.warning(f"Cluster fleet lower bounds need {sum(bounds)} vehicles, only {max_vehicles} available")
+        return {"status": "No solution found", "fleet_lower_bound": sum(bounds)}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            submit(pool, nodes, cap, cluster_search, initial)
+            for nodes, cap, initial in zip(cluster_nodes, caps, cluster_initial)
+        ]
+        results = [future.result() for future in futures]
+
+        failed = [i for i, result in enumerate(results) if result["status"] != "OK"]
+        if failed:
+            # Çözülen kümelerin kullanmadığı araçlar çözülemeyenlere dağıtılır
+            spare = max_vehicles - sum(len(result["routes"]) for result in results if result["status"] == "OK")
+            retry_caps = cluster_fleet_caps([caps[i] for i in failed], spare)
+            if retry_caps is None or retry_caps == [caps[i] for i in failed]:
+                return {"status": "No solution found", "failed_clusters": failed}
+            logger.info(f"Re-solving clusters {failed} with {retry_caps} vehicles")
+            futures = {
+                i: submit(pool, cluster_nodes[i], cap, cluster_search, cluster_initial[i])
+                for i, cap in zip(failed, retry_caps)
+            }
+            for i, future in futures.items():
+                results[i] = future.result()
+            failed = [i for i, result in enumerate(results) if result["status"] != "OK"]
+            if failed:
+                return {"status": "No solution found", "failed_clusters": failed}
+        cluster_routes = [result["routes"] for result in results]
+
+        # SINIR ONARIMI: komşu küme çiftleri (süpürme sırasında ardışık olanlar)
+        if len(clusters) > 1:
+            pairs = [(i, (i + 1) % len(clusters)) for i in range(len(clusters))]
+            if len(clusters) == 2:
+                pairs = pairs[:1]
+            phases = [pairs[0::2], pairs[1::2]]
+            if len(pairs) % 2 == 1 and len(pairs) > 1:
+                # Çember tek sayıda: son çift ilk çiftle küme paylaşır
+                phases.append([phases[0].pop()])
+
+            for phase in phases:
+                submitted = []
+                for a, b in phase:
+                    routes = _stops(cluster_routes[a], depot_index) + _stops(cluster_routes[b], depot_index)
+                    nodes = [depot_index] + [node for route in routes for node in route]
+                    before = sum(route_cost(route, distance_matrix, depot_index) for route in routes)
+                    # Çift mevcut araç sayısını aşamaz, böylece toplam filo sınırı korunur
+                    future = submit(pool, nodes, len(routes), repair_search, routes)
+                    submitted.append((a, b, before, future))
+
+                for a, b, before, future in submitted:
+                    repaired = future.result()
+                    if repaired["status"] != "OK":
+                        continue
+                    after = sum(route_cost(route, distance_matrix, depot_index)
+                                for route in _stops(repaired["routes"], depot_index))
+                    if after < before:
+                        logger.info(f"Boundary repair {a}-{b}: {before} -> {after}")
+                        # Her rota, duraklarının çoğunun ait olduğu kümeye döner
+                        cluster_routes[a], cluster_routes[b] = [], []
+                        for route in repaired["routes"]:
+                            members = [cluster_of[node] for node in _stops([route], depot_index)[0]]
+                            owner = a if members.count(a) >= members.count(b) else b
+                            cluster_routes[owner].append(route)
+
+    routes = [route for routes in cluster_routes for route in routes]
+    return {"status": "OK", "routes": routes}
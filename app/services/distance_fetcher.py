@@ -0,0 +1,295 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+from app.exceptions import DistanceMatrixAPIError
+
+# Google tarafında geçici kabul edilen hatalar: tekrar denenebilir
+TRANSIENT_HTTP_CODES = {429, 500, 502, 503, 504}
+TRANSIENT_API_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+def next_departure_time(seconds_of_day: int, now: Optional[float] = None) -> int:
+    """
+    Unix time of the next local occurrence of `seconds_of_day`.
+
+    The API only predicts traffic for the present or the future, so a time
+    slice such as 08:00 is requested for the coming 08:00 (today or tomorrow).
+
+    Args:
+        seconds_of_day (int): Seconds since local midnight.
+        now (Optional[float]): Reference Unix time; the current time when omitted.
+
+    Returns:
+        int: Unix time in seconds.
+    """
+    now = time.time() if now is None else now
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    departure = midnight + timedelta(seconds=seconds_of_day)
+    if departure.timestamp() <= now:
+        departure += timedelta(days=1)
+    return int(departure.timestamp())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting request rate across all workers.
+
+    Args:
+        rate (float): Tokens added per second (sustained requests per second).
+        capacity (Optional[float]): Maximum burst size; defaults to `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available and consumes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def plan_tiles(
+    n_origins: int,
+    n_destinations: int,
+    max_elements: int = 100,
+    max_origins: int = 25,
+    max_destinations: int = 25,
+) -> List[Tuple[slice, slice]]:
+    """
+    Splits an origins x destinations matrix into the fewest API-sized tiles.
+
+    Every (rows, cols) tile shape allowed by the per-request limits is tried
+    and the one needing the fewest requests wins, so e.g. a 3 x 200 block is
+    fetched as 3 x 25 tiles rather than 10 x 10 tiles.
+
+    Args:
+        n_origins (int): Number of origins.
+        n_destinations (int): Number of destinations.
+        max_elements (int): Maximum origins * destinations per request.
+        max_origins (int): Maximum origins per request.
+        max_destinations (int): Maximum destinations per request.
+
+    Returns:
+        List[Tuple[slice, slice]]: Origin and destination slices of each tile.
+    """
+    if n_origins == 0 or n_destinations == 0:
+        return []
+
+    best = None
+    for rows in range(1, min(max_origins, n_origins) + 1):
+        cols = min(max_destinations, n_destinations, max_elements // rows)
+        if cols < 1:
+            break
+        requests_needed = -(-n_origins // rows) * -(-n_destinations // cols)
+        if best is None or requests_needed < best[0]:
+            best = (requests_needed, rows, cols)
+
+    _, rows, cols = best
+    return [
+        (slice(i, min(i + rows, n_origins)), slice(j, min(j + cols, n_destinations)))
+        for i in range(0, n_origins, rows)
+        for j in range(0, n_destinations, cols)
+    ]
+
+
+class DistanceMatrixFetcher:
+    """
+    Concurrent Distance Matrix client with connection pooling, rate limiting
+    and retries.
+
+    Tiles are fetched by a pool of worker threads sharing one pooled
+    `requests.Session`; a shared token bucket keeps the overall request rate
+    under the quota. Transient failures (HTTP 429/5xx, OVER_QUERY_LIMIT,
+    connection errors) are retried with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: Optional[str] = None,
+        workers: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: float = 30.0,
+        max_elements: Optional[int] = None,
+        max_origins: Optional[int] = None,
+        max_destinations: Optional[int] = None,
+    ):
+        self.api_key = api_key if api_key is not None else settings.GOOGLE_API_KEY
+        self.url = url or settings.GOOGLE_DISTANCE_MATRIX_URL
+        self.workers = workers or settings.DISTANCE_MATRIX_WORKERS
+        self.max_retries = settings.DISTANCE_MATRIX_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.max_elements = max_elements or settings.DISTANCE_MATRIX_MAX_ELEMENTS
+        self.max_origins = max_origins or settings.DISTANCE_MATRIX_MAX_ORIGINS
+        self.max_destinations = max_destinations or settings.DISTANCE_MATRIX_MAX_DESTINATIONS
+        self.rate_limiter = TokenBucket(requests_per_second or settings.DISTANCE_MATRIX_QPS)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fetch(
+        self, origins: Sequence[str], destinations: Sequence[str], departure_time: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Fetches the full origins x destinations travel-time matrix.
+
+        Args:
+            origins (Sequence[str]): "lat,lon" origin strings.
+            destinations (Sequence[str]): "lat,lon" destination strings.
+            departure_time (Optional[int]): Unix time the traffic prediction is
+                for (see `next_departure_time`); the moment of each request when omitted.
+
+        Returns:
+            np.ndarray: int32 matrix of durations in seconds.
+
+        Raises:
+            DistanceMatrixAPIError: If a tile fails permanently or retries run out.
+        """
+        matrix = np.zeros((len(origins), len(destinations)), dtype=np.int32)
+        tiles = plan_tiles(
+            len(origins), len(destinations), self.max_elements, self.max_origins, self.max_destinations
+        )
+
+        def run(tile: Tuple[slice, slice]) -> None:
+            rows, cols = tile
+            matrix[rows, cols] = self._request_tile(origins[rows], destinations[cols], departure_time)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # list() ilk hatayı yeniden fırlatır
+            list(pool.map(run, tiles))
+
+        return matrix
+
+    def fetch_rows(self, origins: Sequence[str], destination_lists: Sequence[Sequence[str]]) -> List[np.ndarray]:
+        """
+        Fetches a different destination list for each origin.
+
+        Each origin is requested only against its own destinations (split to
+        the per-request limits), so the billed elements are exactly the sum
+        of the list lengths rather than a full rectangle.
+
+        Args:
+            origins (Sequence[str]): "lat,lon" origin strings.
+            destination_lists (Sequence[Sequence[str]]): Destinations per origin.
+
+        Returns:
+            List[np.ndarray]: int32 durations in seconds, one array per origin.
+
+        Raises:
+            DistanceMatrixAPIError: If a request fails permanently or retries run out.
+        """
+        rows = [np.zeros(len(destinations), dtype=np.int32) for destinations in destination_lists]
+        chunk = min(self.max_destinations, self.max_elements)
+        tasks = [
+            (i, start)
+            for i, destinations in enumerate(destination_lists)
+            for start in range(0, len(destinations), chunk)
+        ]
+
+        def run(task: Tuple[int, int]) -> None:
+            i, start = task
+            destinations = destination_lists[i][start:start + chunk]
+            rows[i][start:start + len(destinations)] = self._request_tile([origins[i]], destinations)[0]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(run, tasks))
+
+        return rows
+
+    def _request_tile(
+        self, origins: Sequence[str], destinations: Sequence[str], departure_time: Optional[int] = None
+    ) -> List[List[int]]:
+        params = {
+            "origins": "|".join(origins),
+            "destinations": "|".join(destinations),
+            "key": self.api_key,
+            "traffic_model": "best_guess",
+            "units": "metric",
+            "mode": "driving",
+        }
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            # Verilmediyse şu anki zaman, her istek için güncel
+            params["departure_time"] = departure_time or int(time.time())
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = DistanceMatrixAPIError(f"Connection error: {e}")
+            else:
+                if response.status_code in TRANSIENT_HTTP_CODES:
+                    error = DistanceMatrixAPIError(f"HTTP {response.status_code}: {response.text}")
+                elif response.status_code != 200:
+                    raise DistanceMatrixAPIError(f"HTTP {response.status_code}: {response.text}")
+                else:
+                    data = response.json()
+                    status = data.get("status", "Unknown error")
+                    if status == "OK":
+                        return self._parse_rows(data, len(origins), len(destinations))
+                    if status not in TRANSIENT_API_STATUSES:
+                        raise DistanceMatrixAPIError(status)
+                    error = DistanceMatrixAPIError(status)
+
+            if attempt < self.max_retries:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                time.sleep(delay * (0.5 + random.random() / 2))
+
+        raise error
+
+    @staticmethod
+    def _parse_rows(data: dict, n_origins: int, n_destinations: int) -> List[List[int]]:
+        rows = data.get("rows", [])
+        if len(rows) != n_origins:
+            raise DistanceMatrixAPIError(f"Expected {n_origins} rows, got {len(rows)}")
+
+        durations = []
+        for row in rows:
+            elements = row.get("elements", [])
+            if len(elements) != n_destinations:
+                raise DistanceMatrixAPIError(f"Expected {n_destinations} elements, got {len(elements)}")
+            values = []
+            for element in elements:
+                if element.get("status") != "OK":
+                    raise DistanceMatrixAPIError(f"Element error: {element.get('status')}")
+                values.append(element["duration"]["value"])
+            durations.append(values)
+        return durations
@@ -1,109 +1,572 @@
-import requests
-from typing import List
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 from app.config import settings
-from app.exceptions import DistanceMatrixAPIError
-import time
-import os
-import json
+from app.services.distance_fetcher import DistanceMatrixFetcher, next_departure_time
+from app.services.matrix_cache import load_matrix, load_tensor, migrate_json_cache, save_matrix, save_tensor
+from app.services.pair_store import DistancePairStore
+from app.services.travel_time_estimator import SpeedModel, estimate_distance_matrix, nearest_neighbors
+import numpy as np
 
-import os
-import json
-from typing import List
+# Süreç içi önbellek: şube -> (lokasyonlar, matris). Uzun ömürlü servis
+# süreçlerinde aynı şube tekrar çözülürken diskten yeniden yükleme yapılmaz.
+_loaded_matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
 
 
-def load_or_build_distance_matrix(locations: List[str], branch_name: str) -> List[List[int]]:
-    cache_path = f"/Users/reyyansarikaya/Desktop/Projects/master_vrp/app/cache/{branch_name.lower()}_distance_matrix.json"
+def preload_branch_caches(branch_names: Sequence[str]) -> List[str]:
+    """
+    Loads the binary caches of the given branches into this process.
+
+    Meant for long-running worker processes: the memory-mapped matrices are
+    read once so their pages are resident, and later calls to
+    `load_or_build_distance_matrix` for the same locations skip the disk.
+
+    Args:
+        branch_names (Sequence[str]): Branches to preload; missing caches are skipped.
+
+    Returns:
+        List[str]: Branches that were loaded.
+    """
+    loaded = []
+    for branch_name in branch_names:
+        try:
+            matrix, meta = load_matrix(branch_name)
+        except (FileNotFoundError, ValueError):
+            continue
+        if meta.get("locations") is None:
+            continue
+        matrix.sum()  # sayfaları belleğe al
+        _loaded_matrices[branch_name.lower()] = (meta["locations"], matrix)
+        loaded.append(branch_name)
+    return loaded
+
+
+def cached_branch_matrix(branch_name: str) -> Optional[Tuple[List[str], np.ndarray]]:
+    """
+    Returns the branch's last matrix and the locations it was built for.
+
+    The in-process copy is preferred; otherwise the binary cache is
+    memory-mapped (and kept for later calls). Nothing is fetched.
+
+    Args:
+        branch_name (str): Branch the matrix belongs to.
+
+    Returns:
+        Optional[Tuple[List[str], np.ndarray]]: Locations and matrix, or None
+        if there is no cache with recorded locations.
+    """
+    loaded = _loaded_matrices.get(branch_name.lower())
+    if loaded is None and preload_branch_caches([branch_name]):
+        loaded = _loaded_matrices[branch_name.lower()]
+    return loaded
+
+
+def solution_matrix_nodes(solution: Dict, branch_name: str) -> Tuple[Optional[np.ndarray], Dict[int, int]]:
+    """
+    Maps the location indices of a saved solution to the branch matrix.
+
+    Locations are matched by coordinate; orders merged into one stop share
+    the row of the stop's representative.
+
+    Args:
+        solution (Dict): Solution with "routes" (step dicts) and "locations";
+            a "matrix_cache" entry (joint solves) names the cache to use.
+        branch_name (str): Branch whose cached matrix is used otherwise.
+
+    Returns:
+        Tuple[Optional[np.ndarray], Dict[int, int]]: The matrix and location
+        index -> matrix node, or (None, {}) without a cache.
+    """
+    cached = cached_branch_matrix(solution.get("matrix_cache", branch_name))
+    if cached is None:
+        return None, {}
+    matrix_locations, matrix = cached
+    by_coordinate = {location: node for node, location in enumerate(matrix_locations)}
+
+    nodes, stop_nodes = {}, {}
+    steps = [step for route in solution["routes"] for step in route]
+    for step in steps:
+        node = by_coordinate.get(solution["locations"][step["location_index"]])
+        if node is not None:
+            nodes[step["location_index"]] = node
+            if "stop_index" in step:
+                stop_nodes[step["stop_index"]] = node
+    # Birleştirilmiş duraktaki diğer siparişler, durağın temsilcisinin satırını kullanır
+    for step in steps:
+        if step["location_index"] not in nodes and step.get("stop_index") in stop_nodes:
+            nodes[step["location_index"]] = stop_nodes[step["stop_index"]]
+    depot_node = by_coordinate.get(solution["locations"][0])
+    if depot_node is not None:
+        nodes[0] = depot_node
+    return matrix, nodes
+
+
+def fetch_location_arcs(location: str, others: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Real travel times between one new location and a few existing ones.
+
+    Only these 2 * len(others) arcs are looked up in the pair store; the
+    missing ones are requested from the API and stored.
 
-    # 1. Eğer dosya varsa, yüklemeyi dene
-    if os.path.exists(cache_path):
+    Args:
+        location (str): "lat,lon" of the new location.
+        others (Sequence[str]): "lat,lon" of the locations to connect it to.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: int32 seconds from `location` to each
+        of `others`, and from each of `others` to `location`.
+
+    Raises:
+        DistanceMatrixAPIError: If any request fails.
+    """
+    others = list(others)
+    origins = [location] * len(others) + others
+    destinations = others + [location] * len(others)
+
+    store = DistancePairStore()
+    durations, known = store.lookup_pairs(origins, destinations)
+    missing = np.flatnonzero(~known)
+    if missing.size:
+        n = len(others)
+        outgoing = missing[missing < n]
+        incoming = missing[missing >= n] - n
+        with DistanceMatrixFetcher() as fetcher:
+            if outgoing.size:
+                durations[outgoing] = fetcher.fetch([location], [others[i] for i in outgoing.tolist()])[0]
+            if incoming.size:
+                durations[incoming + n] = fetcher.fetch([others[i] for i in incoming.tolist()], [location])[:, 0]
+        store.store_pairs(
+            [origins[a] for a in missing.tolist()],
+            [destinations[a] for a in missing.tolist()],
+            durations[missing],
+        )
+    return durations[:len(others)], durations[len(others):]
+
+
+def _load_branch_cache(locations: List[str], branch_name: str) -> Optional[np.ndarray]:
+    """
+    Returns the branch's binary cache if it was built for exactly these locations.
+
+    A legacy JSON cache is migrated the first time it is seen. It records no
+    locations, so it is only matched by size and its pairs are not seeded
+    into the pair store.
+    """
+    try:
         try:
-            with open(cache_path, "r") as f:
-                matrix = json.load(f)
-            # 2. Matrix'in geçerli 2D liste olduğunu kontrol et
-            if not matrix or not isinstance(matrix, list) or not all(isinstance(row, list) for row in matrix):
-                raise ValueError(f"Invalid matrix format in cache file: {cache_path}")
-            print(f"[INFO] Loaded cached distance matrix for {branch_name}")
-            print(f"[DEBUG] Matrix shape: {len(matrix)}x{len(matrix[0])}")
-            return matrix
-        except Exception as e:
-            print(f"[WARNING] Failed to load cache: {e}. Rebuilding matrix...")
-
-    # 3. Dosya yoksa ya da okuma başarısızsa yeniden oluştur
+            matrix, meta = load_matrix(branch_name)
+        except FileNotFoundError:
+            if migrate_json_cache(branch_name) is None:
+                return None
+            print(f"[INFO] Migrated JSON distance matrix cache for {branch_name}")
+            matrix, meta = load_matrix(branch_name)
+
+        # Matrix'in bugünkü lokasyonlara ait olduğunu kontrol et
+        if matrix.shape[0] != len(locations):
+            print(f"[INFO] Cached matrix for {branch_name} has {matrix.shape[0]} nodes, expected {len(locations)}")
+            return None
+        if meta.get("locations") is not None and meta["locations"] != list(locations):
+            print(f"[INFO] Cached matrix for {branch_name} was built for different locations")
+            return None
+        return matrix
+    except Exception as e:
+        print(f"[WARNING] Failed to load cache: {e}. Rebuilding matrix...")
+        return None
+
+
+def complete_distance_matrix(locations: List[str], matrix: np.ndarray, known: np.ndarray) -> np.ndarray:
+    """
+    Fetches only the unknown entries of a partially assembled matrix.
+
+    Locations missing most of their row (typically new addresses) get their
+    full row fetched first; the remaining gaps are then fetched column-wise
+    for just the rows that still need them. For k new locations among N this
+    costs about 2*k*N elements instead of N*N.
+
+    Args:
+        locations (List[str]): "lat,lon" strings, depot first.
+        matrix (np.ndarray): Partially filled matrix, updated in place.
+        known (np.ndarray): Boolean mask of filled entries, updated in place.
+
+    Returns:
+        np.ndarray: The completed matrix.
+    """
+    missing_per_row = (~known).sum(axis=1)
+    new_rows = np.flatnonzero(missing_per_row * 2 > len(locations))
+    if new_rows.size:
+        print(f"[INFO] Fetching {new_rows.size} new rows")
+        matrix[new_rows, :] = build_distance_matrix([locations[i] for i in new_rows], locations)
+        known[new_rows, :] = True
+
+    missing_cols = np.flatnonzero(~known.all(axis=0))
+    if missing_cols.size:
+        rows = np.flatnonzero(~known[:, missing_cols].all(axis=1))
+        print(f"[INFO] Fetching {missing_cols.size} missing columns for {rows.size} rows")
+        matrix[np.ix_(rows, missing_cols)] = build_distance_matrix(
+            [locations[i] for i in rows], [locations[j] for j in missing_cols]
+        )
+        known[np.ix_(rows, missing_cols)] = True
+
+    return matrix
+
+
+def load_or_build_distance_matrix(
+    locations: List[str], branch_name: str, source: Optional[str] = None, cache: bool = True
+) -> np.ndarray:
+    """
+    Returns the branch distance matrix, preferring the memory-mapped binary cache.
+
+    When the branch cache was built for a different set of locations, the
+    matrix is assembled from the coordinate pair store and only the pairs it
+    has never seen are requested from the API.
+
+    With `source="estimate"` no cache or API is touched: the matrix is
+    estimated offline from coordinates with the calibrated speed model, and
+    is never written to the caches.
+
+    Args:
+        locations (List[str]): "lat,lon" strings, depot first.
+        branch_name (str): Branch the matrix belongs to.
+        source (Optional[str]): "google" or "estimate"; defaults to
+            `settings.DISTANCE_MATRIX_SOURCE`.
+        cache (bool): Keep a newly built matrix as the branch's cache (file
+            and in-process copy). Off for one-off order sets, so they do not
+            replace the branch's production matrix; fetched pairs still go
+            to the pair store.
+
+    Returns:
+        np.ndarray: C-contiguous int32 matrix of travel times in seconds.
+    """
+    source = source or settings.DISTANCE_MATRIX_SOURCE
+    if source == "estimate":
+        print(f"[INFO] Estimating distance matrix offline for {branch_name}")
+        return estimate_distance_matrix(locations)
+    if source != "google":
+        raise ValueError(f"Unknown distance matrix source: {source}")
+
+    # 0. Bu süreçte aynı lokasyonlarla zaten yüklendiyse bellekten ver
+    loaded = _loaded_matrices.get(branch_name.lower())
+    if loaded is not None and loaded[0] == list(locations):
+        print(f"[INFO] Using in-memory distance matrix for {branch_name}")
+        return loaded[1]
+
+    # 1. Aynı lokasyonlar için binary cache varsa doğrudan kullan
+    matrix = _load_branch_cache(locations, branch_name)
+    if matrix is not None:
+        print(f"[INFO] Loaded cached distance matrix for {branch_name}")
+        print(f"[DEBUG] Matrix shape: {matrix.shape[0]}x{matrix.shape[1]}")
+        if cache:
+            _loaded_matrices[branch_name.lower()] = (list(locations), matrix)
+        return matrix
+
+    # 2. Bilinen çiftleri pair store'dan topla, eksikleri API'den çek
     print(f"[INFO] Building new distance matrix for {branch_name}")
-    matrix = build_distance_matrix(locations, locations)
-    print("[DEBUG] Matrix built")
-    print(f"[DEBUG] Matrix shape: {len(matrix)}x{len(matrix[0])}")
+    store = DistancePairStore()
+    matrix, known = store.lookup(locations)
+    print(f"[INFO] {int(known.sum())}/{known.size} pairs found in pair store")
+
+    fetched = ~known
+    if fetched.any():
+        complete_distance_matrix(locations, matrix, known)
+        store.store(locations, matrix, fetched)
+    print(f"[DEBUG] Matrix shape: {matrix.shape[0]}x{matrix.shape[1]}")
+    if not cache:
+        return matrix
 
-    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-    with open(cache_path, "w") as f:
-        json.dump(matrix, f)
+    cache_path = save_matrix(matrix, branch_name, locations)
     print(f"[INFO] Written to: {cache_path}")
 
+    _loaded_matrices[branch_name.lower()] = (list(locations), matrix)
     return matrix
 
-# Yardımcı: listeyi parçalayarak chunk'lara ayır
-def chunk_list(lst: List[str], chunk_size: int) -> List[List[str]]:
-    return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
 
-def build_distance_matrix(origins: List[str], destinations: List[str]) -> List[List[int]]:
+def load_or_build_travel_tensor(
+    locations: List[str], branch_name: str, slice_starts: Sequence[int], source: Optional[str] = None,
+    cache: bool = True
+) -> np.ndarray:
     """
-    Builds a full distance matrix by batching both origins and destinations
-    to stay under the Google Distance Matrix API 100 element limit.
-    Uses current traffic data.
+    Returns one travel-time matrix per time slice of the delivery day.
+
+    Each slice is requested with the departure time of its start (the next
+    occurrence of that time of day), so e.g. the 08:00 slice reflects
+    morning traffic regardless of when the matrix is built. The tensor is
+    cached per branch as one memory-mapped (S, N, N) int32 file and reused
+    while the locations and slice starts stay the same.
+
+    With `source="estimate"` every slice is the same offline estimate.
+
+    Args:
+        locations (List[str]): "lat,lon" strings, depot first.
+        branch_name (str): Branch the tensor belongs to.
+        slice_starts (Sequence[int]): Start of each slice in seconds since midnight.
+        source (Optional[str]): "google" or "estimate"; defaults to
+            `settings.DISTANCE_MATRIX_SOURCE`.
+        cache (bool): Write a newly built tensor to the branch cache; when
+            off it is only returned.
+
+    Returns:
+        np.ndarray: (S, N, N) int32 tensor of travel times in seconds.
+
+    Raises:
+        DistanceMatrixAPIError: If any batch request fails.
+    """
+    slice_starts = [int(start) for start in slice_starts]
+    source = source or settings.DISTANCE_MATRIX_SOURCE
+    if source == "estimate":
+        print(f"[INFO] Estimating distance matrix offline for {branch_name}")
+        matrix = estimate_distance_matrix(locations)
+        return np.broadcast_to(matrix, (len(slice_starts), *matrix.shape))
+    if source != "google":
+        raise ValueError(f"Unknown distance matrix source: {source}")
+
+    try:
+        tensor, meta = load_tensor(branch_name)
+        if meta.get("locations") == list(locations) and meta.get("slice_starts") == slice_starts:
+            print(f"[INFO] Loaded cached travel-time tensor for {branch_name}: {tensor.shape}")
+            return tensor
+        print(f"[INFO] Cached travel-time tensor for {branch_name} was built for different locations or slices")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARNING] Failed to load tensor cache: {e}. Rebuilding tensor...")
+
+    def slices():
+        with DistanceMatrixFetcher() as fetcher:
+            for start in slice_starts:
+                print(f"[INFO] Fetching {branch_name} slice {start // 3600:02d}:{start % 3600 // 60:02d}")
+                yield fetcher.fetch(locations, locations, next_departure_time(start))
+
+    if not cache:
+        return np.stack(list(slices()))
+    cache_path = save_tensor(slices(), branch_name, slice_starts, locations)
+    print(f"[INFO] Written to: {cache_path}")
+    return load_tensor(branch_name)[0]
+
+
+def build_distance_matrix(origins: List[str], destinations: List[str]) -> np.ndarray:
+    """
+    Builds a full distance matrix from the Google Distance Matrix API.
+
+    Requests are planned into the fewest tiles allowed by the per-request
+    element and origin/destination limits and fetched concurrently over a
+    pooled session, rate limited by a token bucket and retried on transient
+    errors (see `DistanceMatrixFetcher`). Uses current traffic data.
 
     Args:
         origins (List[str]): List of origin coordinates.
         destinations (List[str]): List of destination coordinates.
 
     Returns:
-        List[List[int]]: Full distance matrix (origins x destinations).
+        np.ndarray: Full int32 distance matrix (origins x destinations).
 
     Raises:
         DistanceMatrixAPIError: If any batch request fails.
     """
-    MAX_ELEMENTS = 100
-    chunk_size = max(1, int(MAX_ELEMENTS ** 0.5))
+    with DistanceMatrixFetcher() as fetcher:
+        return fetcher.fetch(origins, destinations)
+
+
+class SparseTravelTimes(NamedTuple):
+    """
+    Real travel times for candidate arcs only: each stop to its nearest
+    neighbors, plus every arc from and to the depot.
+
+    Attributes:
+        neighbors (np.ndarray): (N, k) candidate destination of each node.
+        durations (np.ndarray): (N, k) int32 seconds of those arcs.
+        depot_out (np.ndarray): int32 seconds from the depot to every node.
+        depot_in (np.ndarray): int32 seconds from every node to the depot.
+        depot_index (int): Index of the depot node.
+    """
+    neighbors: np.ndarray
+    durations: np.ndarray
+    depot_out: np.ndarray
+    depot_in: np.ndarray
+    depot_index: int = 0
 
-    origin_chunks = chunk_list(origins, chunk_size)
-    destination_chunks = chunk_list(destinations, chunk_size)
+    def to_dense(self, locations: List[str], penalty: float = 1.5, model: Optional[SpeedModel] = None) -> np.ndarray:
+        """
+        Expands to the square matrix the solver needs.
 
-    full_matrix = [[0 for _ in range(len(destinations))] for _ in range(len(origins))]
+        Non-candidate arcs get the offline estimate multiplied by `penalty`,
+        which keeps them usable but steers the search towards the real arcs.
 
-    for i, origin_chunk in enumerate(origin_chunks):
-        for j, destination_chunk in enumerate(destination_chunks):
-            departure_time = int(time.time())  # Şu anki zaman, her istek için güncel
+        Args:
+            locations (List[str]): "lat,lon" strings, depot first.
+            penalty (float): Multiplier for estimated arcs.
+            model (Optional[SpeedModel]): Speed model; the calibrated one when omitted.
 
-            params = {
-                "origins": "|".join(origin_chunk),
-                "destinations": "|".join(destination_chunk),
-                "key": settings.GOOGLE_API_KEY,
-                "departure_time": departure_time,
-                "traffic_model": "best_guess",
-                "units": "metric",
-                "mode": "driving"
-            }
+        Returns:
+            np.ndarray: C-contiguous int32 matrix of travel times in seconds.
+        """
+        matrix = estimate_distance_matrix(locations, model)
+        np.multiply(matrix, penalty, out=matrix, casting="unsafe")
+        rows = np.arange(len(matrix))
+        matrix[rows[:, None], self.neighbors] = self.durations
+        matrix[self.depot_index, :] = self.depot_out
+        matrix[:, self.depot_index] = self.depot_in
+        matrix[rows, rows] = 0
+        return matrix
 
-            print(f"\n--- API Request [{i},{j}] ---")
-            print(params)
 
-            response = requests.get(settings.GOOGLE_DISTANCE_MATRIX_URL, params=params)
+def build_sparse_travel_times(locations: List[str], k: int, depot_index: int = 0) -> SparseTravelTimes:
+    """
+    Fetches real durations for the k nearest neighbors of each stop and the depot arcs.
+
+    Arcs already in the pair store are reused; only the rest is requested,
+    each origin against its own neighbors. API elements and memory are
+    O(N*k) instead of O(N^2).
+
+    Args:
+        locations (List[str]): "lat,lon" strings, depot first.
+        k (int): Neighbors per stop.
+        depot_index (int): Index of the depot node.
+
+    Returns:
+        SparseTravelTimes: Candidate arcs with their durations.
+
+    Raises:
+        DistanceMatrixAPIError: If any request fails.
+    """
+    size = len(locations)
+    neighbors = nearest_neighbors(locations, k, exclude=[depot_index])
+    others = np.delete(np.arange(size), depot_index)
+
+    # Aday yaylar: komşu yayları, depodan çıkanlar, depoya dönenler
+    origins = np.concatenate([np.repeat(np.arange(size), neighbors.shape[1]),
+                              np.full(others.size, depot_index), others])
+    destinations = np.concatenate([neighbors.ravel(), others, np.full(others.size, depot_index)])
+    origin_locations = [locations[i] for i in origins.tolist()]
+    destination_locations = [locations[j] for j in destinations.tolist()]
+
+    store = DistancePairStore()
+    durations, known = store.lookup_pairs(origin_locations, destination_locations)
+    # Deponun komşu yayları depo satırıyla zaten çekiliyor
+    known[depot_index * neighbors.shape[1]:(depot_index + 1) * neighbors.shape[1]] = True
+    missing = np.flatnonzero(~known)
+    print(f"[INFO] Sparse matrix: {origins.size} candidate arcs ({origins.size * 100 / size ** 2:.1f}% of "
+          f"{size}x{size}), {missing.size} to fetch")
+
+    if missing.size:
+        with DistanceMatrixFetcher() as fetcher:
+            # Depoya dönüş sütunu tek hedefli; dikdörtgen parçalarla toplu çekilir
+            to_depot = missing[destinations[missing] == depot_index]
+            if to_depot.size:
+                column = fetcher.fetch([origin_locations[a] for a in to_depot.tolist()], [locations[depot_index]])
+                durations[to_depot] = column[:, 0]
 
-            if response.status_code != 200:
-                raise DistanceMatrixAPIError(f"HTTP {response.status_code}: {response.text}")
+            rest = missing[destinations[missing] != depot_index]
+            by_origin = {}
+            for arc in rest.tolist():
+                by_origin.setdefault(int(origins[arc]), []).append(arc)
+            rows = fetcher.fetch_rows(
+                [locations[i] for i in by_origin],
+                [[destination_locations[a] for a in arcs] for arcs in by_origin.values()],
+            )
+            for arcs, row in zip(by_origin.values(), rows):
+                durations[arcs] = row
 
-            data = response.json()
-            if data.get("status") != "OK":
-                raise DistanceMatrixAPIError(data.get("status", "Unknown error"))
+        store.store_pairs(
+            [origin_locations[a] for a in missing.tolist()],
+            [destination_locations[a] for a in missing.tolist()],
+            durations[missing],
+        )
 
-            for oi, row in enumerate(data["rows"]):
-                for di, element in enumerate(row["elements"]):
-                    if element.get("status") != "OK":
-                        raise DistanceMatrixAPIError(f"Element error: {element.get('status')}")
-                    orig_idx = i * chunk_size + oi
-                    dest_idx = j * chunk_size + di
-                    if orig_idx < len(origins) and dest_idx < len(destinations):
-                        full_matrix[orig_idx][dest_idx] = element["duration"]["value"]
+    n_neighbor_arcs = neighbors.size
+    depot_out = np.zeros(size, dtype=np.int32)
+    depot_in = np.zeros(size, dtype=np.int32)
+    depot_out[others] = durations[n_neighbor_arcs:n_neighbor_arcs + others.size]
+    depot_in[others] = durations[n_neighbor_arcs + others.size:]
+    neighbor_durations = durations[:n_neighbor_arcs].reshape(neighbors.shape)
+    neighbor_durations[depot_index] = depot_out[neighbors[depot_index]]
+    return SparseTravelTimes(
+        neighbors=neighbors,
+        durations=neighbor_durations,
+        depot_out=depot_out,
+        depot_in=depot_in,
+        depot_index=depot_index,
+    )
 
-            time.sleep(1)  # throttling önlemek için bekleme
 
-    return full_matrix
+def load_or_build_sparse_distance_matrix(
+    locations: List[str], branch_name: str, k: int, penalty: float = 1.5, source: Optional[str] = None
+) -> np.ndarray:
+    """
+    Sparse counterpart of `load_or_build_distance_matrix` for very large branches.
+
+    Only the candidate arcs (k nearest neighbors and depot arcs) come from
+    the API; the rest of the matrix is estimated and penalized (see
+    `SparseTravelTimes.to_dense`). The result is not written to the branch
+    cache, since most of it is estimated; the fetched arcs live in the pair
+    store. With `source="estimate"` this is the plain offline estimate.
+
+    Args:
+        locations (List[str]): "lat,lon" strings, depot first.
+        branch_name (str): Branch the matrix belongs to.
+        k (int): Neighbors per stop.
+        penalty (float): Multiplier for estimated arcs.
+        source (Optional[str]): "google" or "estimate"; defaults to
+            `settings.DISTANCE_MATRIX_SOURCE`.
+
+    Returns:
+        np.ndarray: C-contiguous int32 matrix of travel times in seconds.
+    """
+    source = source or settings.DISTANCE_MATRIX_SOURCE
+    if source == "estimate":
+        print(f"[INFO] Estimating distance matrix offline for {branch_name}")
+        return estimate_distance_matrix(locations)
+    if source != "google":
+        raise ValueError(f"Unknown distance matrix source: {source}")
+
+    print(f"[INFO] Building sparse distance matrix for {branch_name} (k={k})")
+    return build_sparse_travel_times(locations, k).to_dense(locations, penalty)
+
+
+def load_or_build_multi_depot_matrix(
+    locations: List[str],
+    blocks: Sequence[np.ndarray],
+    block_names: Sequence[str],
+    penalty: float = 1.5,
+    sparse_above: Optional[int] = None,
+    k: int = 20,
+    source: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Matrix of a joint multi-depot model with real durations only inside depot blocks.
+
+    Each block (a depot, the stops of its region and the boundary stops)
+    is loaded like a single-branch matrix under `{branch}_block`, so caches,
+    pair store and sparse mode apply as usual without replacing the branch's
+    own matrix cache; the boundary stops appear in
+    several blocks but their pairs are fetched once. Arcs between blocks
+    are never used by an allowed vehicle and are estimated and penalized
+    like the non-candidate arcs of a sparse matrix.
+
+    Args:
+        locations (List[str]): "lat,lon" strings, depots first.
+        blocks (Sequence[np.ndarray]): Node indices of each block, depot first.
+        block_names (Sequence[str]): Branch of each block.
+        penalty (float): Multiplier for arcs between blocks.
+        sparse_above (Optional[int]): Blocks with more stops use the sparse matrix.
+        k (int): Neighbors per stop for sparse blocks.
+        source (Optional[str]): "google" or "estimate"; defaults to
+            `settings.DISTANCE_MATRIX_SOURCE`.
+
+    Returns:
+        np.ndarray: C-contiguous int32 matrix of travel times in seconds.
+    """
+    source = source or settings.DISTANCE_MATRIX_SOURCE
+    if source == "estimate":
+        print(f"[INFO] Estimating joint distance matrix offline for {', '.join(block_names)}")
+        return estimate_distance_matrix(locations)
+    if source != "google":
+        raise ValueError(f"Unknown distance matrix source: {source}")
+
+    matrix = (estimate_distance_matrix(locations) * penalty).astype(np.int32)
+    for nodes, name in zip(blocks, block_names):
+        block_locations = [locations[i] for i in nodes.tolist()]
+        if sparse_above is not None and len(nodes) - 1 > sparse_above:
+            block = load_or_build_sparse_distance_matrix(block_locations, name, k, penalty, source)
+        else:
+            block = load_or_build_distance_matrix(block_locations, f"{name}_block", source)
+        matrix[np.ix_(nodes, nodes)] = block
+    np.fill_diagonal(matrix, 0)
+    print(f"[INFO] Joint matrix: {len(locations)} nodes, depot blocks of {[len(nodes) for nodes in blocks]} nodes")
+    return matrix
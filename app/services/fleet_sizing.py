@@ -0,0 +1,81 @@
+import math
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.utils import setup_logger
+
+logger = setup_logger("multi_vrp")
+
+
+def estimate_min_fleet(
+    distance_matrix,
+    service_times: List[int],
+    order_demands: List[float],
+    vehicle_capacity: float,
+    shift_seconds: int,
+    depot_index: int = 0,
+) -> int:
+    """
+    Lower bound on the number of vehicles any feasible plan needs.
+
+    Two bounds are combined:
+    - capacity: total demand divided by vehicle capacity;
+    - time: total service time plus, for every stop, its cheapest incoming
+      arc, divided by the shift length. Every stop must be reached over some
+      arc, so this never exceeds the real total route time.
+
+    Args:
+        distance_matrix: Square travel-time matrix in seconds.
+        service_times (List[int]): Per-node service times in seconds.
+        order_demands (List[float]): Per-node demands.
+        vehicle_capacity (float): Capacity of one vehicle.
+        shift_seconds (int): Working time available to one vehicle.
+        depot_index (int): Index of the depot node.
+
+    Returns:
+        int: Minimum fleet size (at least 1).
+    """
+    capacity_bound = math.ceil(float(np.sum(order_demands)) / vehicle_capacity)
+
+    matrix = np.array(distance_matrix, dtype=np.int64)
+    np.fill_diagonal(matrix, np.iinfo(np.int64).max)
+    cheapest_inbound = matrix.min(axis=0)
+    cheapest_inbound[depot_index] = 0
+    total_time = int(cheapest_inbound.sum()) + int(np.sum(service_times))
+    time_bound = math.ceil(total_time / shift_seconds)
+
+    return max(1, capacity_bound, time_bound)
+
+
+def solve_with_fleet_sizing(
+    solve: Callable[[int], Dict],
+    min_vehicles: int,
+    max_vehicles: int,
+    growth_factor: float = 1.25,
+) -> Dict:
+    """
+    Solves with the smallest fleet first and grows it only while infeasible.
+
+    A model with a tight fleet is much smaller than one with the full
+    `max_vehicles`, and an infeasible first-solution attempt fails fast, so
+    this is usually far cheaper than solving once with every vehicle.
+
+    Args:
+        solve (Callable[[int], Dict]): Runs the solver for a given vehicle count.
+        min_vehicles (int): Starting fleet size, e.g. from `estimate_min_fleet`.
+        max_vehicles (int): Largest fleet to try.
+        growth_factor (float): Multiplier applied to the fleet after a failure.
+
+    Returns:
+        Dict: Result of the first successful solve (with "fleet_size" added),
+        or the last failed result if even `max_vehicles` is infeasible.
+    """
+    vehicle_count = max(1, min(min_vehicles, max_vehicles))
+    while True:
+        logger.info(f"Trying fleet of {vehicle_count} vehicles (max {max_vehicles})")
+        result = solve(vehicle_count)
+        if result["status"] == "OK" or vehicle_count >= max_vehicles:
+            result["fleet_size"] = vehicle_count
+            return result
+        vehicle_count = min(max_vehicles, max(vehicle_count + 1, math.ceil(vehicle_count * growth_factor)))
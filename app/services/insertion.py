@@ -0,0 +1,391 @@
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.travel_time_estimator import SpeedModel, estimate_pair_times, load_speed_model, parse_locations
+
+
+class PlanTravelTimes:
+    """
+    Travel-time lookup over the location indices of a saved solution.
+
+    Locations that map to a node of the solve-time matrix use it; arcs set
+    with `set_arcs` (e.g. freshly fetched for a new order) override it; any
+    other pair is estimated offline from coordinates.
+
+    Args:
+        locations (Sequence[str]): "lat,lon" per location index, depot first.
+        matrix (Optional[np.ndarray]): Matrix the plan was solved with.
+        matrix_nodes (Optional[Dict[int, int]]): Location index -> matrix node.
+        model (Optional[SpeedModel]): Speed model for estimated arcs.
+    """
+
+    def __init__(
+        self,
+        locations: Sequence[str],
+        matrix: Optional[np.ndarray] = None,
+        matrix_nodes: Optional[Dict[int, int]] = None,
+        model: Optional[SpeedModel] = None,
+    ):
+        self.locations = list(locations)
+        self.lats, self.lons = parse_locations(self.locations)
+        self.matrix = matrix
+        self.node_map = np.full(len(self.locations), -1, dtype=np.int64)
+        if matrix is not None:
+            for location, node in (matrix_nodes or {}).items():
+                self.node_map[location] = node
+        self.model = model or load_speed_model()
+        self._arcs: Dict[Tuple[int, int], int] = {}
+        self._arc_nodes = set()
+
+    def append_location(self, location: str) -> int:
+        """Adds a location that is not in the matrix and returns its index."""
+        self.locations.append(location)
+        lat, lon = parse_locations([location])
+        self.lats, self.lons = np.append(self.lats, lat), np.append(self.lons, lon)
+        self.node_map = np.append(self.node_map, -1)
+        return len(self.locations) - 1
+
+    def set_arcs(self, origins: Sequence[int], destinations: Sequence[int], seconds: Sequence[int]) -> None:
+        """Records known travel times for individual arcs."""
+        for i, j, value in zip(origins, destinations, seconds):
+            self._arcs[(int(i), int(j))] = int(value)
+            self._arc_nodes.update((int(i), int(j)))
+
+    def __call__(self, origins, destinations) -> np.ndarray:
+        """Travel times in seconds for paired (broadcastable) arrays of location indices."""
+        origins, destinations = np.broadcast_arrays(np.asarray(origins), np.asarray(destinations))
+        origins, destinations = origins.ravel(), destinations.ravel()
+        times = estimate_pair_times(
+            self.lats[origins], self.lons[origins], self.lats[destinations], self.lons[destinations], self.model
+        ).astype(np.int64)
+
+        if self.matrix is not None:
+            rows, cols = self.node_map[origins], self.node_map[destinations]
+            mapped = (rows >= 0) & (cols >= 0)
+            times[mapped] = self.matrix[rows[mapped], cols[mapped]]
+        times[origins == destinations] = 0
+
+        if self._arcs:
+            # Sadece yeni siparişe dokunan yaylar için sözlüğe bakılır
+            for k in np.flatnonzero(np.isin(origins, list(self._arc_nodes))).tolist():
+                value = self._arcs.get((int(origins[k]), int(destinations[k])))
+                if value is not None:
+                    times[k] = value
+        return times
+
+
+class Insertion(NamedTuple):
+    """
+    Best feasible position for a new stop.
+
+    Attributes:
+        vehicle (int): Route index; `len(routes)` means a new route.
+        position (int): Index of the new step within the route.
+        cost_delta (int): Added travel time in seconds (plus fixed cost for a new route).
+        arrival_time (int): Service start at the new stop.
+    """
+    vehicle: int
+    position: int
+    cost_delta: int
+    arrival_time: int
+
+
+def _step_window(step: Dict, work_start: int, work_end: int) -> Tuple[int, int]:
+    # Sonradan eklenen siparişler kendi zaman penceresini adımda taşır
+    window = step.get("time_window")
+    return (window[0], window[1]) if window else (work_start, work_end)
+
+
+def first_free_step(route: List[Dict], service_times: Sequence[int], now: int, visited: Optional[int] = None) -> int:
+    """
+    Last step of a route that can no longer change at `now`.
+
+    A new stop may be inserted right after it. If the vehicle is still
+    serving a stop that stop is returned; if it is driving, the stop it is
+    driving to.
+
+    Args:
+        route (List[Dict]): Route steps, depot departure first.
+        service_times (Sequence[int]): Service seconds per location index.
+        now (int): Current time in seconds since midnight.
+        visited (Optional[int]): Steps already started (depot departure
+            included), e.g. reported by the driver; inferred from the
+            planned arrival times when omitted.
+
+    Returns:
+        int: Step index.
+    """
+    arrivals = [step["arrival_time"] for step in route]
+    if visited is None:
+        visited = int(np.searchsorted(arrivals, now, side="right"))
+    if visited == 0:
+        return 0
+    current = min(visited, len(route)) - 1
+    finished = arrivals[current] + service_times[route[current]["location_index"]] <= now
+    if not finished or current == len(route) - 1:
+        return current
+    return current + 1
+
+
+def _route_arrays(route, travel, service_times, depot_index, work_start, work_end):
+    nodes = np.array([step["location_index"] for step in route] + [depot_index], dtype=np.int64)
+    arrivals = np.array([step["arrival_time"] for step in route], dtype=np.int64)
+    service = np.asarray(service_times, dtype=np.int64)[nodes]
+    service[0] = service[-1] = 0
+
+    legs = np.zeros(len(nodes), dtype=np.int64)
+    legs[1:] = travel(nodes[:-1], nodes[1:])
+    route_end = arrivals[-1] + service[-2] + legs[-1]
+    arrivals = np.append(arrivals, route_end)
+
+    latest = np.array([_step_window(step, work_start, work_end)[1] for step in route] + [0], dtype=np.int64)
+    latest[-1] = max(work_end, route_end)  # zaten geç dönen rotayı daha da geciktirme
+    wait = np.zeros(len(nodes), dtype=np.int64)
+    wait[1:] = np.maximum(0, arrivals[1:] - (arrivals[:-1] + service[:-1] + legs[1:]))
+
+    # Her adımın hizmet başlangıcı en fazla ne kadar ileri itilebilir
+    max_push = np.empty(len(nodes), dtype=np.int64)
+    max_push[-1] = latest[-1] - arrivals[-1]
+    for k in range(len(nodes) - 2, -1, -1):
+        max_push[k] = min(latest[k] - arrivals[k], wait[k + 1] + max_push[k + 1])
+    return nodes, arrivals, service, legs, max_push
+
+
+def cheapest_feasible_insertion(
+    routes: List[List[Dict]],
+    travel: PlanTravelTimes,
+    service_times: Sequence[int],
+    demands: Sequence[float],
+    node: int,
+    vehicle_capacity: float,
+    now: int,
+    time_window: Tuple[int, int],
+    work_start: int,
+    work_end: int,
+    max_vehicles: Optional[int] = None,
+    vehicle_fixed_cost: int = 0,
+    progress: Optional[Dict[int, int]] = None,
+    depot_index: int = 0,
+) -> Optional[Insertion]:
+    """
+    Finds the cheapest position for `node` that keeps every route feasible.
+
+    Steps already started (or being driven to) at `now` stay fixed. For
+    every later position the added travel time is computed, and the
+    position is feasible when the vehicle has spare capacity, the new stop
+    can be served within `time_window`, and the resulting delay fits in the
+    waiting time and time-window slack of every following stop
+    (push-forward check). All positions of a route are evaluated at once.
+
+    Args:
+        routes (List[List[Dict]]): Saved routes; steps have "location_index"
+            and "arrival_time", the first step is the depot departure.
+        travel (PlanTravelTimes): Travel-time lookup that includes `node`.
+        service_times (Sequence[int]): Service seconds per location index.
+        demands (Sequence[float]): Demand per location index.
+        node (int): Location index of the new stop.
+        vehicle_capacity (float): Capacity of one vehicle.
+        now (int): Current time in seconds since midnight.
+        time_window (Tuple[int, int]): Allowed service start of the new stop.
+        work_start (int): Earliest departure of an unused vehicle.
+        work_end (int): Latest service start and return time.
+        max_vehicles (Optional[int]): Fleet size; if above `len(routes)` an
+            unused vehicle may take the stop.
+        vehicle_fixed_cost (int): Cost added for starting a new route.
+        progress (Optional[Dict[int, int]]): Route index -> steps already
+            started, see `first_free_step`.
+        depot_index (int): Location index of the depot.
+
+    Returns:
+        Optional[Insertion]: Best insertion, or None if no position is feasible.
+    """
+    demands = np.asarray(demands, dtype=np.float64)
+    earliest, latest = time_window
+    service_new = int(service_times[node])
+    best = None
+
+    for v, route in enumerate(routes):
+        load = demands[[step["location_index"] for step in route]].sum()
+        if load + demands[node] > vehicle_capacity:
+            continue
+        nodes, arrivals, service, legs, max_push = _route_arrays(
+            route, travel, service_times, depot_index, work_start, work_end
+        )
+        first = first_free_step(route, service_times, now, (progress or {}).get(v))
+        k = np.arange(first, len(nodes) - 1)
+
+        to_new = travel(nodes[k], node)
+        from_new = travel(node, nodes[k + 1])
+        departure = np.maximum(arrivals[k] + service[k], now)
+        start_new = np.maximum(departure + to_new, earliest)
+        push = np.maximum(0, start_new + service_new + from_new - arrivals[k + 1])
+        feasible = (start_new <= latest) & (push <= max_push[k + 1])
+        if not feasible.any():
+            continue
+
+        delta = np.where(feasible, to_new + from_new - legs[k + 1], np.iinfo(np.int64).max)
+        i = int(np.argmin(delta))
+        if best is None or delta[i] < best.cost_delta:
+            best = Insertion(v, int(k[i]) + 1, int(delta[i]), int(start_new[i]))
+
+    if max_vehicles is not None and len(routes) < max_vehicles and demands[node] <= vehicle_capacity:
+        # Boş bir araç depodan sadece bu durak için çıkar
+        to_new, from_new = travel([depot_index, node], [node, depot_index])
+        start_new = max(max(now, work_start) + to_new, earliest)
+        delta = int(to_new + from_new + vehicle_fixed_cost)
+        if start_new <= latest and start_new + service_new + from_new <= work_end:
+            if best is None or delta < best.cost_delta:
+                best = Insertion(len(routes), 1, delta, int(start_new))
+
+    return best
+
+
+def reschedule(
+    route: List[Dict],
+    start: int,
+    travel: PlanTravelTimes,
+    service_times: Sequence[int],
+    work_start: int,
+    work_end: int,
+) -> List[Dict]:
+    """
+    Recomputes arrival times from step `start` on (earlier steps are kept).
+
+    Each service starts as soon as the vehicle arrives, but not before the
+    step's window opens.
+    """
+    nodes = np.array([step["location_index"] for step in route], dtype=np.int64)
+    legs = travel(nodes[:-1], nodes[1:])
+    steps = [dict(step) for step in route]
+    for i in range(max(start, 1), len(steps)):
+        ready = steps[i - 1]["arrival_time"] + int(service_times[nodes[i - 1]]) + int(legs[i - 1])
+        steps[i]["arrival_time"] = max(ready, _step_window(steps[i], work_start, work_end)[0])
+    return steps
+
+
+def route_is_feasible(
+    route: List[Dict],
+    travel: PlanTravelTimes,
+    service_times: Sequence[int],
+    work_start: int,
+    work_end: int,
+    depot_index: int = 0,
+) -> bool:
+    """Whether every step starts within its window and the vehicle returns by `work_end`."""
+    last = route[-1]
+    back = last["arrival_time"] + int(service_times[last["location_index"]])
+    back += int(travel([last["location_index"]], [depot_index])[0])
+    return back <= work_end and all(
+        step["arrival_time"] <= _step_window(step, work_start, work_end)[1] for step in route
+    )
+
+
+def apply_insertion(
+    routes: List[List[Dict]],
+    insertion: Insertion,
+    step: Dict,
+    travel: PlanTravelTimes,
+    service_times: Sequence[int],
+    work_start: int,
+    work_end: int,
+    depot_index: int = 0,
+) -> List[List[Dict]]:
+    """
+    Returns new routes with `step` inserted and the affected route rescheduled.
+
+    Args:
+        routes (List[List[Dict]]): Current routes (not modified).
+        insertion (Insertion): Result of `cheapest_feasible_insertion`.
+        step (Dict): New step; needs "location_index", may carry "time_window".
+        travel (PlanTravelTimes): Travel-time lookup.
+        service_times (Sequence[int]): Service seconds per location index.
+        work_start (int): Start of the working day.
+        work_end (int): End of the working day.
+        depot_index (int): Location index of the depot.
+
+    Returns:
+        List[List[Dict]]: Updated routes.
+    """
+    routes = [list(route) for route in routes]
+    step = {**step, "arrival_time": insertion.arrival_time}
+    if insertion.vehicle == len(routes):
+        leave = insertion.arrival_time - int(travel([depot_index], [step["location_index"]])[0])
+        routes.append([{"location_index": depot_index, "arrival_time": leave}, step])
+        return routes
+
+    route = routes[insertion.vehicle]
+    route.insert(insertion.position, step)
+    routes[insertion.vehicle] = reschedule(
+        route, insertion.position + 1, travel, service_times, work_start, work_end
+    )
+    return routes
+
+
+def repair_route(
+    route: List[Dict],
+    first_free: int,
+    travel: PlanTravelTimes,
+    service_times: Sequence[int],
+    work_start: int,
+    work_end: int,
+    depot_index: int = 0,
+    time_budget: float = 0.05,
+    max_iterations: int = 100,
+) -> List[Dict]:
+    """
+    Bounded intra-route local search after an insertion.
+
+    Applies improving 2-opt reversals and single-stop relocations to the
+    steps after `first_free` while the route stays feasible. Stops after
+    `time_budget` seconds or `max_iterations` applied moves, so the answer
+    time stays predictable.
+
+    Args:
+        route (List[Dict]): Route steps, depot departure first.
+        first_free (int): Last fixed step; only later steps move.
+        travel (PlanTravelTimes): Travel-time lookup.
+        service_times (Sequence[int]): Service seconds per location index.
+        work_start (int): Start of the working day.
+        work_end (int): End of the working day.
+        depot_index (int): Location index of the depot.
+        time_budget (float): Wall-time limit in seconds.
+        max_iterations (int): Maximum number of applied moves.
+
+    Returns:
+        List[Dict]: Rescheduled route with the same steps.
+    """
+    deadline = time.perf_counter() + time_budget
+
+    def travel_cost(steps: List[Dict]) -> int:
+        nodes = [step["location_index"] for step in steps] + [depot_index]
+        return int(travel(nodes[:-1], nodes[1:]).sum())
+
+    best_cost = travel_cost(route)
+    first = first_free + 1
+    for _ in range(max_iterations):
+        improved = False
+        for i in range(first, len(route)):
+            for j in range(first, len(route)):
+                if i == j:
+                    continue
+                if time.perf_counter() > deadline:
+                    return route
+                if i < j:
+                    candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]  # 2-opt
+                else:
+                    moved = route[:i] + route[i + 1:]
+                    candidate = moved[:j] + [route[i]] + moved[j:]  # relocate
+                cost = travel_cost(candidate)
+                if cost >= best_cost:
+                    continue
+                candidate = reschedule(candidate, first, travel, service_times, work_start, work_end)
+                if route_is_feasible(candidate, travel, service_times, work_start, work_end, depot_index):
+                    route, best_cost, improved = candidate, cost, True
+                    break
+            if improved:
+                break
+        if not improved:
+            break
+    return route
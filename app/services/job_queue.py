@@ -0,0 +1,152 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.exceptions import JobQueueFullError
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def _timed_call(fn: Callable, args: tuple) -> Dict:
+    started_at = time.time()
+    return {"started_at": started_at, "result": fn(*args)}
+
+
+class JobQueue:
+    """
+    Asynchronous job runner on a persistent, bounded process pool.
+
+    At most `max_workers` jobs run at once and at most `max_queued` more wait
+    for a free worker; beyond that `submit` refuses new jobs. Worker processes
+    live as long as the queue, so imports and per-process caches are paid
+    once instead of once per job. Finished jobs are kept for polling, up to
+    `keep_finished` of them.
+
+    Args:
+        max_workers (int): Concurrently running jobs (worker processes).
+        max_queued (int): Jobs allowed to wait for a worker.
+        keep_finished (int): Finished jobs remembered for status queries.
+        initializer (Optional[Callable]): Run once in each worker process.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queued: int = 16,
+        keep_finished: int = 100,
+        initializer: Optional[Callable] = None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.keep_finished = keep_finished
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=initializer)
+
+        self._jobs: Dict[str, Dict] = {}
+        self._futures: Dict[str, Future] = {}
+        self._finished = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        """Number of running or queued jobs."""
+        with self._lock:
+            return len(self._futures)
+
+    def submit(self, fn: Callable, *args, description: Optional[Dict] = None) -> str:
+        """
+        Queues `fn(*args)` to run in a worker process.
+
+        Args:
+            fn (Callable): Picklable module-level function.
+            *args: Picklable arguments.
+            description (Optional[Dict]): Extra fields reported with the job.
+
+        Returns:
+            str: Job id.
+
+        Raises:
+            JobQueueFullError: If running plus queued jobs are at the limit.
+        """
+        with self._lock:
+            capacity = self.max_workers + self.max_queued
+            if len(self._futures) >= capacity:
+                raise JobQueueFullError(capacity)
+
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                "id": job_id,
+                **(description or {}),
+                "status": JOB_QUEUED,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            future = self.pool.submit(_timed_call, fn, args)
+            self._futures[job_id] = future
+
+        future.add_done_callback(lambda done, job_id=job_id: self._finish(job_id, done))
+        return job_id
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job["finished_at"] = time.time()
+            try:
+                outcome = future.result()
+            except Exception as e:
+                job["status"] = JOB_FAILED
+                job["error"] = f"{type(e).__name__}: {e}"
+            else:
+                job["status"] = JOB_DONE
+                job["started_at"] = outcome["started_at"]
+                job["result"] = outcome["result"]
+            self._futures.pop(job_id, None)
+
+            # Bitmiş işler sınırlı sayıda tutulur
+            self._finished.append(job_id)
+            while len(self._finished) > self.keep_finished:
+                self._jobs.pop(self._finished.popleft(), None)
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        """
+        Current state of a job.
+
+        Args:
+            job_id (str): Id returned by `submit`.
+            include_result (bool): Whether to include the result of a finished job.
+
+        Returns:
+            Optional[Dict]: Job fields and status, or None for an unknown id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            if job_id in self._futures:
+                # Havuz işleri sırayla alır: ilk max_workers aktif iş çalışıyordur
+                position = list(self._futures).index(job_id)
+                if position < self.max_workers:
+                    job["status"] = JOB_RUNNING
+                else:
+                    job["queue_position"] = position - self.max_workers + 1
+        if not include_result:
+            job.pop("result", None)
+        return job
+
+    def list(self) -> List[Dict]:
+        """All known jobs without their results, oldest first."""
+        with self._lock:
+            job_ids = list(self._jobs)
+        jobs = [self.get(job_id, include_result=False) for job_id in job_ids]
+        return [job for job in jobs if job is not None]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops accepting work, cancels queued jobs and stops the workers."""
+        self.pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,320 @@
+import fcntl
+import glob
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CACHE_DIR = "app/cache"
+MATRIX_DTYPE = np.int32
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_paths(branch_name: str, cache_dir: str = CACHE_DIR) -> Tuple[str, str]:
+    """
+    Returns the binary matrix path and its metadata header path for a branch.
+
+    Args:
+        branch_name (str): Branch the matrix belongs to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Tuple[str, str]: Paths of the `.npy` matrix and the `.meta.json` header.
+    """
+    base = os.path.join(cache_dir, f"{branch_name.lower()}_distance_matrix")
+    return f"{base}.npy", f"{base}.meta.json"
+
+
+def _temp_path(path: str) -> str:
+    # Her yazıcıya ayrı geçici dosya: aynı şubeyi eşzamanlı yazan işler birbirini ezmez
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)  # mkstemp 0600 açar; önbellek diğer kullanıcılarca da okunur
+    return tmp_path
+
+
+@contextmanager
+def _cache_lock(npy_path: str, exclusive: bool):
+    # .npy ve .meta.json çifti birlikte değiştirilir/okunur; karışık bir çift görülmez
+    with open(f"{npy_path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _replace_pair(tmp_npy: str, npy_path: str, meta: Dict, meta_path: str) -> None:
+    tmp_meta = _temp_path(meta_path)
+    try:
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f)
+        with _cache_lock(npy_path, exclusive=True):
+            os.replace(tmp_npy, npy_path)
+            os.replace(tmp_meta, meta_path)
+    finally:
+        for path in (tmp_npy, tmp_meta):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def save_matrix(
+    matrix,
+    branch_name: str,
+    locations: Optional[Sequence[str]] = None,
+    cache_dir: str = CACHE_DIR,
+) -> str:
+    """
+    Writes a distance matrix as an int32 `.npy` file plus a small JSON header.
+
+    Both files are written to a temporary name unique to this writer and
+    then moved into place together under a file lock, so a reader never
+    sees a half-written cache or the matrix of one writer with the header
+    of another.
+
+    Args:
+        matrix: Square matrix (nested lists or ndarray) of travel times in seconds.
+        branch_name (str): Branch the matrix belongs to.
+        locations (Optional[Sequence[str]]): "lat,lon" strings the rows refer to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        str: Path of the written `.npy` file.
+    """
+    array = np.ascontiguousarray(matrix, dtype=MATRIX_DTYPE)
+    if array.ndim != 2 or array.shape[0] != array.shape[1]:
+        raise ValueError(f"Distance matrix must be square, got shape {array.shape}")
+
+    npy_path, meta_path = cache_paths(branch_name, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    meta = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "dtype": np.dtype(MATRIX_DTYPE).name,
+        "shape": list(array.shape),
+        "locations": list(locations) if locations is not None else None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    tmp_npy = _temp_path(npy_path)
+    try:
+        with open(tmp_npy, "wb") as f:
+            np.save(f, array)
+    except BaseException:
+        os.remove(tmp_npy)
+        raise
+    _replace_pair(tmp_npy, npy_path, meta, meta_path)
+
+    return npy_path
+
+
+def load_matrix(branch_name: str, cache_dir: str = CACHE_DIR) -> Tuple[np.ndarray, Dict]:
+    """
+    Memory-maps a cached distance matrix without copying it into memory.
+
+    Args:
+        branch_name (str): Branch the matrix belongs to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Tuple[np.ndarray, Dict]: Read-only C-contiguous matrix and its metadata.
+
+    Raises:
+        FileNotFoundError: If no binary cache exists for the branch.
+        ValueError: If the cache does not match its metadata header.
+    """
+    npy_path, meta_path = cache_paths(branch_name, cache_dir)
+    if not os.path.exists(npy_path):
+        raise FileNotFoundError(npy_path)
+    with _cache_lock(npy_path, exclusive=False):
+        matrix = np.load(npy_path, mmap_mode="r")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+
+    if matrix.dtype != MATRIX_DTYPE or matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError(f"Invalid matrix in cache file {npy_path}: {matrix.dtype} {matrix.shape}")
+    if meta.get("shape") and list(matrix.shape) != meta["shape"]:
+        raise ValueError(f"Matrix shape {matrix.shape} does not match header {meta['shape']}")
+
+    return matrix, meta
+
+
+def tensor_paths(branch_name: str, cache_dir: str = CACHE_DIR) -> Tuple[str, str]:
+    """
+    Returns the time-sliced tensor path and its metadata header path for a branch.
+
+    Args:
+        branch_name (str): Branch the tensor belongs to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Tuple[str, str]: Paths of the `.npy` tensor and the `.meta.json` header.
+    """
+    base = os.path.join(cache_dir, f"{branch_name.lower()}_travel_tensor")
+    return f"{base}.npy", f"{base}.meta.json"
+
+
+def slice_index(slice_starts: Sequence[int], seconds: int) -> int:
+    """
+    Index of the time slice containing `seconds` (seconds since midnight).
+
+    Times before the first slice map to the first one, times after the last
+    start to the last one.
+    """
+    index = int(np.searchsorted(np.asarray(slice_starts), seconds, side="right")) - 1
+    return min(max(index, 0), len(slice_starts) - 1)
+
+
+def save_tensor(
+    slices: Iterable,
+    branch_name: str,
+    slice_starts: Sequence[int],
+    locations: Optional[Sequence[str]] = None,
+    cache_dir: str = CACHE_DIR,
+) -> str:
+    """
+    Writes one travel-time matrix per time slice as a single (S, N, N) int32 `.npy` tensor.
+
+    Slices are consumed one at a time and written straight into the
+    memory-mapped file, so only one N x N matrix is held in memory while
+    building. Like `save_matrix`, files are moved into place only when complete.
+
+    Args:
+        slices (Iterable): Square matrices, one per entry of `slice_starts`.
+        branch_name (str): Branch the tensor belongs to.
+        slice_starts (Sequence[int]): Start of each slice in seconds since midnight.
+        locations (Optional[Sequence[str]]): "lat,lon" strings the rows refer to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        str: Path of the written `.npy` file.
+    """
+    npy_path, meta_path = tensor_paths(branch_name, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_npy = _temp_path(npy_path)
+    tensor = None
+    try:
+        for i, matrix in enumerate(slices):
+            array = np.asarray(matrix, dtype=MATRIX_DTYPE)
+            if array.ndim != 2 or array.shape[0] != array.shape[1]:
+                raise ValueError(f"Distance matrix must be square, got shape {array.shape}")
+            if tensor is None:
+                tensor = np.lib.format.open_memmap(
+                    tmp_npy, mode="w+", dtype=MATRIX_DTYPE, shape=(len(slice_starts), *array.shape)
+                )
+            tensor[i] = array
+        if tensor is None or i != len(slice_starts) - 1:
+            raise ValueError(f"Expected {len(slice_starts)} slices")
+        tensor.flush()
+        shape = list(tensor.shape)
+        del tensor
+    except BaseException:
+        os.remove(tmp_npy)
+        raise
+
+    meta = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "dtype": np.dtype(MATRIX_DTYPE).name,
+        "shape": shape,
+        "slice_starts": [int(start) for start in slice_starts],
+        "locations": list(locations) if locations is not None else None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _replace_pair(tmp_npy, npy_path, meta, meta_path)
+
+    return npy_path
+
+
+def load_tensor(branch_name: str, cache_dir: str = CACHE_DIR) -> Tuple[np.ndarray, Dict]:
+    """
+    Memory-maps a cached time-sliced tensor without copying it into memory.
+
+    Args:
+        branch_name (str): Branch the tensor belongs to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Tuple[np.ndarray, Dict]: Read-only (S, N, N) tensor and its metadata.
+
+    Raises:
+        FileNotFoundError: If no tensor cache exists for the branch.
+        ValueError: If the cache does not match its metadata header.
+    """
+    npy_path, meta_path = tensor_paths(branch_name, cache_dir)
+    if not os.path.exists(npy_path):
+        raise FileNotFoundError(npy_path)
+    with _cache_lock(npy_path, exclusive=False):
+        tensor = np.load(npy_path, mmap_mode="r")
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+    if tensor.dtype != MATRIX_DTYPE or tensor.ndim != 3 or tensor.shape[1] != tensor.shape[2]:
+        raise ValueError(f"Invalid tensor in cache file {npy_path}: {tensor.dtype} {tensor.shape}")
+    if list(tensor.shape) != meta.get("shape") or len(meta.get("slice_starts", [])) != tensor.shape[0]:
+        raise ValueError(f"Tensor shape {tensor.shape} does not match header {meta.get('shape')}")
+
+    return tensor, meta
+
+
+def migrate_json_cache(branch_name: str, cache_dir: str = CACHE_DIR) -> Optional[str]:
+    """
+    Converts a legacy `{branch}_distance_matrix.json` cache to the binary format.
+
+    The JSON file is left in place so older checkouts keep working; once the
+    `.npy` file exists it takes precedence and the JSON is never parsed again.
+    The legacy file does not say which locations it was built for, so the
+    header records none and the matrix is only matched by its size.
+
+    Args:
+        branch_name (str): Branch the matrix belongs to.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Optional[str]: Path of the new `.npy` file, or None if there was nothing to migrate.
+    """
+    json_path = os.path.join(cache_dir, f"{branch_name.lower()}_distance_matrix.json")
+    if not os.path.exists(json_path):
+        return None
+
+    with open(json_path, "r") as f:
+        matrix = json.load(f)
+    if not matrix or not isinstance(matrix, list) or not all(isinstance(row, list) for row in matrix):
+        raise ValueError(f"Invalid matrix format in cache file: {json_path}")
+
+    return save_matrix(matrix, branch_name, None, cache_dir)
+
+
+def migrate_all_json_caches(cache_dir: str = CACHE_DIR) -> List[str]:
+    """
+    One-time migration of every legacy JSON matrix in the cache directory.
+
+    Branches that already have a binary cache are skipped.
+
+    Args:
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        List[str]: Paths of the `.npy` files that were written.
+    """
+    written = []
+    for json_path in sorted(glob.glob(os.path.join(cache_dir, "*_distance_matrix.json"))):
+        branch_name = os.path.basename(json_path)[: -len("_distance_matrix.json")]
+        npy_path, _ = cache_paths(branch_name, cache_dir)
+        if os.path.exists(npy_path):
+            continue
+        written.append(migrate_json_cache(branch_name, cache_dir=cache_dir))
+    return written
+
+
+if __name__ == "__main__":
+    for path in migrate_all_json_caches():
+        print(f"[INFO] Migrated cache to: {path}")
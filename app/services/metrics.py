@@ -0,0 +1,142 @@
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from app.utils import write_json_atomic
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux: KB
+
+
+class MetricsRecorder:
+    """
+    Collects stage spans and solver progress for one run.
+
+    A span records wall time and the process's peak RSS at its end; since
+    the OS only reports a lifetime peak, `peak_rss_growth_bytes` tells how
+    much the span itself raised it. Results are written as JSON and can be
+    rendered in the Prometheus text format with `render_prometheus`.
+
+    Args:
+        **labels: Labels attached to every metric of the run (e.g. branch).
+    """
+
+    def __init__(self, **labels):
+        self.labels = {key: str(value) for key, value in labels.items()}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.progress: List[Dict] = []
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Times the enclosed block as stage `name`.
+
+        The span is recorded (with `"status": "error"`) even if the block raises.
+        """
+        rss_before = peak_rss_bytes()
+        start = time.perf_counter()
+        record = {"stage": name, **labels, "offset_seconds": round(start - self._start, 4)}
+        try:
+            yield record
+            record["status"] = "ok"
+        except BaseException:
+            record["status"] = "error"
+            raise
+        finally:
+            record["duration_seconds"] = round(time.perf_counter() - start, 4)
+            record["peak_rss_bytes"] = peak_rss_bytes()
+            record["peak_rss_growth_bytes"] = record["peak_rss_bytes"] - rss_before
+            self.spans.append(record)
+
+    def record_progress(self, **fields) -> None:
+        """Appends one solver progress sample."""
+        self.progress.append({"elapsed_seconds": round(time.perf_counter() - self._start, 4), **fields})
+
+    def stage_totals(self) -> Dict[str, Dict]:
+        """Total duration, span count and highest peak RSS per stage name."""
+        totals: Dict[str, Dict] = {}
+        for span in self.spans:
+            total = totals.setdefault(span["stage"], {"duration_seconds": 0.0, "count": 0, "peak_rss_bytes": 0})
+            total["duration_seconds"] = round(total["duration_seconds"] + span["duration_seconds"], 4)
+            total["count"] += 1
+            total["peak_rss_bytes"] = max(total["peak_rss_bytes"], span["peak_rss_bytes"])
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "labels": self.labels,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.perf_counter() - self._start, 4),
+            "stages": self.stage_totals(),
+            "spans": self.spans,
+            "progress": self.progress,
+        }
+
+    def write_json(self, path: str) -> str:
+        """Atomically writes the metrics as JSON and returns the path."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_json_atomic(path, self.to_dict())
+        return path
+
+
+def _label_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+PROMETHEUS_METRICS = [
+    ("vrp_stage_duration_seconds", "gauge", "Wall time spent in a stage during the last run."),
+    ("vrp_stage_count", "gauge", "Number of spans of a stage during the last run."),
+    ("vrp_stage_peak_rss_bytes", "gauge", "Process peak RSS at the end of a stage."),
+    ("vrp_run_duration_seconds", "gauge", "Wall time of the last run."),
+    ("vrp_solver_solutions", "gauge", "Solutions found by the last solve."),
+    ("vrp_solver_best_objective", "gauge", "Best objective of the last solve."),
+    ("vrp_solver_branches", "gauge", "Search branches explored by the last solve."),
+    ("vrp_solver_failures", "gauge", "Search failures of the last solve."),
+]
+
+
+def render_prometheus(runs: Iterable[Dict], extra: Optional[Dict[str, float]] = None) -> str:
+    """
+    Renders run metrics (`MetricsRecorder.to_dict()` outputs) as Prometheus text.
+
+    Args:
+        runs (Iterable[Dict]): One metrics dict per run, e.g. the latest per branch.
+        extra (Optional[Dict[str, float]]): Additional unlabeled gauges.
+
+    Returns:
+        str: Text exposition format (version 0.0.4).
+    """
+    samples: Dict[str, List[str]] = {name: [] for name, _, _ in PROMETHEUS_METRICS}
+    for run in runs:
+        labels = run.get("labels", {})
+        for stage, total in run.get("stages", {}).items():
+            text = _label_text({**labels, "stage": stage})
+            samples["vrp_stage_duration_seconds"].append(f"vrp_stage_duration_seconds{text} {total['duration_seconds']}")
+            samples["vrp_stage_count"].append(f"vrp_stage_count{text} {total['count']}")
+            samples["vrp_stage_peak_rss_bytes"].append(f"vrp_stage_peak_rss_bytes{text} {total['peak_rss_bytes']}")
+        text = _label_text(labels)
+        samples["vrp_run_duration_seconds"].append(f"vrp_run_duration_seconds{text} {run.get('elapsed_seconds', 0)}")
+        if run.get("progress"):
+            last = run["progress"][-1]
+            for field in ("solutions", "best_objective", "branches", "failures"):
+                if last.get(field) is not None:
+                    samples[f"vrp_solver_{field}"].append(f"vrp_solver_{field}{text} {last[field]}")
+
+    lines = []
+    for name, kind, help_text in PROMETHEUS_METRICS:
+        if samples[name]:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *samples[name]]
+    for name, value in (extra or {}).items():
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
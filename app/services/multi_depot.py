@@ -0,0 +1,100 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.services.travel_time_estimator import SpeedModel, estimate_pair_times, parse_locations
+
+
+class DepotRegions(NamedTuple):
+    """
+    Stops of a joint multi-depot model split into depot regions.
+
+    Nodes 0 to D - 1 are the depots, stop `i` is node D + i.
+
+    Attributes:
+        nearest (np.ndarray): Depot (0..D-1) closest to each stop.
+        boundary (np.ndarray): True for stops nearly as close to another depot,
+            which any vehicle may serve.
+    """
+    nearest: np.ndarray
+    boundary: np.ndarray
+
+    def block_nodes(self, depot: int, depot_count: int) -> np.ndarray:
+        """Nodes the vehicles of `depot` may visit: the depot, its region and every boundary stop."""
+        stops = np.flatnonzero((self.nearest == depot) | self.boundary) + depot_count
+        return np.concatenate([[depot], stops]).astype(np.int64)
+
+    def allowed_vehicles(self, vehicle_depots: Sequence[int], depot_count: int) -> Dict[int, List[int]]:
+        """Node -> vehicles allowed to serve it, for the stops inside a single region."""
+        by_depot: Dict[int, List[int]] = {}
+        for v_id, depot in enumerate(vehicle_depots):
+            by_depot.setdefault(int(depot), []).append(v_id)
+        return {
+            int(stop) + depot_count: by_depot.get(int(self.nearest[stop]), [])
+            for stop in np.flatnonzero(~self.boundary).tolist()
+        }
+
+
+def assign_regions(
+    depot_locations: Sequence[str],
+    stop_locations: Sequence[str],
+    boundary_ratio: float,
+    model: Optional[SpeedModel] = None,
+) -> DepotRegions:
+    """
+    Assigns every stop to its nearest depot and marks the boundary stops.
+
+    Uses the offline travel-time estimate, so no API call is needed. A stop
+    is on the boundary when some other depot is at most `boundary_ratio`
+    times as far as its nearest one.
+
+    Args:
+        depot_locations (Sequence[str]): "lat,lon" of each depot.
+        stop_locations (Sequence[str]): "lat,lon" of each stop.
+        boundary_ratio (float): Relative slack that still counts as near (>= 1).
+        model (Optional[SpeedModel]): Speed model; the calibrated one when omitted.
+
+    Returns:
+        DepotRegions: Nearest depot and boundary flag per stop.
+    """
+    depot_lats, depot_lons = parse_locations(depot_locations)
+    stop_lats, stop_lons = parse_locations(stop_locations)
+    depots, stops = len(depot_lats), len(stop_lats)
+    times = estimate_pair_times(
+        np.repeat(depot_lats, stops), np.repeat(depot_lons, stops),
+        np.tile(stop_lats, depots), np.tile(stop_lons, depots), model,
+    ).reshape(depots, stops).astype(np.float64)
+
+    nearest = times.argmin(axis=0)
+    if depots == 1:
+        return DepotRegions(nearest=nearest, boundary=np.zeros(stops, dtype=bool))
+    # İkinci en yakın depo da yeterince yakınsa durak iki bölgeye de açık
+    ordered = np.sort(times, axis=0)
+    boundary = ordered[1] <= np.maximum(ordered[0], 1) * boundary_ratio
+    return DepotRegions(nearest=nearest, boundary=boundary)
+
+
+def split_fleet(total: int, weights: Sequence[float], maxima: Sequence[int]) -> List[int]:
+    """
+    Splits `total` vehicles over depots in proportion to `weights`.
+
+    Every depot gets at least one vehicle (its node would otherwise have to
+    be visited like a stop) and at most its maximum.
+
+    Args:
+        total (int): Vehicles to distribute.
+        weights (Sequence[float]): Relative need of each depot, e.g. its fleet lower bound.
+        maxima (Sequence[int]): Vehicles available at each depot.
+
+    Returns:
+        List[int]: Vehicles per depot.
+    """
+    maxima = np.asarray(maxima, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    share = total * weights / max(weights.sum(), 1e-9)
+    counts = np.clip(np.floor(share).astype(np.int64), 1, maxima)
+    # Kalan araçlar payının en çok gerisinde kalan depoya tek tek verilir
+    while counts.sum() < total and (counts < maxima).any():
+        deficit = np.where(counts < maxima, share - counts, -np.inf)
+        counts[int(deficit.argmax())] += 1
+    return counts.tolist()
@@ -0,0 +1,208 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select
+
+from app.config import settings
+
+QUERY_BATCH_SIZE = 500
+INSERT_BATCH_SIZE = 10000
+
+metadata = MetaData()
+
+distance_pairs = Table(
+    "distance_pairs",
+    metadata,
+    Column("origin", String, primary_key=True),
+    Column("destination", String, primary_key=True),
+    Column("duration", Integer, nullable=False),
+)
+
+
+def coordinate_key(location: str, precision: int) -> str:
+    """
+    Normalizes a "lat,lon" string so nearby spellings of one point share a key.
+
+    Args:
+        location (str): Coordinate string as sent to the Distance Matrix API.
+        precision (int): Number of decimals kept (5 decimals is roughly 1 m).
+
+    Returns:
+        str: Rounded "lat,lon" key.
+    """
+    lat, lon = (float(value) for value in location.split(","))
+    return f"{lat:.{precision}f},{lon:.{precision}f}"
+
+
+def _batches(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DistancePairStore:
+    """
+    Persistent origin/destination travel-time store keyed by rounded coordinates.
+
+    Unlike the per-branch matrix cache, pairs survive changes in the daily
+    order list, so a new matrix only needs API calls for the pairs never seen.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, precision: Optional[int] = None):
+        self.engine = create_engine(database_url or settings.DATABASE_URL)
+        self.precision = settings.DISTANCE_CACHE_PRECISION if precision is None else precision
+        metadata.create_all(self.engine)
+
+    def _unique_keys(self, locations: Sequence[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        keys = np.asarray([coordinate_key(location, self.precision) for location in locations])
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return unique_keys.tolist(), first, inverse
+
+    def lookup(self, locations: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Assembles as much of the matrix for `locations` as the store knows.
+
+        Args:
+            locations (Sequence[str]): "lat,lon" strings, depot first.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: int32 matrix and a boolean mask of the
+            entries that were found. Unknown entries are 0.
+        """
+        unique_keys, _, inverse = self._unique_keys(locations)
+        key_index: Dict[str, int] = {key: i for i, key in enumerate(unique_keys)}
+
+        size = len(unique_keys)
+        durations = np.zeros((size, size), dtype=np.int32)
+        known = np.eye(size, dtype=bool)  # aynı nokta: süre 0
+
+        origin_idx, destination_idx, values = [], [], []
+        with self.engine.connect() as conn:
+            for batch in _batches(unique_keys, QUERY_BATCH_SIZE):
+                query = select(
+                    distance_pairs.c.origin, distance_pairs.c.destination, distance_pairs.c.duration
+                ).where(distance_pairs.c.origin.in_(batch))
+                for origin, destination, duration in conn.execute(query):
+                    j = key_index.get(destination)
+                    if j is None:
+                        continue
+                    origin_idx.append(key_index[origin])
+                    destination_idx.append(j)
+                    values.append(duration)
+
+        if values:
+            durations[origin_idx, destination_idx] = values
+            known[origin_idx, destination_idx] = True
+
+        return durations[np.ix_(inverse, inverse)], known[np.ix_(inverse, inverse)]
+
+    def store(self, locations: Sequence[str], matrix, mask: Optional[np.ndarray] = None) -> int:
+        """
+        Persists matrix entries as coordinate pairs.
+
+        Args:
+            locations (Sequence[str]): "lat,lon" strings the matrix rows refer to.
+            matrix: Square travel-time matrix in seconds.
+            mask (Optional[np.ndarray]): Entries to store; all entries when omitted.
+
+        Returns:
+            int: Number of pairs written.
+        """
+        # Her benzersiz koordinat için ilk satırı kullan
+        unique_keys, first, _ = self._unique_keys(locations)
+        matrix = np.asarray(matrix)[np.ix_(first, first)]
+        if mask is None:
+            mask = np.ones(matrix.shape, dtype=bool)
+        else:
+            mask = np.asarray(mask, dtype=bool)[np.ix_(first, first)]
+
+        rows, cols = np.nonzero(mask)
+        records = [
+            {"origin": unique_keys[i], "destination": unique_keys[j], "duration": int(matrix[i, j])}
+            for i, j in zip(rows.tolist(), cols.tolist())
+        ]
+        if not records:
+            return 0
+
+        statement = self._insert_ignore()
+        with self.engine.begin() as conn:
+            for batch in _batches(records, INSERT_BATCH_SIZE):
+                conn.execute(statement, list(batch))
+        return len(records)
+
+    def lookup_pairs(self, origins: Sequence[str], destinations: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Looks up individual origin/destination arcs instead of a full matrix.
+
+        Args:
+            origins (Sequence[str]): "lat,lon" origin of each arc.
+            destinations (Sequence[str]): "lat,lon" destination of each arc.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: int32 durations per arc and a boolean
+            mask of the arcs that were found. Unknown arcs are 0.
+        """
+        origin_keys = [coordinate_key(location, self.precision) for location in origins]
+        destination_keys = [coordinate_key(location, self.precision) for location in destinations]
+        wanted: Dict[Tuple[str, str], List[int]] = {}
+        for arc, pair in enumerate(zip(origin_keys, destination_keys)):
+            wanted.setdefault(pair, []).append(arc)
+
+        durations = np.zeros(len(origin_keys), dtype=np.int32)
+        known = np.zeros(len(origin_keys), dtype=bool)
+        by_origin: Dict[str, set] = {}
+        for origin, destination in wanted:
+            by_origin.setdefault(origin, set()).add(destination)
+
+        with self.engine.connect() as conn:
+            for batch in _batches(sorted(by_origin), QUERY_BATCH_SIZE):
+                batch_destinations = set().union(*(by_origin[origin] for origin in batch))
+                for destination_batch in _batches(sorted(batch_destinations), QUERY_BATCH_SIZE):
+                    query = select(
+                        distance_pairs.c.origin, distance_pairs.c.destination, distance_pairs.c.duration
+                    ).where(
+                        distance_pairs.c.origin.in_(batch),
+                        distance_pairs.c.destination.in_(destination_batch),
+                    )
+                    for origin, destination, duration in conn.execute(query):
+                        arcs = wanted.get((origin, destination))
+                        if arcs:
+                            durations[arcs] = duration
+                            known[arcs] = True
+
+        return durations, known
+
+    def store_pairs(self, origins: Sequence[str], destinations: Sequence[str], durations) -> int:
+        """
+        Persists individual origin/destination arcs.
+
+        Args:
+            origins (Sequence[str]): "lat,lon" origin of each arc.
+            destinations (Sequence[str]): "lat,lon" destination of each arc.
+            durations: Travel time of each arc in seconds.
+
+        Returns:
+            int: Number of distinct pairs written.
+        """
+        records = {}
+        for origin, destination, duration in zip(origins, destinations, np.asarray(durations).tolist()):
+            key = (coordinate_key(origin, self.precision), coordinate_key(destination, self.precision))
+            records.setdefault(key, int(duration))
+        if not records:
+            return 0
+
+        statement = self._insert_ignore()
+        rows = [{"origin": o, "destination": d, "duration": v} for (o, d), v in records.items()]
+        with self.engine.begin() as conn:
+            for batch in _batches(rows, INSERT_BATCH_SIZE):
+                conn.execute(statement, list(batch))
+        return len(rows)
+
+    def _insert_ignore(self):
+        # Paralel şube çözümleri aynı çiftleri yazabilir; çakışmayı yok say
+        if self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            return sqlite_insert(distance_pairs).on_conflict_do_nothing()
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            return pg_insert(distance_pairs).on_conflict_do_nothing()
+        return insert(distance_pairs)
@@ -0,0 +1,271 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Bir rota: depo hariç düğüm listesi ya da {"location_index", ...} adımları
+Route = Union[Sequence[int], Sequence[Dict]]
+
+
+class RouteEvaluation(NamedTuple):
+    """
+    Scores of B route sets with up to V routes each.
+
+    Per-route arrays have shape (B, V) (0 for padding routes); per-set
+    totals have shape (B,). Times are in seconds.
+
+    Attributes:
+        travel (np.ndarray): Travel time per route.
+        load (np.ndarray): Summed demand per route.
+        idle (np.ndarray): Waiting for windows to open per route.
+        start (np.ndarray): Depot departure per route.
+        end (np.ndarray): Return to the depot per route.
+        overrun (np.ndarray): Time back after the shift end per route.
+        capacity_excess (np.ndarray): Load above the vehicle capacity per route.
+        window_lateness (np.ndarray): Summed service-start delay past window ends per route.
+        late_stops (np.ndarray): Stops served after their window per route.
+        missing (np.ndarray): Stops of the instance no route visits, per set.
+        duplicates (np.ndarray): Extra visits of stops visited more than once, per set.
+        feasible (np.ndarray): No capacity, window, missing or duplicate violation, per set.
+    """
+    travel: np.ndarray
+    load: np.ndarray
+    idle: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+    overrun: np.ndarray
+    capacity_excess: np.ndarray
+    window_lateness: np.ndarray
+    late_stops: np.ndarray
+    missing: np.ndarray
+    duplicates: np.ndarray
+    feasible: np.ndarray
+
+    def totals(self) -> Dict[str, np.ndarray]:
+        """Per-set sums of the per-route figures, plus vehicles used and the set-level checks."""
+        used = self.end > self.start
+        return {
+            "vehicles_used": used.sum(axis=1),
+            "travel_time": self.travel.sum(axis=1),
+            "total_time": (self.end - self.start).sum(axis=1),
+            "idle_time": self.idle.sum(axis=1),
+            "load": self.load.sum(axis=1),
+            "overrun": self.overrun.sum(axis=1),
+            "late_vehicles": (self.overrun > 0).sum(axis=1),
+            "capacity_excess": self.capacity_excess.sum(axis=1),
+            "window_lateness": self.window_lateness.sum(axis=1),
+            "late_stops": self.late_stops.sum(axis=1),
+            "missing": self.missing,
+            "duplicates": self.duplicates,
+            "feasible": self.feasible,
+        }
+
+
+def route_nodes(route: Route, depot_index: int = 0) -> List[int]:
+    """Node sequence of a route without depot visits; accepts node lists or step dicts."""
+    nodes = [step["location_index"] if isinstance(step, dict) else step for step in route]
+    return [int(node) for node in nodes if node != depot_index]
+
+
+def pad_routes(route_sets: Sequence[Sequence[Route]], depot_index: int = 0) -> np.ndarray:
+    """
+    Packs route sets into one depot-padded node array.
+
+    Each route becomes [depot, stops..., depot, depot, ...]; missing routes
+    are all depot. Depot-to-depot hops cost nothing, so padding never
+    changes a score.
+
+    Args:
+        route_sets (Sequence[Sequence[Route]]): B route sets.
+        depot_index (int): Depot node.
+
+    Returns:
+        np.ndarray: int64 array of shape (B, V, L + 2), L the longest route.
+    """
+    routes = [[route_nodes(route, depot_index) for route in route_set] for route_set in route_sets]
+    vehicles = max((len(route_set) for route_set in routes), default=0)
+    length = max((len(route) for route_set in routes for route in route_set), default=0)
+
+    nodes = np.full((len(routes), max(vehicles, 1), length + 2), depot_index, dtype=np.int64)
+    for b, route_set in enumerate(routes):
+        for v, route in enumerate(route_set):
+            nodes[b, v, 1:len(route) + 1] = route
+    return nodes
+
+
+def _schedule(nodes, stops, legs, service, windows, start, break_at=None):
+    # Adım adım ilerle; her adım tüm rota kümeleri için tek numpy işlemi
+    batch, vehicles, length = nodes.shape
+    arrivals = np.zeros((batch, vehicles, length), dtype=np.int64)
+    waits = np.zeros((batch, vehicles, length), dtype=np.int64)
+    window_lateness = np.zeros((batch, vehicles), dtype=np.int64)
+    late_stops = np.zeros((batch, vehicles), dtype=np.int64)
+    time = start.copy()
+    for k in range(1, length):
+        node = nodes[:, :, k]
+        is_stop = stops[:, :, k]
+        ready = time + service[nodes[:, :, k - 1]] + legs[:, :, k - 1]
+        time = np.maximum(ready, np.where(is_stop, windows[node, 0], 0))
+        arrivals[:, :, k] = ready
+        waits[:, :, k] = time - ready
+        if break_at is not None:
+            # Mola durağa varınca (en erken mola başlangıcında) başlar, pencere beklemesiyle örtüşebilir
+            position, break_start, duration = break_at
+            here = position == k
+            time = np.where(here, np.maximum(time, np.maximum(ready, break_start) + duration), time)
+            waits[:, :, k] = np.where(here, time - ready - duration, waits[:, :, k])
+        delay = np.where(is_stop, np.maximum(0, time - windows[node, 1]), 0)
+        window_lateness += delay
+        late_stops += delay > 0
+    return arrivals, waits, time, window_lateness, late_stops
+
+
+def evaluate_routes(
+    nodes: np.ndarray,
+    matrix: np.ndarray,
+    demands: Sequence[float],
+    service_times: Sequence[int],
+    time_windows: Sequence[Sequence[int]],
+    vehicle_capacity: float,
+    shift_end: Optional[int] = None,
+    start_times: Optional[np.ndarray] = None,
+    lunch_break: Optional[Tuple[int, int]] = None,
+    depot_index: int = 0,
+) -> RouteEvaluation:
+    """
+    Scores many route sets at once.
+
+    Arrival times follow the solver's model: a vehicle leaves the depot at
+    its start time, serves each stop as soon as it arrives but not before
+    the window opens (the wait is idle time), and service ends are followed
+    by the travel to the next stop. All arithmetic runs on (B, V) arrays,
+    one step of the routes at a time, so thousands of candidate sets are
+    scored per second.
+
+    Args:
+        nodes (np.ndarray): (B, V, L) depot-padded nodes from `pad_routes`.
+        matrix (np.ndarray): (N, N) travel times in seconds.
+        demands (Sequence[float]): Demand per node.
+        service_times (Sequence[int]): Service seconds per node.
+        time_windows (Sequence[Sequence[int]]): [earliest, latest] service
+            start per node; the depot's window gives the default start and
+            shift end.
+        vehicle_capacity (float): Capacity of one vehicle.
+        shift_end (Optional[int]): Latest return before counting overrun;
+            the depot's window end when omitted.
+        start_times (Optional[np.ndarray]): Depot departure per route,
+            broadcastable to (B, V); the depot's window start when omitted.
+        lunch_break (Optional[Tuple[int, int]]): (start, end) as in the
+            solver: a break of end - start seconds starting between `start`
+            and `end`. It is taken on arrival at the stop where it delays the
+            route least (overlapping any window wait); routes back by `end`
+            take it after returning. The solver may place it better, so this
+            can overestimate.
+        depot_index (int): Depot node.
+
+    Returns:
+        RouteEvaluation: Per-route and per-set scores.
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    matrix = np.asarray(matrix)
+    demands = np.asarray(demands, dtype=np.float64)
+    service = np.asarray(service_times, dtype=np.int64)
+    windows = np.asarray(time_windows, dtype=np.int64)
+    batch, vehicles, _ = nodes.shape
+    size = len(matrix)
+    shift_end = windows[depot_index, 1] if shift_end is None else shift_end
+
+    legs = matrix[nodes[:, :, :-1], nodes[:, :, 1:]].astype(np.int64)
+    stops = nodes != depot_index
+    load = np.where(stops, demands[nodes], 0).sum(axis=2)
+
+    start = np.broadcast_to(
+        windows[depot_index, 0] if start_times is None else np.asarray(start_times, dtype=np.int64),
+        (batch, vehicles),
+    ).copy()
+    break_at = None
+    if lunch_break is not None:
+        # Molasız çizelgede molanın en az gecikme kattığı durak seçilir. Mola bitişinden önce
+        # dönen ya da mola bitiminden sonra çıkan rota molayı rota dışında verir.
+        break_start, break_end = lunch_break
+        duration = break_end - break_start
+        arrivals, waits, end = _schedule(nodes, stops, legs, service, windows, start)[:3]
+        opens = arrivals + waits
+        delay = np.maximum(opens, np.maximum(arrivals, break_start) + duration) - opens
+        candidates = stops & (arrivals <= break_end)
+        position = np.where(
+            candidates.any(axis=2), np.argmin(np.where(candidates, delay, np.iinfo(np.int64).max), axis=2), 1
+        )
+        needed = stops.any(axis=2) & (end > break_end) & (start < break_start + duration)
+        break_at = (np.where(needed, position, -1), break_start, duration)
+
+    arrivals, waits, time, window_lateness, late_stops = _schedule(
+        nodes, stops, legs, service, windows, start, break_at
+    )
+    idle = waits.sum(axis=2)
+
+    used = stops.any(axis=2)
+    end = np.where(used, time, start)
+    start = np.where(used, start, 0)
+    end = np.where(used, end, 0)
+
+    # Her düğümün kaç kez ziyaret edildiği (küme başına)
+    offsets = (np.arange(batch) * size)[:, None, None]
+    visits = np.bincount((nodes + offsets)[stops], minlength=batch * size).reshape(batch, size)
+    visits[:, depot_index] = 1
+    missing = (visits == 0).sum(axis=1)
+    duplicates = np.maximum(visits - 1, 0).sum(axis=1)
+
+    capacity_excess = np.maximum(0.0, load - vehicle_capacity)
+    feasible = (
+        (capacity_excess.sum(axis=1) == 0) & (late_stops.sum(axis=1) == 0) & (missing == 0) & (duplicates == 0)
+    )
+    return RouteEvaluation(
+        travel=legs.sum(axis=2),
+        load=load,
+        idle=idle,
+        start=start,
+        end=end,
+        overrun=np.maximum(0, end - shift_end) * used,
+        capacity_excess=capacity_excess,
+        window_lateness=window_lateness,
+        late_stops=late_stops,
+        missing=missing,
+        duplicates=duplicates,
+        feasible=feasible,
+    )
+
+
+def evaluate_plan(
+    routes: Sequence[Route],
+    matrix: np.ndarray,
+    demands: Sequence[float],
+    service_times: Sequence[int],
+    time_windows: Sequence[Sequence[int]],
+    vehicle_capacity: float,
+    shift_end: Optional[int] = None,
+    lunch_break: Optional[Tuple[int, int]] = None,
+    depot_index: int = 0,
+) -> Tuple[Dict, List[Dict]]:
+    """
+    Scores a single plan; convenience wrapper around `evaluate_routes`.
+
+    Step-dict routes leave the depot at their recorded first arrival time.
+
+    Returns:
+        Tuple[Dict, List[Dict]]: Plan totals and one dict of figures per route.
+    """
+    start_times = None
+    if routes and routes[0] and isinstance(routes[0][0], dict):
+        start_times = np.array([[route[0]["arrival_time"] for route in routes]], dtype=np.int64)
+    evaluation = evaluate_routes(
+        pad_routes([routes], depot_index), matrix, demands, service_times, time_windows,
+        vehicle_capacity, shift_end, start_times, lunch_break, depot_index,
+    )
+    totals = {key: value[0].item() for key, value in evaluation.totals().items()}
+    per_route = [
+        {field: getattr(evaluation, field)[0, v].item() for field in (
+            "travel", "load", "idle", "start", "end", "overrun", "capacity_excess", "window_lateness", "late_stops"
+        )}
+        for v in range(len(routes))
+    ]
+    return totals, per_route
@@ -0,0 +1,203 @@
+import csv
+import os
+import tempfile
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.utils import setup_logger
+
+logger = setup_logger("route_output")
+
+ROUTE_COLUMNS = [
+    "branch", "vehicle_id", "step_order", "location_index", "arrival_time (sec)",
+    "leg_duration", "cumulative_time", "demand", "load",
+]
+
+
+def matrix_nodes(route: List[Dict]) -> List[int]:
+    """Matrix node of each step; orders merged into a stop use the stop's node."""
+    return [step.get("stop_index", step["location_index"]) for step in route]
+
+
+def route_columns(
+    branch: str,
+    vehicle_id: int,
+    route: List[Dict],
+    nodes: Sequence[int],
+    matrix: np.ndarray,
+    demands: Sequence[float],
+    service_times: Sequence[int],
+) -> Dict[str, np.ndarray]:
+    """
+    Output columns of one route: its steps plus the return to the depot.
+
+    Args:
+        branch (str): Branch name.
+        vehicle_id (int): Route number within the branch.
+        route (List[Dict]): Steps {"location_index", "arrival_time"}, depot first.
+        nodes (Sequence[int]): Matrix node of each step (see `matrix_nodes`).
+        matrix (np.ndarray): Travel times the route was solved with.
+        demands (Sequence[float]): Demand per location index.
+        service_times (Sequence[int]): Service seconds per location index.
+
+    Returns:
+        Dict[str, np.ndarray]: One array per ROUTE_COLUMNS entry. `leg_duration`
+        is the travel time from the previous step, `cumulative_time` the time
+        since the depot departure and `load` the demand served so far.
+    """
+    nodes = np.asarray(list(nodes) + [nodes[0]], dtype=np.int64)
+    legs = np.concatenate([[0], np.asarray(matrix)[nodes[:-1], nodes[1:]]]).astype(np.int64)
+    locations = np.array([step["location_index"] for step in route] + [route[0]["location_index"]], dtype=np.int64)
+    arrivals = np.array([step["arrival_time"] for step in route] + [0], dtype=np.int64)
+    # Depoya dönüş: son servis bitişi + dönüş yolu (depoda bekleme olmaz)
+    arrivals[-1] = arrivals[-2] + int(service_times[locations[-2]]) + legs[-1]
+    demand = np.asarray(demands, dtype=np.float64)[locations]
+    demand[[0, -1]] = 0
+    return {
+        "branch": np.full(len(locations), branch, dtype=object),
+        "vehicle_id": np.full(len(locations), vehicle_id, dtype=np.int64),
+        "step_order": np.arange(len(locations), dtype=np.int64),
+        "location_index": locations,
+        "arrival_time (sec)": arrivals,
+        "leg_duration": legs,
+        "cumulative_time": arrivals - arrivals[0],
+        "demand": demand,
+        "load": np.cumsum(demand),
+    }
+
+
+class RouteTableWriter:
+    """
+    Streams route rows to a CSV file, or to a Parquet file (one row group per
+    vehicle) when `file_format` is "parquet" and pyarrow is installed.
+
+    Only the route being written is held in memory, so routes can be passed
+    in one by one as the solver extracts them (`write_route`). Rows go to a
+    temp file next to `path`, which `close()` renames into place; `discard()`
+    (or an exception inside the `with` block) leaves any existing table as it
+    was.
+
+    Args:
+        path_base (str): Output path without extension.
+        file_format (str): "csv" or "parquet".
+    """
+
+    def __init__(self, path_base: str, file_format: str = "csv"):
+        self._parquet = None
+        self._csv = None
+        self.route_count = 0
+        if file_format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                logger.warning("pyarrow is not installed, writing routes as CSV")
+                file_format = "csv"
+        if file_format not in ("csv", "parquet"):
+            raise ValueError(f"Unknown route output format: {file_format}")
+
+        self.path = f"{path_base}.{file_format}"
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or ".", prefix=f"{os.path.basename(self.path)}.", suffix=".tmp"
+        )
+        if file_format == "parquet":
+            os.close(fd)
+            self._schema = pa.schema([
+                ("branch", pa.string()), ("vehicle_id", pa.int64()), ("step_order", pa.int64()),
+                ("location_index", pa.int64()), ("arrival_time (sec)", pa.int64()), ("leg_duration", pa.int64()),
+                ("cumulative_time", pa.int64()), ("demand", pa.float64()), ("load", pa.float64()),
+            ])
+            self._table = pa.Table.from_pydict
+            self._parquet = pq.ParquetWriter(self._tmp_path, self._schema)
+        else:
+            self._file = os.fdopen(fd, "w", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(ROUTE_COLUMNS)
+
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        """Appends the rows of one route (from `route_columns`)."""
+        if self._parquet is not None:
+            self._parquet.write_table(self._table(columns, schema=self._schema))
+        else:
+            self._csv.writerows(zip(*(columns[column].tolist() for column in ROUTE_COLUMNS)))
+
+    def write_route(
+        self,
+        branch: str,
+        route: List[Dict],
+        route_matrix,
+        demands: Sequence[float],
+        service_times: Sequence[int],
+    ) -> None:
+        """
+        Appends one route as the next vehicle (see `write_route_table` for
+        the arguments).
+        """
+        matrix = route_matrix(route) if callable(route_matrix) else route_matrix
+        self.write(route_columns(
+            branch, self.route_count, route, matrix_nodes(route), matrix, demands, service_times
+        ))
+        self.route_count += 1
+
+    def _close_file(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        else:
+            self._file.close()
+
+    def close(self) -> str:
+        """Finishes the file and moves it to `path`."""
+        self._close_file()
+        os.chmod(self._tmp_path, 0o644)  # mkstemp 0600 açar
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def discard(self) -> None:
+        """Drops the rows written so far."""
+        self._close_file()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_route_table(
+    path_base: str,
+    branch: str,
+    routes: List[List[Dict]],
+    route_nodes: List[List[int]],
+    route_matrix,
+    demands: Sequence[float],
+    service_times: Sequence[int],
+    file_format: str = "csv",
+) -> str:
+    """
+    Writes a branch's routes, one vehicle at a time.
+
+    Args:
+        path_base (str): Output path without extension.
+        branch (str): Branch name.
+        routes (List[List[Dict]]): Routes as saved in the solution file.
+        route_nodes (List[List[int]]): Matrix node of each step of each route.
+        route_matrix: Travel-time matrix, or a callable route -> matrix
+            (e.g. the time slice of the route's departure).
+        demands (Sequence[float]): Demand per location index.
+        service_times (Sequence[int]): Service seconds per location index.
+        file_format (str): "csv" or "parquet" (CSV without pyarrow).
+
+    Returns:
+        str: Path of the written file.
+    """
+    with RouteTableWriter(path_base, file_format) as writer:
+        for vehicle_id, (route, nodes) in enumerate(zip(routes, route_nodes)):
+            matrix = route_matrix(route) if callable(route_matrix) else route_matrix
+            writer.write(route_columns(branch, vehicle_id, route, nodes, matrix, demands, service_times))
+    logger.info(f"Saved {len(routes)} routes to {writer.path}")
+    return writer.path
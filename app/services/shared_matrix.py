@@ -0,0 +1,63 @@
+import sys
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# (blok adı, şekil, dtype) – işçi süreçlerine pickle ile gönderilir
+SharedMatrixHandle = Tuple[str, Tuple[int, ...], str]
+
+
+class SharedMatrix:
+    """
+    A numpy array in a named shared-memory block.
+
+    The creating process copies the matrix in once; worker processes attach
+    by handle and get a zero-copy view, so N workers share one copy instead
+    of loading N. Only the creator unlinks the block.
+
+    Use `SharedMatrix.create(matrix)` in the parent and
+    `SharedMatrix.attach(handle)` in the worker processes it starts.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, ...], dtype: str, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        self.handle: SharedMatrixHandle = (shm.name, tuple(shape), np.dtype(dtype).str)
+
+    @classmethod
+    def create(cls, matrix: np.ndarray) -> "SharedMatrix":
+        """Copies `matrix` into a new shared-memory block."""
+        matrix = np.ascontiguousarray(matrix)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+        shared = cls(shm, matrix.shape, matrix.dtype.str, owner=True)
+        shared.array[...] = matrix
+        return shared
+
+    @classmethod
+    def attach(cls, handle: SharedMatrixHandle) -> "SharedMatrix":
+        """Maps an existing block read-only, without copying it."""
+        name, shape, dtype = handle
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # İşçiler üreticinin resource tracker'ını paylaşır; kayıt tekrarı zararsızdır,
+            # blok yine üretici unlink edene kadar yaşar
+            shm = shared_memory.SharedMemory(name=name)
+        shared = cls(shm, shape, dtype, owner=False)
+        shared.array.flags.writeable = False
+        return shared
+
+    def close(self, unlink: Optional[bool] = None) -> None:
+        """Releases this process's mapping; the owner also removes the block by default."""
+        self.array = None
+        self._shm.close()
+        if self.owner if unlink is None else unlink:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,5 +1,6 @@
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 from typing import List, Dict
+from app.services.vrp_solver import build_transit_matrix
 
 def solve_simple_vrp(
     distance_matrix: List[List[int]],
@@ -11,20 +12,14 @@ def solve_simple_vrp(
     manager = pywrapcp.RoutingIndexManager(len(distance_matrix), vehicle_count, depot_index)
     routing = pywrapcp.RoutingModel(manager)
 
-    # Distance callback
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return distance_matrix[from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    # Distance matrix (native, no Python callback)
+    transit_callback_index = routing.RegisterTransitMatrix(build_transit_matrix(distance_matrix))
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
-    # Demand callback
-    def demand_callback(from_index):
-        return int(demands[manager.IndexToNode(from_index)])
-
-    demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    # Demand vector
+    demand_callback_index = routing.RegisterUnaryTransitVector(
+        [int(demand) for demand in demands]
+    )
 
     routing.AddDimensionWithVehicleCapacity(
         demand_callback_index,
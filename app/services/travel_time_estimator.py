@@ -0,0 +1,364 @@
+import glob
+import json
+import os
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.matrix_cache import CACHE_DIR, load_matrix
+
+EARTH_RADIUS_M = 6371000.0
+SPEED_MODEL_FILE = "speed_model.json"
+MAX_CALIBRATION_SAMPLES = 1_000_000
+BLOCK_ELEMENTS = 1 << 18  # blok başına float32 eleman (~1 MB), L2 cache'e sığar
+
+# Kalibrasyon verisi yoksa: ~25 km/h yol hızı + 60 sn sabit süre
+DEFAULT_INTERCEPT = 60.0
+DEFAULT_SECONDS_PER_METER = 0.144
+
+# Yeterli veri olmadan kalibre edilemeyen model diske yazılmaz; süreç içinde tekrar denenmez
+_unfitted_models = {}
+
+
+def parse_locations(locations: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Splits "lat,lon" strings into latitude and longitude arrays (degrees).
+
+    Args:
+        locations (Sequence[str]): Coordinate strings.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: float64 latitudes and longitudes.
+    """
+    coords = np.array([location.split(",") for location in locations], dtype=np.float64).reshape(-1, 2)
+    return coords[:, 0], coords[:, 1]
+
+
+def _unit_vectors(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    vectors = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+    return vectors.astype(np.float32)
+
+
+def _great_circle_block(origins: np.ndarray, destinations: np.ndarray, out: np.ndarray, tmp: np.ndarray) -> None:
+    # Kiriş uzunluğu farklardan hesaplanır; float32'de bile ~0.5 m hassasiyet
+    np.subtract(origins[:, 0, None], destinations[None, :, 0], out=out)
+    np.square(out, out=out)
+    for axis in (1, 2):
+        np.subtract(origins[:, axis, None], destinations[None, :, axis], out=tmp)
+        np.square(tmp, out=tmp)
+        out += tmp
+    np.sqrt(out, out=out)
+    out *= np.float32(0.5)
+    np.minimum(out, np.float32(1.0), out=out)
+    np.arcsin(out, out=out)
+    out *= np.float32(2 * EARTH_RADIUS_M)
+
+
+def _iter_row_blocks(origins: np.ndarray, destinations: np.ndarray):
+    rows = max(1, BLOCK_ELEMENTS // max(1, len(destinations)))
+    out = np.empty((rows, len(destinations)), dtype=np.float32)
+    tmp = np.empty_like(out)
+    for start in range(0, len(origins), rows):
+        block = origins[start:start + rows]
+        _great_circle_block(block, destinations, out[:len(block)], tmp[:len(block)])
+        yield start, out[:len(block)]
+
+
+def haversine_matrix(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    dest_lats: Optional[np.ndarray] = None,
+    dest_lons: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Great-circle distances between every origin and destination, vectorized.
+
+    Equivalent to the haversine formula, evaluated through the chord between
+    unit vectors so it stays accurate in float32. Rows are processed in
+    cache-sized blocks that reuse two scratch buffers, so the only large
+    allocation is the result itself.
+
+    Args:
+        lats (np.ndarray): Origin latitudes in degrees.
+        lons (np.ndarray): Origin longitudes in degrees.
+        dest_lats (Optional[np.ndarray]): Destination latitudes; origins when omitted.
+        dest_lons (Optional[np.ndarray]): Destination longitudes; origins when omitted.
+
+    Returns:
+        np.ndarray: float32 matrix of distances in meters.
+    """
+    origins = _unit_vectors(lats, lons)
+    destinations = origins if dest_lats is None else _unit_vectors(dest_lats, dest_lons)
+
+    meters = np.empty((len(origins), len(destinations)), dtype=np.float32)
+    for start, block in _iter_row_blocks(origins, destinations):
+        meters[start:start + len(block)] = block
+    return meters
+
+
+def nearest_neighbors(locations: Sequence[str], k: int, exclude: Sequence[int] = ()) -> np.ndarray:
+    """
+    Indices of each location's `k` nearest other locations by great-circle distance.
+
+    Distances are computed block by block and only the `k` smallest per row
+    are kept, so memory stays O(N*k) instead of O(N^2).
+
+    Args:
+        locations (Sequence[str]): "lat,lon" strings.
+        k (int): Neighbors per location (capped at the number of candidates).
+        exclude (Sequence[int]): Nodes never returned as neighbors (e.g. the depot).
+
+    Returns:
+        np.ndarray: (N, k) int64 neighbor indices, nearest first.
+    """
+    points = _unit_vectors(*parse_locations(locations))
+    excluded = np.asarray(exclude, dtype=np.int64)
+    k = max(0, min(k, len(points) - 1 - len(set(excluded.tolist()))))
+
+    neighbors = np.empty((len(points), k), dtype=np.int64)
+    if k == 0:
+        return neighbors
+    for start, block in _iter_row_blocks(points, points):
+        rows = np.arange(len(block))
+        block[rows, start + rows] = np.inf  # kendisi komşu sayılmaz
+        block[:, excluded] = np.inf
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, nearest, axis=1), axis=1)
+        neighbors[start:start + len(block)] = np.take_along_axis(nearest, order, axis=1)
+    return neighbors
+
+
+class SpeedModel:
+    """
+    Linear travel-time model: seconds = intercept + seconds_per_meter * meters.
+
+    The intercept absorbs parking/turning overhead that dominates short hops;
+    the slope is the inverse of the effective road speed including detours.
+    """
+
+    def __init__(
+        self,
+        intercept: float = DEFAULT_INTERCEPT,
+        seconds_per_meter: float = DEFAULT_SECONDS_PER_METER,
+        samples: int = 0,
+    ):
+        self.intercept = intercept
+        self.seconds_per_meter = seconds_per_meter
+        self.samples = samples
+
+    @classmethod
+    def fit(cls, meters: np.ndarray, seconds: np.ndarray) -> "SpeedModel":
+        """
+        Least-squares fit on observed (distance, duration) pairs.
+
+        Args:
+            meters (np.ndarray): Straight-line distances.
+            seconds (np.ndarray): Observed travel times.
+
+        Returns:
+            SpeedModel: Fitted model, or the default one if there is too little data.
+        """
+        meters = np.asarray(meters, dtype=np.float64)
+        seconds = np.asarray(seconds, dtype=np.float64)
+        valid = (meters > 0) & (seconds > 0)
+        if valid.sum() < 10:
+            return cls()
+
+        slope, intercept = np.polyfit(meters[valid], seconds[valid], 1)
+        if slope <= 0:
+            return cls()
+        return cls(max(0.0, float(intercept)), float(slope), int(valid.sum()))
+
+    def predict(self, meters: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Converts distances to travel times, leaving zero-distance pairs at 0.
+
+        Args:
+            meters (np.ndarray): Distances in meters (modified in place).
+            out (Optional[np.ndarray]): int32 array to write into.
+
+        Returns:
+            np.ndarray: int32 travel times in seconds.
+        """
+        zero = meters <= 0
+        meters *= np.float32(self.seconds_per_meter)
+        meters += np.float32(self.intercept)
+        meters[zero] = 0
+        np.rint(meters, out=meters)
+        if out is None:
+            return meters.astype(np.int32)
+        out[...] = meters
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "intercept": self.intercept,
+            "seconds_per_meter": self.seconds_per_meter,
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpeedModel":
+        return cls(data["intercept"], data["seconds_per_meter"], data.get("samples", 0))
+
+
+def _calibration_samples(cache_dir: str, pair_store=None) -> Tuple[np.ndarray, np.ndarray]:
+    meters, seconds = [], []
+
+    # 1. Lokasyonları header'da kayıtlı branch cache'leri. Eski JSON cache'lerden taşınanlar
+    # (migrate_json_cache) lokasyon taşımaz; hangi koordinatlara ait oldukları bilinmediği için atlanır
+    for npy_path in sorted(glob.glob(os.path.join(cache_dir, "*_distance_matrix.npy"))):
+        branch_name = os.path.basename(npy_path)[: -len("_distance_matrix.npy")]
+        try:
+            matrix, meta = load_matrix(branch_name, cache_dir)
+        except Exception:
+            continue
+        if not meta.get("locations"):
+            continue
+        lats, lons = parse_locations(meta["locations"])
+        meters.append(haversine_matrix(lats, lons).ravel())
+        seconds.append(np.asarray(matrix, dtype=np.float32).ravel())
+
+    # 2. Pair store'daki koordinat çiftleri
+    if pair_store is not None:
+        from sqlalchemy import select
+        from app.services.pair_store import distance_pairs
+
+        query = select(distance_pairs).limit(MAX_CALIBRATION_SAMPLES)
+        with pair_store.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        if rows:
+            origins = parse_locations([row.origin for row in rows])
+            destinations = parse_locations([row.destination for row in rows])
+            meters.append(_pairwise_haversine(*origins, *destinations))
+            seconds.append(np.array([row.duration for row in rows], dtype=np.float32))
+
+    if not meters:
+        return np.empty(0), np.empty(0)
+
+    meters, seconds = np.concatenate(meters), np.concatenate(seconds)
+    if meters.size > MAX_CALIBRATION_SAMPLES:
+        pick = np.random.default_rng(0).choice(meters.size, MAX_CALIBRATION_SAMPLES, replace=False)
+        meters, seconds = meters[pick], seconds[pick]
+    return meters, seconds
+
+
+def _pairwise_haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def calibrate_speed_model(cache_dir: str = CACHE_DIR, pair_store=None, save: bool = True) -> SpeedModel:
+    """
+    Fits the speed model against real durations already fetched from the API.
+
+    Uses branch caches whose header records their locations and, if given,
+    the coordinate pair store. Legacy JSON caches (and the binary caches
+    migrated from them) do not record their locations, so their durations
+    cannot be matched to coordinates and are not used; on an install that
+    only has those, calibration relies on the pair store alone.
+
+    The model is only written to `speed_model.json` when it was actually
+    fitted. With too few samples the default is returned unsaved, so a
+    later call calibrates again once real pairs have been fetched.
+
+    Args:
+        cache_dir (str): Directory holding the cache files.
+        pair_store (Optional[DistancePairStore]): Extra source of observed pairs.
+        save (bool): Whether to write the fitted model to `speed_model.json`.
+
+    Returns:
+        SpeedModel: The fitted (or default) model.
+    """
+    meters, seconds = _calibration_samples(cache_dir, pair_store)
+    model = SpeedModel.fit(meters, seconds)
+    if not model.samples:
+        print(f"[WARNING] Only {meters.size} observed durations with known coordinates; "
+              f"using the default speed model until more are fetched")
+        return model
+
+    if save:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, SPEED_MODEL_FILE), "w") as f:
+            json.dump(model.to_dict(), f)
+    return model
+
+
+def load_speed_model(cache_dir: str = CACHE_DIR) -> SpeedModel:
+    """
+    Loads the calibrated speed model, calibrating it first if it does not exist.
+
+    Without enough real durations nothing is saved (see
+    `calibrate_speed_model`); the default model is then kept for the rest of
+    this process and the next process calibrates again.
+
+    Args:
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        SpeedModel: Calibrated model.
+    """
+    path = os.path.join(cache_dir, SPEED_MODEL_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return SpeedModel.from_dict(json.load(f))
+    if cache_dir in _unfitted_models:
+        return _unfitted_models[cache_dir]
+
+    from app.services.pair_store import DistancePairStore
+    try:
+        pair_store = DistancePairStore()
+    except Exception:
+        pair_store = None
+    model = calibrate_speed_model(cache_dir, pair_store)
+    if not model.samples:
+        _unfitted_models[cache_dir] = model
+    return model
+
+
+def estimate_pair_times(
+    origin_lats: np.ndarray,
+    origin_lons: np.ndarray,
+    destination_lats: np.ndarray,
+    destination_lons: np.ndarray,
+    model: Optional[SpeedModel] = None,
+) -> np.ndarray:
+    """
+    Estimates travel times for individual origin/destination pairs.
+
+    Args:
+        origin_lats (np.ndarray): Latitude of each pair's origin.
+        origin_lons (np.ndarray): Longitude of each pair's origin.
+        destination_lats (np.ndarray): Latitude of each pair's destination.
+        destination_lons (np.ndarray): Longitude of each pair's destination.
+        model (Optional[SpeedModel]): Speed model; the calibrated one when omitted.
+
+    Returns:
+        np.ndarray: int32 travel times in seconds, one per pair.
+    """
+    model = model or load_speed_model()
+    meters = _pairwise_haversine(origin_lats, origin_lons, destination_lats, destination_lons)
+    return model.predict(np.asarray(meters, dtype=np.float32).reshape(-1))
+
+
+def estimate_distance_matrix(locations: Sequence[str], model: Optional[SpeedModel] = None) -> np.ndarray:
+    """
+    Builds a full travel-time matrix offline from coordinates alone.
+
+    Args:
+        locations (Sequence[str]): "lat,lon" strings, depot first.
+        model (Optional[SpeedModel]): Speed model; the calibrated one when omitted.
+
+    Returns:
+        np.ndarray: C-contiguous int32 matrix of estimated travel times in seconds.
+    """
+    model = model or load_speed_model()
+    points = _unit_vectors(*parse_locations(locations))
+
+    matrix = np.empty((len(points), len(points)), dtype=np.int32)
+    for start, block in _iter_row_blocks(points, points):
+        model.predict(block, out=matrix[start:start + len(block)])
+    return matrix
@@ -1,20 +1,52 @@
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
-from typing import List, Dict
+from typing import Callable, List, Dict, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import threading
+import time
+from contextlib import contextmanager
 from app.schemas.location import WarehouseOrder
-from app.utils import load_depots, setup_logger
+from app.services.matrix_cache import slice_index
+from app.services.metrics import MetricsRecorder
+from app.utils import load_depots, setup_logger, write_json_atomic
 
 logger = setup_logger("multi_vrp")
 
+
+def build_transit_matrix(distance_matrix, service_times=None) -> List[List[int]]:
+    """
+    Folds service times into the travel-time matrix for native registration.
+
+    OR-Tools evaluates a registered matrix entirely in C++, so the search
+    never calls back into Python. Entry [i][j] is the travel time from i to j
+    plus the service time spent at i.
+
+    Args:
+        distance_matrix: Square matrix (nested lists or ndarray) in seconds.
+        service_times: Optional per-node service times in seconds.
+
+    Returns:
+        List[List[int]]: Plain-int nested lists, as RegisterTransitMatrix expects.
+    """
+    transit = np.array(distance_matrix, dtype=np.int64)
+    if service_times is not None:
+        transit += np.asarray(service_times, dtype=np.int64)[:, None]
+    return transit.tolist()
+
+
+def build_demand_vector(order_demands) -> List[int]:
+    """
+    Converts demands to the integer vector RegisterUnaryTransitVector expects.
+
+    Fractional demands are rounded up so the capacity limit is never exceeded.
+    """
+    return np.ceil(np.asarray(order_demands, dtype=np.float64)).astype(np.int64).tolist()
+
+
 def solve_vrp(distance_matrix: List[List[int]], vehicle_count: int, depot_index: int = 0) -> List[List[int]]:
     manager = pywrapcp.RoutingIndexManager(len(distance_matrix), vehicle_count, depot_index)
     routing = pywrapcp.RoutingModel(manager)
 
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return distance_matrix[from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    transit_callback_index = routing.RegisterTransitMatrix(build_transit_matrix(distance_matrix))
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
@@ -37,7 +69,122 @@ def solve_vrp(distance_matrix: List[List[int]], vehicle_count: int, depot_index:
     return routes
 
 
-def solve_vrp_with_time_windows(
+def make_search_parameters(
+    first_solution_strategy: str = "PATH_CHEAPEST_ARC",
+    metaheuristic: Optional[str] = None,
+    time_limit: int = 60,
+    neighbors: Optional[int] = None,
+    node_count: Optional[int] = None
+):
+    """
+    Builds routing search parameters from strategy names.
+
+    Args:
+        first_solution_strategy (str): `FirstSolutionStrategy` enum name.
+        metaheuristic (Optional[str]): `LocalSearchMetaheuristic` enum name;
+            OR-Tools' default when None.
+        time_limit (int): Search time limit in seconds.
+        neighbors (Optional[int]): If set with `node_count`, local search
+            operators only consider this many nearest (cheapest) neighbors
+            of each node instead of all nodes. Neighbors are chosen by arc
+            cost, not by which arcs of a sparse matrix were fetched; the
+            penalty on estimated arcs makes the two mostly coincide.
+        node_count (Optional[int]): Number of nodes in the model.
+
+    Returns:
+        RoutingSearchParameters: Parameters for `SolveWithParameters`.
+    """
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, first_solution_strategy
+    )
+    if metaheuristic:
+        search_parameters.local_search_metaheuristic = getattr(
+            routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic
+        )
+    search_parameters.time_limit.FromSeconds(time_limit)
+
+    # Komşuluk kısıtı eski OR-Tools sürümlerinde yok
+    fields = search_parameters.DESCRIPTOR.fields_by_name
+    if neighbors and node_count and "ls_operator_neighbors_ratio" in fields:
+        search_parameters.ls_operator_neighbors_ratio = min(1.0, neighbors / node_count)
+        search_parameters.ls_operator_min_neighbors = neighbors
+    return search_parameters
+
+
+def bound_vehicle_starts(
+    routing: pywrapcp.RoutingModel,
+    time_dimension: pywrapcp.RoutingDimension,
+    time_windows: List[List[int]],
+    vehicle_depots: Sequence[int],
+) -> None:
+    """
+    Makes every vehicle leave its depot within the depot's time window.
+
+    A depot shared by several vehicles has one start index per vehicle and
+    `NodeToIndex` returns only one of them, so setting the depot window
+    through the node loop bounded a single vehicle; the others could leave
+    at any time, e.g. before WORK_START.
+
+    Args:
+        routing (pywrapcp.RoutingModel): Model to constrain.
+        time_dimension (pywrapcp.RoutingDimension): Its time dimension.
+        time_windows (List[List[int]]): Per-node [start, end] windows.
+        vehicle_depots (Sequence[int]): Depot node of each vehicle.
+    """
+    for v_id, depot in enumerate(vehicle_depots):
+        time_dimension.CumulVar(routing.Start(v_id)).SetRange(*time_windows[depot])
+
+
+def break_slack(lunch_breaks: Optional[Sequence], waiting_slack: int = 300) -> int:
+    """
+    Slack of the time dimension needed for `lunch_breaks`.
+
+    A break is taken between two visits and is counted in the slack of that
+    arc, so the slack must hold the longest break; without breaks the usual
+    waiting slack is kept.
+    """
+    longest_break = max((end - start for start, end in filter(None, lunch_breaks or [])), default=0)
+    return max(waiting_slack, longest_break)
+
+
+def add_lunch_breaks(
+    routing: pywrapcp.RoutingModel,
+    manager: pywrapcp.RoutingIndexManager,
+    time_dimension: pywrapcp.RoutingDimension,
+    service_times: List[int],
+    lunch_breaks: Sequence,
+) -> None:
+    """
+    Adds one mandatory break per vehicle to the time dimension.
+
+    A (start, end) entry means a break of end - start seconds that starts
+    between `start` and `end`; an empty entry means no break for that
+    vehicle. Service times are passed as visit transits so a break never
+    interrupts a service. The model must be built with
+    `max_slack=break_slack(lunch_breaks)`.
+
+    Args:
+        routing (pywrapcp.RoutingModel): Model to constrain.
+        manager (pywrapcp.RoutingIndexManager): Its index manager.
+        time_dimension (pywrapcp.RoutingDimension): Its time dimension.
+        service_times (List[int]): Per-node service times in seconds.
+        lunch_breaks (Sequence): (start, end) or None per vehicle.
+    """
+    node_visit_transits = [
+        int(service_times[manager.IndexToNode(index)]) for index in range(routing.Size())
+    ]
+    for v_id, lunch in enumerate(lunch_breaks):
+        if not lunch:
+            continue
+        break_start, break_end = lunch
+        interval = routing.solver().FixedDurationIntervalVar(
+            break_start, break_end, break_end - break_start, False, f"Break{v_id}"
+        )
+        time_dimension.SetBreakIntervalsOfVehicle([interval], v_id, node_visit_transits)
+
+
+def build_time_window_model(
     distance_matrix: List[List[int]],
     service_times: List[int],
     vehicle_count: int,
@@ -45,31 +192,65 @@ def solve_vrp_with_time_windows(
     order_demands: List[int],
     depot_index: int,
     time_windows: List[List[int]],
-    lunch_breaks: List[List[int]]
-) -> Dict:
-    manager = pywrapcp.RoutingIndexManager(len(distance_matrix), vehicle_count, depot_index)
-    routing = pywrapcp.RoutingModel(manager)
+    vehicle_slices: Optional[Sequence[int]] = None,
+    max_slack: int = 300,
+    vehicle_depots: Optional[Sequence[int]] = None,
+    bound_starts: bool = False,
+) -> Tuple[pywrapcp.RoutingIndexManager, pywrapcp.RoutingModel, pywrapcp.RoutingDimension]:
+    """
+    Builds the capacitated routing model with a time dimension.
 
-    print("🚨 Max demand:", max(order_demands))
-    print("🚛 Vehicle capacity:", vehicle_capacity)
-    print("🚛 Vehicle count:", vehicle_count)
-    print("🚛 Depot index:", depot_index)
-    print("🚛 Time windows:", time_windows)
-    print("🚛 Lunch breaks:", lunch_breaks)
+    Travel plus service time and demands are registered as native OR-Tools
+    matrix/vector transits, so no Python callback runs during the search.
 
-    # Zaman + servis süresi callback
-    def time_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return distance_matrix[from_node][to_node] + service_times[from_node]
+    Args:
+        distance_matrix: Square matrix, or an (S, N, N) time-sliced tensor
+            when `vehicle_slices` is given.
+        vehicle_slices (Optional[Sequence[int]]): Tensor slice each vehicle
+            travels on; one transit matrix is registered per distinct slice.
+        max_slack (int): Longest wait allowed before a service; see
+            `break_slack` when the vehicles take breaks.
+        vehicle_depots (Optional[Sequence[int]]): Depot node each vehicle
+            starts and ends at (multi-depot); `depot_index` for all when omitted.
+        bound_starts (bool): Make every vehicle leave within its depot's
+            window (`bound_vehicle_starts`); always on with `vehicle_depots`.
+            Otherwise the depot window is set through its node index as
+            before, which bounds only the first vehicle's start.
 
-    transit_callback_index = routing.RegisterTransitCallback(time_callback)
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+    Returns:
+        Tuple: (manager, routing, time_dimension).
+    """
+    node_count = len(time_windows)
+    bound_starts = bound_starts or vehicle_depots is not None
+    if vehicle_depots is None:
+        manager = pywrapcp.RoutingIndexManager(node_count, vehicle_count, depot_index)
+        vehicle_depots = [depot_index] * vehicle_count
+    else:
+        vehicle_depots = [int(depot) for depot in vehicle_depots]
+        manager = pywrapcp.RoutingIndexManager(node_count, vehicle_count, vehicle_depots, vehicle_depots)
+    depots = set(vehicle_depots) | {depot_index}
+    routing = pywrapcp.RoutingModel(manager)
+
+    # Zaman + servis süresi matrisi (zaman dilimli tensörde araç başına)
+    if vehicle_slices is None:
+        transit_callback_index = routing.RegisterTransitMatrix(
+            build_transit_matrix(distance_matrix, service_times)
+        )
+        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+        vehicle_transits = [transit_callback_index] * vehicle_count
+    else:
+        slice_transits = {
+            s: routing.RegisterTransitMatrix(build_transit_matrix(distance_matrix[s], service_times))
+            for s in sorted(set(vehicle_slices))
+        }
+        vehicle_transits = [slice_transits[s] for s in vehicle_slices]
+        for v_id, transit in enumerate(vehicle_transits):
+            routing.SetArcCostEvaluatorOfVehicle(transit, v_id)
 
-    # ZAMAN BOYUTU – toplam süre artırıldı
-    routing.AddDimension(
-        transit_callback_index,
-        300,        # waiting slack
+    # ZAMAN BOYUTU – toplam süre artırıldı
+    routing.AddDimensionWithVehicleTransits(
+        vehicle_transits,
+        max_slack,  # waiting slack
         72000,      # 20 saat maksimum rota süresi
         False,      # force start cumul to zero = False
         "Time"
@@ -78,28 +259,15 @@ def solve_vrp_with_time_windows(
 
     # ZAMAN PENCERELERİ
     for location_idx, (start, end) in enumerate(time_windows):
+        if bound_starts and location_idx in depots:
+            continue
         index = manager.NodeToIndex(location_idx)
         time_dimension.CumulVar(index).SetRange(start, end)
-
-    # LUNCH BREAKLER (geçici olarak devre dışı)
-    # for v_id in range(vehicle_count):
-    #     break_start, break_end = lunch_breaks[v_id]
-    #     interval = routing.solver().FixedDurationIntervalVar(
-    #         break_start, break_end,
-    #         break_end - break_start,
-    #         True,
-    #         f"Break{v_id}"
-    #     )
-    #     time_dimension.SetBreakIntervalsOfVehicle(
-    #         [interval],
-    #         v_id,
-    #         [break_end - break_start]
-    #     )
+    if bound_starts:
+        bound_vehicle_starts(routing, time_dimension, time_windows, vehicle_depots)
 
     # KAPASİTE BOYUTU
-    demand_callback_index = routing.RegisterUnaryTransitCallback(
-        lambda from_index: order_demands[manager.IndexToNode(from_index)]
-    )
+    demand_callback_index = routing.RegisterUnaryTransitVector(build_demand_vector(order_demands))
     routing.AddDimensionWithVehicleCapacity(
         demand_callback_index,
         0,  # slack
@@ -108,30 +276,433 @@ def solve_vrp_with_time_windows(
         "Capacity"
     )
 
-    # ARAMA PARAMETRELERİ
-    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-    search_parameters.time_limit.FromSeconds(60)  # timeout: 60 saniye
+    return manager, routing, time_dimension
 
-    print("🧠 Solving VRP with time windows...")
-    solution = routing.SolveWithParameters(search_parameters)
 
-    if not solution:
-        print("❌ Çözüm bulunamadı.")
-        return {"status": "No solution found"}
+def extract_routes(
+    routing, manager, time_dimension, vehicle_count: int, solution=None,
+    on_route: Optional[Callable[[List[Dict]], None]] = None
+) -> List[List[Dict]]:
+    """
+    Reads the non-empty routes with arrival times.
+
+    Args:
+        solution: Assignment to read; when None the current variable values
+            are used, which is valid inside a solution callback.
+        on_route (Optional[Callable[[List[Dict]], None]]): Called with each
+            route as soon as it is read, e.g. to stream it to a route table.
+
+    Returns:
+        List[List[Dict]]: Per-vehicle steps {"location_index", "arrival_time"}.
+    """
+    if solution is None:
+        next_of = lambda index: routing.NextVar(index).Value()
+        arrival_of = lambda index: time_dimension.CumulVar(index).Min()
+    else:
+        next_of = lambda index: solution.Value(routing.NextVar(index))
+        arrival_of = lambda index: solution.Min(time_dimension.CumulVar(index))
 
-    # SONUÇLARI TOPARLA
     routes = []
     for v_id in range(vehicle_count):
         index = routing.Start(v_id)
         route = []
         while not routing.IsEnd(index):
             node = manager.IndexToNode(index)
-            arrival = solution.Min(time_dimension.CumulVar(index))
-            route.append({"location_index": node, "arrival_time": arrival})
-            index = solution.Value(routing.NextVar(index))
+            route.append({"location_index": node, "arrival_time": arrival_of(index)})
+            index = next_of(index)
         if len(route) > 1:
             routes.append(route)
+            if on_route is not None:
+                on_route(route)
+    return routes
+
+
+def adaptive_time_limit(
+    node_count: int,
+    base_seconds: int = 5,
+    seconds_per_node: float = 0.25,
+    min_seconds: int = 10,
+    max_seconds: int = 900
+) -> int:
+    """
+    Maximum search budget scaled with the instance size.
+
+    Small branches get a short cap (they are usually stopped earlier by
+    plateau detection anyway); large ones get proportionally more time.
+    """
+    return int(min(max_seconds, max(min_seconds, base_seconds + seconds_per_node * node_count)))
+
+
+class ImprovementMonitor:
+    """
+    Solution callback tracking the best objective over time.
+
+    Stops the search when the best objective improved by less than
+    `min_improvement` percent over the last `plateau_window` seconds, and
+    optionally writes each improving solution to `snapshot_path` (at most
+    once per `snapshot_interval` seconds, plus the final best).
+
+    A long stall finds no solutions and so calls nothing back; `tick()`
+    repeats the plateau and snapshot checks from `periodic_checks`.
+    """
+
+    def __init__(
+        self,
+        routing,
+        manager,
+        time_dimension,
+        vehicle_count: int,
+        plateau_window: Optional[float] = None,
+        min_improvement: float = 0.5,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = 1.0
+    ):
+        self.routing = routing
+        self.manager = manager
+        self.time_dimension = time_dimension
+        self.vehicle_count = vehicle_count
+        self.plateau_window = plateau_window
+        self.min_improvement = min_improvement
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self.start = time.monotonic()
+        self.history = []  # (saniye, en iyi amaç değeri)
+        self.best = None
+        self.stopped = False
+        self._last_snapshot = float("-inf")
+        self._pending_routes = None
+        self._lock = threading.Lock()  # çözüm geri çağrısı ve tick() aynı anda çalışabilir
+
+    def best_at(self, elapsed: float) -> Optional[int]:
+        best = None
+        for t, objective in self.history:
+            if t > elapsed:
+                break
+            best = objective
+        return best
+
+    def __call__(self):
+        elapsed = time.monotonic() - self.start
+        objective = self.routing.CostVar().Value()
+
+        with self._lock:
+            if self.best is None or objective < self.best:
+                self.best = objective
+                self.history.append((elapsed, objective))
+                if self.snapshot_path:
+                    self._pending_routes = extract_routes(
+                        self.routing, self.manager, self.time_dimension, self.vehicle_count
+                    )
+        self.tick(elapsed)
+
+    def tick(self, elapsed: Optional[float] = None):
+        """Writes a due snapshot and stops the search once the objective has plateaued."""
+        elapsed = time.monotonic() - self.start if elapsed is None else elapsed
+        with self._lock:
+            if self._pending_routes is not None and elapsed - self._last_snapshot >= self.snapshot_interval:
+                self._write_snapshot(elapsed)
+            if self.stopped or not self.plateau_window or elapsed < self.plateau_window:
+                return
+            before = self.best_at(elapsed - self.plateau_window)
+            if not before or (before - self.best) * 100.0 / before >= self.min_improvement:
+                return
+            self.stopped = True
+        logger.info(f"Objective plateaued at {self.best} after {elapsed:.1f}s, stopping search")
+        # CancelSearch başka bir iş parçacığından da güvenle çağrılır; en iyi çözüm döner
+        self.routing.CancelSearch()
+
+    def write_snapshot(self, elapsed: Optional[float] = None):
+        """Atomically writes the latest improving routes, if any are pending."""
+        with self._lock:
+            self._write_snapshot(time.monotonic() - self.start if elapsed is None else elapsed)
+
+    def _write_snapshot(self, elapsed: float):
+        if self._pending_routes is None:
+            return
+        snapshot = {
+            "status": "OK",
+            "objective": self.best,
+            "elapsed_seconds": round(elapsed, 3),
+            "routes": self._pending_routes,
+        }
+        write_json_atomic(self.snapshot_path, snapshot)
+        self._pending_routes = None
+        self._last_snapshot = elapsed
+
+
+class SearchProgressMonitor:
+    """
+    Solution callback reporting search progress at a fixed interval.
+
+    A sample (solutions so far, best objective, branches, failures) is
+    taken every `interval` seconds, and once more by `finish()` when the
+    search ends. OR-Tools only calls back into Python when a solution is
+    found, so `tick()` samples from `periodic_checks` during stalls too.
+    Samples go to the run's `MetricsRecorder` and the log.
+    """
+
+    def __init__(self, routing, metrics: MetricsRecorder, interval: float = 5.0):
+        self.routing = routing
+        self.metrics = metrics
+        self.interval = interval
+        self.solutions = 0
+        self.best = None
+        self.start = time.monotonic()
+        self._last_report = float("-inf")
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        self.solutions += 1
+        objective = self.routing.CostVar().Value()
+        if self.best is None or objective < self.best:
+            self.best = objective
+        self.tick()
+
+    def tick(self):
+        """Reports a sample if `interval` seconds have passed since the last one."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self.report()
+
+    def report(self):
+        solver = self.routing.solver()
+        sample = {
+            "solutions": self.solutions,
+            "best_objective": self.best,
+            "branches": solver.Branches(),
+            "failures": solver.Failures(),
+            "search_seconds": round(time.monotonic() - self.start, 3),
+        }
+        self.metrics.record_progress(**sample)
+        logger.info(
+            f"Search progress: {sample['solutions']} solutions, best {sample['best_objective']}, "
+            f"{sample['branches']} branches after {sample['search_seconds']}s"
+        )
+
+    def finish(self):
+        self.report()
+
+
+@contextmanager
+def periodic_checks(checks: Sequence, interval: float = 1.0):
+    """
+    Calls each of `checks` every `interval` seconds from a background
+    thread while the block runs.
+
+    The solver releases the GIL while searching, so the checks run even
+    when no solution callback fires. A failing check is logged and does
+    not stop the others.
+    """
+    done = threading.Event()
+
+    def run():
+        while not done.wait(interval):
+            for check in checks:
+                try:
+                    check()
+                except Exception as e:
+                    logger.warning(f"Periodic search check failed: {e}")
+
+    thread = threading.Thread(target=run, name="search-checks", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+class SearchOptions(NamedTuple):
+    """
+    Search settings of `solve_vrp_with_time_windows`.
+
+    Attributes:
+        time_limit (Optional[int]): Search limit in seconds (default 60, or
+            the adaptive budget in adaptive mode).
+        adaptive (bool): Use the adaptive budget and plateau stopping.
+        plateau_window (float): Sliding window for plateau detection (seconds).
+        plateau_min_improvement (float): Required improvement within the window (%).
+        snapshot_path (Optional[str]): If set, every improving solution is
+            written here so callers can take the best routes so far at any time.
+        neighbors (Optional[int]): Restrict local search to each node's
+            nearest neighbors (see `make_search_parameters`).
+        progress_interval (float): Seconds between search progress samples.
+    """
+    time_limit: Optional[int] = None
+    adaptive: bool = False
+    plateau_window: float = 10.0
+    plateau_min_improvement: float = 0.5
+    snapshot_path: Optional[str] = None
+    neighbors: Optional[int] = None
+    progress_interval: float = 5.0
+
+
+def _build_search(
+    distance_matrix, service_times, vehicle_count, vehicle_capacity, order_demands, depot_index,
+    time_windows, search: SearchOptions, *, lunch_breaks=(), vehicle_fixed_cost=0, slice_starts=None,
+    vehicle_departures=None, vehicle_depots=None, allowed_vehicles=None, bound_starts=False
+):
+    """Builds the model of `solve_vrp_with_time_windows` and its search parameters."""
+    vehicle_slices = None
+    if slice_starts is not None:
+        departures = list(vehicle_departures or [time_windows[depot_index][0]] * vehicle_count)
+        vehicle_slices = [slice_index(slice_starts, departure) for departure in departures]
+
+    manager, routing, time_dimension = build_time_window_model(
+        distance_matrix, service_times, vehicle_count, vehicle_capacity,
+        order_demands, depot_index, time_windows, vehicle_slices, break_slack(lunch_breaks), vehicle_depots,
+        bound_starts
+    )
+
+    # Çok depolu modelde bölge içindeki duraklara sadece o deponun araçları gidebilir
+    for node, vehicles in (allowed_vehicles or {}).items():
+        routing.SetAllowedVehiclesForIndex(list(vehicles), manager.NodeToIndex(node))
+
+    # Araç, seyahat süreleri kullanılan dilim içinde depodan çıkar
+    if vehicle_slices is not None:
+        for v_id, (departure, s) in enumerate(zip(departures, vehicle_slices)):
+            slice_end = slice_starts[s + 1] - 1 if s + 1 < len(slice_starts) else time_windows[depot_index][1]
+            time_dimension.CumulVar(routing.Start(v_id)).SetRange(departure, max(departure, slice_end))
+
+    # Araç başına sabit maliyet: kullanılan araç sayısını azaltır
+    if vehicle_fixed_cost:
+        routing.SetFixedCostOfAllVehicles(int(vehicle_fixed_cost))
+
+    # ÖĞLE ARALARI: (başlangıç, bitiş) -> bu aralıkta başlayan, bitiş - başlangıç süreli mola
+    if any(lunch_breaks or []):
+        add_lunch_breaks(routing, manager, time_dimension, service_times, lunch_breaks)
+
+    # ARAMA PARAMETRELERİ
+    if search.adaptive:
+        time_limit = search.time_limit or adaptive_time_limit(len(time_windows))
+        search_parameters = make_search_parameters(
+            metaheuristic="GUIDED_LOCAL_SEARCH", time_limit=time_limit,
+            neighbors=search.neighbors, node_count=len(time_windows)
+        )
+        logger.info(f"Adaptive time budget: {time_limit}s")
+    else:
+        search_parameters = make_search_parameters(
+            time_limit=search.time_limit or 60, neighbors=search.neighbors, node_count=len(time_windows)
+        )  # timeout: 60 saniye
+
+    return manager, routing, time_dimension, search_parameters
+
+
+def solve_vrp_with_time_windows(
+    distance_matrix: List[List[int]],
+    service_times: List[int],
+    vehicle_count: int,
+    vehicle_capacity: int,
+    order_demands: List[int],
+    depot_index: int,
+    time_windows: List[List[int]],
+    lunch_breaks: List[List[int]],
+    *,
+    search: SearchOptions = SearchOptions(),
+    vehicle_fixed_cost: int = 0,
+    initial_routes: Optional[List[List[int]]] = None,
+    slice_starts: Optional[Sequence[int]] = None,
+    vehicle_departures: Optional[Sequence[int]] = None,
+    metrics: Optional[MetricsRecorder] = None,
+    vehicle_depots: Optional[Sequence[int]] = None,
+    allowed_vehicles: Optional[Dict[int, List[int]]] = None,
+    bound_starts: bool = False,
+    on_route: Optional[Callable[[List[Dict]], None]] = None
+) -> Dict:
+    """
+    Solves the capacitated VRP with time windows.
+
+    In adaptive mode (`search.adaptive`) the time limit scales with the
+    instance size (`adaptive_time_limit`), guided local search is used, and
+    the search stops early once the best objective improved by less than
+    `search.plateau_min_improvement` percent over the last
+    `search.plateau_window` seconds.
+
+    Args:
+        search (SearchOptions): Time limit, adaptive mode, snapshots,
+            neighbor restriction and progress sampling.
+        vehicle_fixed_cost (int): Cost added for every vehicle used.
+        initial_routes (Optional[List[List[int]]]): Warm-start routes.
+        slice_starts (Optional[Sequence[int]]): If set, `distance_matrix` is an
+            (S, N, N) tensor with one slice per start time, and each vehicle
+            travels on the slice containing its departure time.
+        vehicle_departures (Optional[Sequence[int]]): Departure time of each
+            vehicle in seconds since midnight (default: depot opening time).
+            A vehicle leaves the depot within its departure's slice.
+        metrics (Optional[MetricsRecorder]): Receives the build_model, solve
+            and extract_routes spans and the search progress samples.
+        vehicle_depots (Optional[Sequence[int]]): Depot node each vehicle
+            starts and ends at, for a joint multi-depot solve. Every other
+            node is a stop, so each depot needs at least one vehicle.
+        allowed_vehicles (Optional[Dict[int, List[int]]]): Node -> the only
+            vehicles that may serve it.
+        bound_starts (bool): Every vehicle leaves within the depot's window
+            (see `build_time_window_model`).
+        on_route (Optional[Callable[[List[Dict]], None]]): Receives each route
+            of the final solution as it is extracted (see `extract_routes`).
+
+    Returns:
+        Dict: {"status": "OK", "routes": [...]} or {"status": "No solution found"}.
+    """
+    metrics = metrics or MetricsRecorder()
+    logger.info(
+        f"Solving {len(time_windows)} nodes with {vehicle_count} vehicles "
+        f"(capacity {vehicle_capacity}, max demand {max(order_demands)})"
+    )
+
+    with metrics.span("build_model", vehicles=vehicle_count):
+        manager, routing, time_dimension, search_parameters = _build_search(
+            distance_matrix, service_times, vehicle_count, vehicle_capacity, order_demands,
+            depot_index, time_windows, search, lunch_breaks=lunch_breaks,
+            vehicle_fixed_cost=vehicle_fixed_cost, slice_starts=slice_starts,
+            vehicle_departures=vehicle_departures, vehicle_depots=vehicle_depots,
+            allowed_vehicles=allowed_vehicles, bound_starts=bound_starts
+        )
+
+    monitored = search.adaptive or search.snapshot_path
+    if monitored:
+        monitor = ImprovementMonitor(
+            routing, manager, time_dimension, vehicle_count,
+            plateau_window=search.plateau_window if search.adaptive else None,
+            min_improvement=search.plateau_min_improvement,
+            snapshot_path=search.snapshot_path,
+        )
+        routing.AddAtSolutionCallback(monitor)
+    progress = SearchProgressMonitor(routing, metrics, search.progress_interval)
+    routing.AddAtSolutionCallback(progress)
+    checks = [progress.tick] + ([monitor.tick] if monitored else [])
+
+    with metrics.span("solve", vehicles=vehicle_count):
+        # Çözüm bulunamayan uzun aralıklarda da plato ve ilerleme kontrolleri çalışır
+        with periodic_checks(checks, min(1.0, search.progress_interval)):
+            solution = None
+            if initial_routes:
+                # Önceki çözümden sıcak başlangıç; geçersizse sıfırdan çöz
+                routing.CloseModelWithParameters(search_parameters)
+                initial_assignment = routing.ReadAssignmentFromRoutes(initial_routes, True)
+                if initial_assignment:
+                    logger.info("Warm-starting from previous routes")
+                    solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+                else:
+                    logger.warning("Initial routes are infeasible, solving from scratch")
+            if not solution:
+                solution = routing.SolveWithParameters(search_parameters)
+        progress.finish()
+    if monitored:
+        monitor.write_snapshot()
+
+    if not solution:
+        logger.warning("Çözüm bulunamadı.")
+        return {"status": "No solution found"}
+
+    # SONUÇLARI TOPARLA
+    with metrics.span("extract_routes"):
+        routes = extract_routes(routing, manager, time_dimension, vehicle_count, solution, on_route)
+
+    logger.info(f"Çözüm bulundu: {len(routes)} routes, objective {solution.ObjectiveValue()}")
+    return {"status": "OK", "routes": routes}
 
-    print("✅ Çözüm bulundu.")
-    return {"status": "OK", "routes": routes}
\ No newline at end of file
@@ -0,0 +1,117 @@
+import json
+import os
+from collections import defaultdict, deque
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.services.pair_store import coordinate_key
+
+
+def load_previous_routes(
+    solution_path: str,
+    locations: Sequence[str],
+    depot_index: int = 0,
+    precision: Optional[int] = None,
+) -> List[List[int]]:
+    """
+    Maps the routes of a previous `{branch}_solution.json` onto today's nodes.
+
+    Stops are matched by rounded coordinates, so today's node order does not
+    need to match the previous run. Stops that no longer exist are dropped;
+    each of today's nodes is used at most once.
+
+    Args:
+        solution_path (str): Path of the previous solution file.
+        locations (Sequence[str]): Today's "lat,lon" strings, depot first.
+        depot_index (int): Index of the depot node.
+        precision (Optional[int]): Coordinate rounding; defaults to
+            `settings.DISTANCE_CACHE_PRECISION`.
+
+    Returns:
+        List[List[int]]: Non-empty routes of today's node indices, depot excluded.
+        Empty if the file is missing or predates stored locations.
+    """
+    if not os.path.exists(solution_path):
+        return []
+    with open(solution_path, "r") as f:
+        previous = json.load(f)
+    if previous.get("status") != "OK" or not previous.get("locations"):
+        return []
+
+    precision = settings.DISTANCE_CACHE_PRECISION if precision is None else precision
+    today = defaultdict(deque)
+    for index, location in enumerate(locations):
+        if index != depot_index:
+            today[coordinate_key(location, precision)].append(index)
+
+    previous_locations = previous["locations"]
+    routes = []
+    for route in previous["routes"]:
+        mapped = []
+        for step in route:
+            key = coordinate_key(previous_locations[step["location_index"]], precision)
+            if today.get(key):
+                mapped.append(today[key].popleft())
+        if mapped:
+            routes.append(mapped)
+    return routes
+
+
+def complete_routes(
+    routes: List[List[int]],
+    distance_matrix,
+    order_demands: Sequence[float],
+    vehicle_count: int,
+    vehicle_capacity: float,
+    depot_index: int = 0,
+) -> List[List[int]]:
+    """
+    Turns partial routes into a full assignment by cheapest insertion.
+
+    Routes beyond `vehicle_count` are dissolved; their stops and every stop
+    not covered by a route are inserted, one at a time, at the position with
+    the smallest added travel time among routes with spare capacity. Time
+    windows are left to OR-Tools, which rejects the assignment if violated.
+
+    Args:
+        routes (List[List[int]]): Partial routes of node indices, depot excluded.
+        distance_matrix: Square travel-time matrix in seconds.
+        order_demands (Sequence[float]): Per-node demands.
+        vehicle_count (int): Number of vehicles in the model.
+        vehicle_capacity (float): Capacity of one vehicle.
+        depot_index (int): Index of the depot node.
+
+    Returns:
+        List[List[int]]: Exactly `vehicle_count` routes (some possibly empty).
+    """
+    matrix = np.asarray(distance_matrix)
+    demands = np.asarray(order_demands, dtype=np.float64)
+
+    routes = [list(route) for route in routes[:vehicle_count]]
+    routes += [[] for _ in range(vehicle_count - len(routes))]
+    loads = [float(demands[route].sum()) if route else 0.0 for route in routes]
+
+    routed = {node for route in routes for node in route}
+    unrouted = [node for node in range(len(matrix)) if node != depot_index and node not in routed]
+
+    for node in unrouted:
+        best = None
+        for v, route in enumerate(routes):
+            if loads[v] + demands[node] > vehicle_capacity:
+                continue
+            path = np.array([depot_index] + route + [depot_index])
+            prev, nxt = path[:-1], path[1:]
+            deltas = matrix[prev, node] + matrix[node, nxt] - matrix[prev, nxt]
+            position = int(np.argmin(deltas))
+            if best is None or deltas[position] < best[0]:
+                best = (deltas[position], v, position)
+        if best is None:
+            # Hiçbir araca sığmıyor: OR-Tools başlangıç çözümünü reddedecek
+            continue
+        _, v, position = best
+        routes[v].insert(position, node)
+        loads[v] += demands[node]
+
+    return routes
@@ -1,10 +1,55 @@
 import json
 import csv
+import fcntl
 import logging
-from typing import List, Dict
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
 from app.schemas.location import Depot, WarehouseOrder
 from app.exceptions import DepotFileNotFoundError, WarehouseOrdersLoadError
 
+# Sipariş dosyalarında boylam sütunu tarihsel olarak "longtitude" yazılıyor
+LONGITUDE_COLUMNS = ("longtitude", "longitude")
+# load_orders sadece doğrulanan sayısal sütunları okur; adres, durum vb. hiç ayrıştırılmaz
+ORDER_COLUMNS = ("latitude", *LONGITUDE_COLUMNS, "total_used_desi", "order_count", "total_desi")
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class OrderColumns(NamedTuple):
+    """
+    Validated order data as typed column arrays (one entry per accepted row).
+
+    Attributes:
+        latitude (np.ndarray): float64 latitudes.
+        longitude (np.ndarray): float64 longitudes.
+        total_used_desi (np.ndarray): float64 demand per order.
+        order_count (np.ndarray): int64 order count (0 when the column is absent).
+        total_desi (np.ndarray): float64 total desi (0 when the column is absent).
+        source_row (np.ndarray): int64 0-based data row of each order in the file.
+        rejected (pd.DataFrame): Rejected rows with columns `row` and `reason`.
+    """
+    latitude: np.ndarray
+    longitude: np.ndarray
+    total_used_desi: np.ndarray
+    order_count: np.ndarray
+    total_desi: np.ndarray
+    source_row: np.ndarray
+    rejected: pd.DataFrame
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def coordinates(self) -> List[str]:
+        """"lat,lon" strings as sent to the Distance Matrix API."""
+        return [f"{lat},{lon}" for lat, lon in zip(self.latitude.tolist(), self.longitude.tolist())]
+
+    def service_times(self, seconds_per_desi: float) -> np.ndarray:
+        """int64 service seconds per order (truncated like int())."""
+        return (self.total_used_desi * seconds_per_desi).astype(np.int64)
+
 def setup_logger(name: str = "master_vrp") -> logging.Logger:
     """
     Sets up and returns a logger with standard formatting.
@@ -26,6 +71,42 @@ def setup_logger(name: str = "master_vrp") -> logging.Logger:
 
     return logger
 
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive lock on `path` across threads and processes (an advisory
+    `flock` on `{path}.lock`).
+
+    Each call opens its own lock file handle, so the lock is not re-entrant:
+    never take it twice for the same path in one call chain.
+    """
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def write_json_atomic(path: str, data) -> None:
+    """
+    Writes compact JSON to a private temp file next to `path` and renames it
+    over `path`, so readers only ever see a complete file.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.chmod(tmp_path, 0o644)  # mkstemp 0600 açar
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def load_depots(filepath: str) -> List[Depot]:
     """
     Loads and validates a list of depots from a JSON file.
@@ -46,10 +127,160 @@ def load_depots(filepath: str) -> List[Depot]:
     except FileNotFoundError:
         raise DepotFileNotFoundError(filepath)
 
+
+def _numeric(frame: pd.DataFrame, column: str, reasons: np.ndarray, required: bool) -> np.ndarray:
+    if column not in frame:
+        return np.zeros(len(frame))
+    raw = frame[column]
+    values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+    missing = raw.isna().to_numpy()
+    invalid = np.isnan(values) & ~missing
+    if required:
+        reasons[missing & (reasons == "")] = f"missing {column}"
+    reasons[invalid & (reasons == "")] = f"non-numeric {column}"
+    return np.nan_to_num(values, nan=0.0)
+
+
+def validate_order_frame(frame: pd.DataFrame, row_offset: int = 0) -> Tuple[Dict[str, np.ndarray], pd.DataFrame]:
+    """
+    Validates one block of raw order rows with array operations.
+
+    Rows are rejected (first failing rule wins) for missing or non-numeric
+    coordinates, coordinates out of range or at (0, 0), and non-numeric or
+    negative desi values. Missing `total_used_desi` is treated as 0.
+
+    Args:
+        frame (pd.DataFrame): Raw rows as read from the file.
+        row_offset (int): Index of the block's first row within the file.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], pd.DataFrame]: Accepted column arrays and
+        the rejected rows (`row`, `reason`).
+    """
+    longitude_column = next((c for c in LONGITUDE_COLUMNS if c in frame), None)
+    if "latitude" not in frame or longitude_column is None:
+        raise WarehouseOrdersLoadError("Order file must have latitude and longtitude/longitude columns.")
+
+    reasons = np.full(len(frame), "", dtype=object)
+    lat = _numeric(frame, "latitude", reasons, required=True)
+    lon = _numeric(frame, longitude_column, reasons, required=True)
+    demand = _numeric(frame, "total_used_desi", reasons, required=False)
+    order_count = _numeric(frame, "order_count", reasons, required=False)
+    total_desi = _numeric(frame, "total_desi", reasons, required=False)
+
+    rules = [
+        ((np.abs(lat) > 90) | (np.abs(lon) > 180), "coordinates out of range"),
+        ((lat == 0) & (lon == 0), "zero coordinates"),
+        (demand < 0, "negative total_used_desi"),
+        ((order_count < 0) | (total_desi < 0), "negative order_count/total_desi"),
+    ]
+    for mask, reason in rules:
+        reasons[mask & (reasons == "")] = reason
+
+    accepted = reasons == ""
+    rows = np.arange(row_offset, row_offset + len(frame), dtype=np.int64)
+    columns = {
+        "latitude": lat[accepted],
+        "longitude": lon[accepted],
+        "total_used_desi": demand[accepted],
+        "order_count": order_count[accepted].astype(np.int64),
+        "total_desi": total_desi[accepted],
+        "source_row": rows[accepted],
+    }
+    rejected = pd.DataFrame({"row": rows[~accepted], "reason": reasons[~accepted]})
+    return columns, rejected
+
+
+def _iter_order_blocks(filepath: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    wanted = lambda column: column in ORDER_COLUMNS
+    if filepath.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            yield pd.read_parquet(filepath)
+            return
+        parquet = pq.ParquetFile(filepath)
+        columns = [c for c in parquet.schema_arrow.names if wanted(c)]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(filepath, usecols=wanted, chunksize=chunksize, encoding="utf-8")
+
+
+def load_orders(filepath: str, chunksize: int = DEFAULT_CHUNK_SIZE) -> OrderColumns:
+    """
+    Loads and validates an order file (CSV or Parquet) into typed column arrays.
+
+    The file is read in blocks of `chunksize` rows, and only the validated
+    numeric columns of each block are kept, so memory stays flat for large
+    daily exports. Rejected rows are returned with their reasons and logged.
+
+    Args:
+        filepath (str): Path to a `.csv` or `.parquet` order file.
+        chunksize (int): Rows per block.
+
+    Returns:
+        OrderColumns: Accepted orders plus the rejected rows.
+
+    Raises:
+        WarehouseOrdersLoadError: If the file is missing, unreadable, or lacks
+            coordinate columns.
+    """
+    if not os.path.exists(filepath):
+        raise WarehouseOrdersLoadError(f"Order file not found: {filepath}")
+
+    parts, rejected, offset = [], [], 0
+    try:
+        for frame in _iter_order_blocks(filepath, chunksize):
+            columns, bad = validate_order_frame(frame, offset)
+            parts.append(columns)
+            rejected.append(bad)
+            offset += len(frame)
+    except WarehouseOrdersLoadError:
+        raise
+    except Exception as e:
+        raise WarehouseOrdersLoadError(f"Order file could not be loaded: {e}")
+
+    orders = _concat_order_parts(parts, rejected)
+    if len(orders.rejected):
+        summary = orders.rejected["reason"].value_counts().to_dict()
+        setup_logger().warning(f"Rejected {len(orders.rejected)} of {offset} rows in {filepath}: {summary}")
+    return orders
+
+
+def orders_from_frame(frame: pd.DataFrame) -> OrderColumns:
+    """
+    Validates an in-memory order DataFrame into typed column arrays.
+
+    Args:
+        frame (pd.DataFrame): Raw order rows.
+
+    Returns:
+        OrderColumns: Accepted orders plus the rejected rows.
+    """
+    columns, rejected = validate_order_frame(frame.reset_index(drop=True))
+    return _concat_order_parts([columns], [rejected])
+
+
+def _concat_order_parts(parts: List[Dict[str, np.ndarray]], rejected: List[pd.DataFrame]) -> OrderColumns:
+    fields = ("latitude", "longitude", "total_used_desi", "order_count", "total_desi", "source_row")
+    if not parts:
+        empty = {field: np.empty(0, dtype=np.int64 if field in ("order_count", "source_row") else np.float64)
+                 for field in fields}
+        return OrderColumns(**empty, rejected=pd.DataFrame({"row": [], "reason": []}))
+    return OrderColumns(
+        **{field: np.concatenate([part[field] for part in parts]) for field in fields},
+        rejected=pd.concat(rejected, ignore_index=True),
+    )
+
+
 def load_warehouse_orders_from_csv(filepath: str) -> List[WarehouseOrder]:
     """
     Loads and validates a list of warehouse orders from a CSV file.
 
+    Builds one WarehouseOrder per row; the solver uses the column-wise
+    `load_orders` instead.
+
     Args:
         filepath (str): Path to the CSV file.
 
@@ -60,6 +291,7 @@ def load_warehouse_orders_from_csv(filepath: str) -> List[WarehouseOrder]:
         WarehouseOrdersLoadError: If the CSV file is missing or invalid.
     """
     orders = []
+    skipped = 0
     try:
         with open(filepath, newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
@@ -77,7 +309,9 @@ def load_warehouse_orders_from_csv(filepath: str) -> List[WarehouseOrder]:
                     )
                     orders.append(order)
                 except Exception:
-                    continue  # Skip rows with invalid data
+                    skipped += 1  # Skip rows with invalid data
     except Exception:
         raise WarehouseOrdersLoadError("CSV file could not be loaded.")
+    if skipped:
+        setup_logger().warning(f"Skipped {skipped} invalid rows in {filepath}")
     return orders
\ No newline at end of file
@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.services.aggregation import aggregate_stops, expand_routes
+
+METERS_PER_DEGREE = 111320.0
+
+
+def offsets(*meters):
+    # Aynı boylamda, kuzeye doğru metre cinsinden kaydırılmış siparişler
+    latitude = 41.0 + np.array(meters, dtype=np.float64) / METERS_PER_DEGREE
+    return latitude, np.full(len(meters), 28.6)
+
+
+def aggregate(latitude, longitude, demands=None, capacity=100, tolerance_m=10):
+    demands = np.ones(len(latitude)) if demands is None else np.asarray(demands, dtype=np.float64)
+    return aggregate_stops(latitude, longitude, demands, np.full(len(latitude), 60), capacity, tolerance_m)
+
+
+def stops(aggregation):
+    return [orders.tolist() for orders in aggregation.stop_orders]
+
+
+def test_orders_within_radius_merge_across_any_grid_line():
+    # 0,1 ve 2,3 arası 4 m; eski ızgaranın hücre sınırı nereye düşerse düşsün birleşirler
+    for base in (0.0, 3.0, 7.9, 9.99):
+        aggregation = aggregate(*offsets(base, base + 4, base + 500, base + 504))
+        assert stops(aggregation) == [[0, 1], [2, 3]]
+    assert aggregation.service_time.tolist() == [120, 120]
+
+
+def test_orders_beyond_radius_stay_apart():
+    assert stops(aggregate(*offsets(0, 11, 30))) == [[0], [1], [2]]
+
+
+def test_chain_within_radius_merges_transitively():
+    assert stops(aggregate(*offsets(0, 8, 16, 24, 100))) == [[0, 1, 2, 3], [4]]
+
+
+def test_many_orders_at_one_address():
+    latitude, longitude = offsets(*([0] * 40 + [200]))
+    assert stops(aggregate(latitude, longitude)) == [list(range(40)), [40]]
+
+
+def test_zero_tolerance_matches_exact_coordinates_only():
+    assert stops(aggregate(*offsets(0, 0, 1), tolerance_m=0)) == [[0, 1], [2]]
+
+
+def test_stop_over_capacity_is_split():
+    aggregation = aggregate(*offsets(0, 1, 2), demands=[6, 6, 3], capacity=10)
+    assert stops(aggregation) == [[0], [1, 2]]
+    assert aggregation.demand.tolist() == [6, 9]
+
+
+def test_expand_routes_serves_stop_orders_back_to_back():
+    aggregation = aggregate(*offsets(0, 2, 300))
+    routes = [[{"location_index": 0, "arrival_time": 0}, {"location_index": 1, "arrival_time": 100},
+               {"location_index": 2, "arrival_time": 400}]]
+    expanded = expand_routes(routes, aggregation, [60, 60, 60])
+    assert [(step["location_index"], step["arrival_time"], step.get("stop_index")) for step in expanded[0]] == [
+        (0, 0, None), (1, 100, 1), (2, 160, 1), (3, 400, 2)
+    ]
@@ -0,0 +1,53 @@
+import numpy as np
+
+from app.services.decomposition import _solve_subproblem, cluster_fleet_caps
+from app.services.vrp_solver import SearchOptions
+
+# Düğümler bir doğru üzerinde: süre = konum farkı
+POSITIONS = np.array([0, 100, 200, 300, 400])
+MATRIX = np.abs(POSITIONS[:, None] - POSITIONS[None, :])
+NODES = [0, 11, 12, 13, 14]  # küresel düğüm numaraları
+WINDOWS = [[0, 20000]] * len(POSITIONS)
+
+
+def solve(**kwargs):
+    return _solve_subproblem(
+        NODES, kwargs.pop("sub_matrix", MATRIX), [0, 60, 60, 60, 60], [0, 1, 1, 1, 1], WINDOWS, 2, 2,
+        SearchOptions(time_limit=1), **kwargs
+    )
+
+
+def test_routes_map_back_to_global_nodes():
+    result = solve()
+    assert result["status"] == "OK"
+    visited = sorted(step["location_index"] for route in result["routes"] for step in route[1:])
+    assert visited == NODES[1:]
+
+
+def test_departure_waves_and_time_slices_reach_the_cluster():
+    tensor = np.stack([MATRIX, 2 * MATRIX])
+    result = solve(sub_matrix=tensor, slice_starts=[0, 5000], departure_waves=[0, 5000], fleet_sizing=False)
+    assert result["status"] == "OK" and len(result["routes"]) == 2
+    departures = sorted(route[0]["arrival_time"] for route in result["routes"])
+    assert departures[0] < 5000 <= departures[1]
+    # İkinci dalganın aracı iki kat süreli dilimde gider
+    late = max(result["routes"], key=lambda route: route[0]["arrival_time"])
+    first_leg = late[1]["arrival_time"] - late[0]["arrival_time"]
+    assert first_leg == 2 * MATRIX[0, NODES.index(late[1]["location_index"])]
+
+
+def test_lunch_break_reaches_the_cluster():
+    result = solve(lunch_break=(150, 400), fleet_sizing=False)
+    assert result["status"] == "OK"
+    # 250 sn'lik mola: hiçbir rota molasız süreyle dönemez
+    for route in result["routes"]:
+        stops = [NODES.index(step["location_index"]) for step in route[1:]]
+        path = [0, *stops, 0]
+        unbroken = MATRIX[path[:-1], path[1:]].sum() + 60 * len(stops)
+        assert route[-1]["arrival_time"] + 60 + MATRIX[path[-2], 0] - route[0]["arrival_time"] >= unbroken + 250
+
+
+def test_fleet_caps_stay_within_branch_fleet():
+    assert cluster_fleet_caps([2, 1, 1], 8) == [4, 2, 2]
+    assert sum(cluster_fleet_caps([3, 2], 7)) == 7
+    assert cluster_fleet_caps([3, 3], 5) is None
@@ -0,0 +1,156 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from app.exceptions import DistanceMatrixAPIError
+from app.scripts.fake_distance_matrix_server import FakeDistanceMatrixHandler, _duration, start_server
+from app.services.distance_fetcher import DistanceMatrixFetcher, TokenBucket, plan_tiles
+
+LOCATIONS = [f"{41.0 + 0.01 * (i % 7):.5f},{28.6 + 0.013 * (i // 7):.5f}" for i in range(37)]
+
+
+def direct_matrix(origins, destinations):
+    return np.array([[_duration(o, d)[1] for d in destinations] for o in origins], dtype=np.int32)
+
+
+def fetcher_for(url, **kwargs):
+    kwargs = {"api_key": "test", "url": url, "workers": 4, "requests_per_second": 1000,
+              "max_retries": 3, "backoff_base": 0.001, **kwargs}
+    return DistanceMatrixFetcher(**kwargs)
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server, url = start_server("127.0.0.1", 0)
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture
+def flaky_server():
+    """Server answering its first requests with the given transient failures."""
+    failures = []
+
+    class FlakyHandler(FakeDistanceMatrixHandler):
+        def do_GET(self):
+            with self._lock:
+                code = failures.pop(0) if failures else None
+            if code is None:
+                super().do_GET()
+            else:
+                self._send_failure(code)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/maps/api/distancematrix/json", failures
+    server.shutdown()
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 200), (25, 25), (37, 37), (101, 7)])
+@pytest.mark.parametrize("limits", [(100, 25, 25), (12, 5, 4)])
+def test_plan_tiles_covers_every_cell_once_within_limits(shape, limits):
+    max_elements, max_origins, max_destinations = limits
+    covered = np.zeros(shape, dtype=int)
+    for rows, cols in plan_tiles(*shape, *limits):
+        size = (rows.stop - rows.start, cols.stop - cols.start)
+        assert size[0] <= max_origins and size[1] <= max_destinations
+        assert size[0] * size[1] <= max_elements
+        covered[rows, cols] += 1
+    assert (covered == 1).all()
+
+
+def test_plan_tiles_prefers_fewest_requests():
+    # 3 x 200: 3 x 25'lik 8 istek, 10 x 10'luk 20 isteğe tercih edilir
+    assert len(plan_tiles(3, 200)) == 8
+    assert plan_tiles(0, 5) == []
+
+
+def test_fetch_reassembles_tiles(server_url):
+    with fetcher_for(server_url) as fetcher:
+        matrix = fetcher.fetch(LOCATIONS, LOCATIONS)
+    assert matrix.dtype == np.int32
+    np.testing.assert_array_equal(matrix, direct_matrix(LOCATIONS, LOCATIONS))
+
+
+def test_fetch_rectangular_with_small_tiles(server_url):
+    origins, destinations = LOCATIONS[:9], LOCATIONS[5:]
+    with fetcher_for(server_url, max_elements=12, max_origins=5, max_destinations=4) as fetcher:
+        matrix = fetcher.fetch(origins, destinations)
+    np.testing.assert_array_equal(matrix, direct_matrix(origins, destinations))
+
+
+def test_fetch_rows_uses_each_origins_destinations(server_url):
+    destination_lists = [LOCATIONS[:3], LOCATIONS[10:40], []]
+    with fetcher_for(server_url) as fetcher:
+        rows = fetcher.fetch_rows(LOCATIONS[:3], destination_lists)
+    for origin, destinations, row in zip(LOCATIONS[:3], destination_lists, rows):
+        np.testing.assert_array_equal(row, direct_matrix([origin], destinations).ravel())
+
+
+def test_tiles_above_server_limit_fail_without_retry(server_url):
+    with fetcher_for(server_url, max_elements=400, max_origins=30, max_destinations=30) as fetcher:
+        with pytest.raises(DistanceMatrixAPIError, match="MAX_ELEMENTS_EXCEEDED"):
+            fetcher.fetch(LOCATIONS[:30], LOCATIONS[:30])
+
+
+def test_transient_failures_are_retried(flaky_server):
+    url, failures = flaky_server
+    failures.extend([429, 503, 200, 500, 429])
+    with fetcher_for(url, workers=2) as fetcher:
+        matrix = fetcher.fetch(LOCATIONS, LOCATIONS)
+    assert failures == []
+    np.testing.assert_array_equal(matrix, direct_matrix(LOCATIONS, LOCATIONS))
+
+
+def test_retries_run_out(flaky_server):
+    url, failures = flaky_server
+    failures.extend([503] * 3)
+    with fetcher_for(url, workers=1, max_retries=2) as fetcher:
+        with pytest.raises(DistanceMatrixAPIError, match="HTTP 503"):
+            fetcher.fetch(LOCATIONS[:2], LOCATIONS[:2])
+
+
+def test_random_failures_still_give_exact_matrix():
+    server, url = start_server("127.0.0.1", 0, fail_rate=0.2)
+    try:
+        with fetcher_for(url, max_retries=12) as fetcher:
+            matrix = fetcher.fetch(LOCATIONS, LOCATIONS)
+    finally:
+        server.shutdown()
+    np.testing.assert_array_equal(matrix, direct_matrix(LOCATIONS, LOCATIONS))
+
+
+def test_token_bucket_limits_sustained_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    # İlk jeton hazır, sonraki dördü 1/20 s arayla
+    assert time.monotonic() - started >= 0.18
+
+
+def test_token_bucket_allows_burst_up_to_capacity():
+    bucket = TokenBucket(rate=1, capacity=5)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.5
+
+
+def test_token_bucket_shared_between_threads():
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(3)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started >= 11 / 50 - 0.02
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
@@ -0,0 +1,135 @@
+import numpy as np
+
+from app.services.insertion import (
+    Insertion, PlanTravelTimes, apply_insertion, cheapest_feasible_insertion, first_free_step, repair_route,
+    reschedule, route_is_feasible
+)
+from app.services.travel_time_estimator import SpeedModel
+
+# Düğümler bir doğru üzerinde: süre = konum farkı
+POSITIONS = np.array([0, 100, 300, 200])
+LOCATIONS = [f"41.0,{28.6 + 0.01 * i:.2f}" for i in range(len(POSITIONS))]
+SERVICE = [0, 0, 0, 0]
+WORK_START, WORK_END = 0, 10000
+
+
+def travel_times():
+    matrix = np.abs(POSITIONS[:, None] - POSITIONS[None, :])
+    return PlanTravelTimes(LOCATIONS, matrix, {i: i for i in range(len(LOCATIONS))}, SpeedModel())
+
+
+def plan():
+    return [[
+        {"location_index": 0, "arrival_time": 0},
+        {"location_index": 1, "arrival_time": 100},
+        {"location_index": 2, "arrival_time": 300},
+    ]]
+
+
+def insert(routes, demands=(0, 4, 4, 2), window=(WORK_START, WORK_END), now=0, **kwargs):
+    return cheapest_feasible_insertion(
+        routes, travel_times(), SERVICE, demands, 3, 10, now, window, WORK_START, WORK_END, **kwargs
+    )
+
+
+def test_cheapest_position_and_apply():
+    routes = plan()
+    insertion = insert(routes)
+    assert insertion == Insertion(vehicle=0, position=2, cost_delta=0, arrival_time=200)
+
+    updated = apply_insertion(routes, insertion, {"location_index": 3}, travel_times(), SERVICE, WORK_START, WORK_END)
+    assert [step["location_index"] for step in updated[0]] == [0, 1, 3, 2]
+    assert [step["arrival_time"] for step in updated[0]] == [0, 100, 200, 300]
+    assert [step["location_index"] for step in routes[0]] == [0, 1, 2]
+
+
+def test_window_pushes_following_stops():
+    routes = plan()
+    insertion = insert(routes, window=(250, 400))
+    assert (insertion.position, insertion.arrival_time) == (2, 250)
+    updated = apply_insertion(routes, insertion, {"location_index": 3}, travel_times(), SERVICE, WORK_START, WORK_END)
+    assert [step["arrival_time"] for step in updated[0]] == [0, 100, 250, 350]
+
+
+def test_push_respects_window_of_later_stop():
+    routes = plan()
+    routes[0][2]["time_window"] = [0, 320]
+    # 2'den önce eklemek 2'yi 350'ye iter; pencere 320'de kapanır
+    insertion = insert(routes, window=(250, 400))
+    assert (insertion.position, insertion.arrival_time) == (3, 400)
+
+
+def test_no_feasible_position():
+    assert insert(plan(), window=(0, 150)) is None
+    assert insert(plan(), window=(0, 150), max_vehicles=3) is None
+
+
+def test_full_vehicle_opens_new_route():
+    routes = plan()
+    assert insert(routes, demands=(0, 4, 4, 3)) is None
+
+    insertion = insert(routes, demands=(0, 4, 4, 3), max_vehicles=2, vehicle_fixed_cost=1000)
+    assert insertion == Insertion(vehicle=1, position=1, cost_delta=1400, arrival_time=200)
+    updated = apply_insertion(routes, insertion, {"location_index": 3}, travel_times(), SERVICE, WORK_START, WORK_END)
+    assert updated[1] == [{"location_index": 0, "arrival_time": 0}, {"location_index": 3, "arrival_time": 200}]
+
+
+def test_started_steps_stay_fixed():
+    # 250'de araç 2'ye gidiyor: yeni durak ancak 2'den sonra
+    insertion = insert(plan(), now=250)
+    assert insertion.position == 3
+    assert insertion.arrival_time == 400
+
+
+def test_first_free_step():
+    route = plan()[0]
+    service = [0, 30, 30, 30]
+    assert first_free_step(route, service, 0, visited=0) == 0  # henüz çıkmadı
+    assert first_free_step(route, service, 0) == 1      # 0'da çıktı, 1'e gidiyor
+    assert first_free_step(route, service, 50) == 1
+    assert first_free_step(route, service, 110) == 1    # 1'de hizmette
+    assert first_free_step(route, service, 150) == 2    # 2'ye gidiyor
+    assert first_free_step(route, service, 150, visited=1) == 1
+    assert first_free_step(route, service, 1000) == 2
+
+
+def test_reschedule_waits_for_step_window():
+    route = [
+        {"location_index": 0, "arrival_time": 0},
+        {"location_index": 3, "arrival_time": 200, "time_window": [400, 450]},
+        {"location_index": 2, "arrival_time": 300},
+    ]
+    travel = travel_times()
+    updated = reschedule(route, 1, travel, SERVICE, WORK_START, WORK_END)
+    assert [step["arrival_time"] for step in updated] == [0, 400, 500]
+    assert route[1]["arrival_time"] == 200  # girdi değişmez
+    assert route_is_feasible(updated, travel, SERVICE, WORK_START, WORK_END)
+    # 500'de 2'de, depoya 800'de döner
+    assert not route_is_feasible(updated, travel, SERVICE, WORK_START, 700)
+
+    updated[1]["time_window"] = [300, 350]
+    assert not route_is_feasible(updated, travel, SERVICE, WORK_START, WORK_END)
+
+
+def test_repair_route_removes_detour():
+    route = [
+        {"location_index": 0, "arrival_time": 0},
+        {"location_index": 2, "arrival_time": 300},
+        {"location_index": 1, "arrival_time": 500},
+        {"location_index": 3, "arrival_time": 600},
+    ]
+    travel = travel_times()
+    repaired = repair_route(route, 0, travel, SERVICE, WORK_START, WORK_END)
+    nodes = [step["location_index"] for step in repaired]
+    assert sorted(nodes) == [0, 1, 2, 3] and nodes[0] == 0
+    assert int(travel(nodes, nodes[1:] + [0]).sum()) == 600
+    assert route_is_feasible(repaired, travel, SERVICE, WORK_START, WORK_END)
+
+
+def test_set_arcs_override_matrix_and_estimate():
+    travel = PlanTravelTimes(LOCATIONS[:2], np.array([[0, 100], [100, 0]]), {0: 0, 1: 1}, SpeedModel())
+    new = travel.append_location("41.1,28.7")
+    estimated = travel([0], [new])[0]
+    assert estimated > 0
+    travel.set_arcs([0, new], [new, 0], [42, 43])
+    np.testing.assert_array_equal(travel([0, new, 0, 1], [new, 0, 1, 1]), [42, 43, 100, 0])
@@ -0,0 +1,83 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.services.matrix_cache import (
+    cache_paths, load_matrix, migrate_all_json_caches, migrate_json_cache, save_matrix
+)
+
+LOCATIONS = ["41.0,28.6", "41.01,28.61", "41.02,28.62"]
+
+
+def test_matrix_round_trip(tmp_path):
+    matrix = [[0, 120, 340], [115, 0, 90], [330, 95, 0]]
+    path = save_matrix(matrix, "Esenyurt", LOCATIONS, cache_dir=str(tmp_path))
+    assert path == cache_paths("esenyurt", str(tmp_path))[0]
+
+    loaded, meta = load_matrix("Esenyurt", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(loaded, matrix)
+    assert loaded.dtype == np.int32
+    assert loaded.flags.c_contiguous and not loaded.flags.writeable
+    assert isinstance(loaded, np.memmap)
+    assert meta["shape"] == [3, 3]
+    assert meta["locations"] == LOCATIONS
+    # Geçici dosya kalmaz
+    assert sorted(os.listdir(tmp_path)) == [
+        "esenyurt_distance_matrix.meta.json", "esenyurt_distance_matrix.npy", "esenyurt_distance_matrix.npy.lock"
+    ]
+
+
+def test_save_replaces_previous_matrix(tmp_path):
+    save_matrix(np.ones((3, 3)), "b", LOCATIONS, cache_dir=str(tmp_path))
+    save_matrix(np.full((2, 2), 7), "b", LOCATIONS[:2], cache_dir=str(tmp_path))
+    loaded, meta = load_matrix("b", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(loaded, np.full((2, 2), 7))
+    assert meta["locations"] == LOCATIONS[:2]
+
+
+def test_save_rejects_non_square(tmp_path):
+    with pytest.raises(ValueError):
+        save_matrix([[1, 2, 3], [4, 5, 6]], "b", cache_dir=str(tmp_path))
+    assert not os.path.exists(cache_paths("b", str(tmp_path))[0])
+
+
+def test_load_missing_and_mismatched_header(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_matrix("missing", cache_dir=str(tmp_path))
+
+    save_matrix(np.zeros((3, 3)), "b", cache_dir=str(tmp_path))
+    meta_path = cache_paths("b", str(tmp_path))[1]
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["shape"] = [4, 4]
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError):
+        load_matrix("b", cache_dir=str(tmp_path))
+
+
+def test_migrate_json_cache_records_no_locations(tmp_path):
+    matrix = [[0, 5, 9], [5, 0, 4], [9, 4, 0]]
+    with open(tmp_path / "b_distance_matrix.json", "w") as f:
+        json.dump(matrix, f)
+
+    assert migrate_json_cache("b", cache_dir=str(tmp_path)) == cache_paths("b", str(tmp_path))[0]
+    loaded, meta = load_matrix("b", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(loaded, matrix)
+    assert meta["locations"] is None
+    assert migrate_json_cache("other", cache_dir=str(tmp_path)) is None
+
+
+def test_migrate_all_skips_binary_caches(tmp_path):
+    for name in ("a", "b"):
+        with open(tmp_path / f"{name}_distance_matrix.json", "w") as f:
+            json.dump([[0, 1], [1, 0]], f)
+    save_matrix(np.full((3, 3), 7), "b", LOCATIONS, cache_dir=str(tmp_path))
+
+    assert migrate_all_json_caches(cache_dir=str(tmp_path)) == [cache_paths("a", str(tmp_path))[0]]
+    # Mevcut ikili önbellek JSON ile ezilmez
+    loaded, meta = load_matrix("b", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(loaded, np.full((3, 3), 7))
+    assert meta["locations"] == LOCATIONS
@@ -0,0 +1,50 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.utils import file_lock, load_orders, write_json_atomic
+
+CSV = """latitude,longtitude,order_count,total_desi,total_hj_desi,total_used_desi,address_line_1,status
+41.01,28.65,1,10,0,12.5,"Cad. 1, No: 2",success
+,28.65,1,10,0,3,Sok. 4,success
+41.02,28.66,2,20,0,7,"Uzun ""adres"", kat 3",failed
+0,0,1,1,0,1,Sok. 5,success
+41.03,28.67,1,5,0,-1,Sok. 6,success
+41.04,28.68,3,15,0,,Sok. 7,success
+"""
+
+
+def test_load_orders_validates_in_chunks(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    for chunksize in (2, 100):
+        orders = load_orders(str(path), chunksize=chunksize)
+        np.testing.assert_array_equal(orders.source_row, [0, 2, 5])
+        np.testing.assert_array_equal(orders.latitude, [41.01, 41.02, 41.04])
+        np.testing.assert_array_equal(orders.total_used_desi, [12.5, 7, 0])
+        np.testing.assert_array_equal(orders.order_count, [1, 2, 3])
+        assert orders.rejected.to_dict("list") == {
+            "row": [1, 3, 4],
+            "reason": ["missing latitude", "zero coordinates", "negative total_used_desi"],
+        }
+
+
+def test_locked_read_modify_write_loses_no_update(tmp_path):
+    path = str(tmp_path / "solution.json")
+    write_json_atomic(path, {"count": 0})
+
+    def increment(_):
+        with file_lock(path):
+            with open(path) as f:
+                data = json.load(f)
+            data["count"] += 1
+            write_json_atomic(path, data)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(increment, range(40)))
+    with open(path) as f:
+        assert json.load(f) == {"count": 40}
+    # Geçici dosya kalmaz; yalnızca çözüm ve kilit dosyası
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["solution.json", "solution.json.lock"]
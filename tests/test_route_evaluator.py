@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from app.services.route_evaluator import evaluate_plan, evaluate_routes, pad_routes
+
+# Düğümler bir doğru üzerinde: süre = konum farkı
+POSITIONS = np.array([0, 100, 300, 200])
+MATRIX = np.abs(POSITIONS[:, None] - POSITIONS[None, :])
+DEMANDS = [0, 4, 4, 2]
+SERVICE = [0, 10, 10, 10]
+WINDOWS = [[0, 1000], [0, 1000], [0, 1000], [250, 1000]]
+
+
+def evaluate(routes, windows=WINDOWS, capacity=10, **kwargs):
+    return evaluate_plan(routes, MATRIX, DEMANDS, SERVICE, windows, capacity, **kwargs)
+
+
+def test_schedule_with_window_wait():
+    totals, per_route = evaluate([[1, 3], [2]])
+    # 1'e 100, hizmet 110, 3'e 210'da varır ve 250'ye kadar bekler, 260 + 200 = 460'ta döner
+    assert per_route[0] == {
+        "travel": 400, "load": 6.0, "idle": 40, "start": 0, "end": 460,
+        "overrun": 0, "capacity_excess": 0.0, "window_lateness": 0, "late_stops": 0,
+    }
+    assert (per_route[1]["travel"], per_route[1]["end"]) == (600, 610)
+    assert totals["vehicles_used"] == 2
+    assert totals["travel_time"] == 1000
+    assert totals["total_time"] == 1070
+    assert totals["feasible"]
+
+
+def test_violations():
+    late = [row[:] for row in WINDOWS]
+    late[3] = [0, 200]
+    totals, per_route = evaluate([[1, 3], [2]], windows=late)
+    assert (per_route[0]["window_lateness"], per_route[0]["late_stops"]) == (10, 1)
+    assert not totals["feasible"]
+
+    totals, per_route = evaluate([[1, 3], [2]], capacity=5)
+    assert per_route[0]["capacity_excess"] == 1.0 and not totals["feasible"]
+
+    totals, _ = evaluate([[1, 3]])
+    assert totals["missing"] == 1 and not totals["feasible"]
+
+    totals, _ = evaluate([[1, 3], [2, 3]])
+    assert totals["duplicates"] == 1 and not totals["feasible"]
+
+    totals, per_route = evaluate([[1, 3], [2]], shift_end=500)
+    assert per_route[1]["overrun"] == 110 and totals["late_vehicles"] == 1
+
+
+def test_step_routes_leave_at_recorded_time():
+    steps = [
+        [{"location_index": 0, "arrival_time": 100}, {"location_index": 1, "arrival_time": 200},
+         {"location_index": 3, "arrival_time": 310}],
+        [{"location_index": 0, "arrival_time": 0}, {"location_index": 2, "arrival_time": 300}],
+    ]
+    _, per_route = evaluate(steps)
+    # Pencere 310'da zaten açık: bekleme yok
+    assert (per_route[0]["start"], per_route[0]["idle"], per_route[0]["end"]) == (100, 0, 520)
+
+
+def test_lunch_break_at_least_delaying_stop():
+    totals, per_route = evaluate([[1, 3]], lunch_break=(150, 180))
+    # Mola 1'de 150-180 arası; 3'teki pencere beklemesini karşılar, dönüş 460'tan 500'e kayar
+    assert (per_route[0]["idle"], per_route[0]["end"]) == (50, 500)
+
+    # Rota mola bitmeden döner: mola rota dışında
+    _, per_route = evaluate([[1]], lunch_break=(300, 330))
+    assert (per_route[0]["idle"], per_route[0]["end"]) == (0, 210)
+
+
+def test_batch_matches_single_plans():
+    route_sets = [[[1, 3], [2]], [[3, 1, 2]], [[2, 1], [], [3]]]
+    evaluation = evaluate_routes(pad_routes(route_sets), MATRIX, DEMANDS, SERVICE, WINDOWS, 10)
+    batch_totals = evaluation.totals()
+    for b, routes in enumerate(route_sets):
+        totals, _ = evaluate(routes)
+        for key, value in totals.items():
+            assert batch_totals[key][b] == pytest.approx(value), key
+
+
+def test_padding_is_free():
+    nodes = pad_routes([[[1], [2, 3]]])
+    assert nodes.shape == (1, 2, 4)
+    np.testing.assert_array_equal(nodes[0], [[0, 1, 0, 0], [0, 2, 3, 0]])
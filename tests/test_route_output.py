@@ -0,0 +1,86 @@
+import csv
+
+import numpy as np
+import pytest
+
+from app.services.route_output import ROUTE_COLUMNS, RouteTableWriter, matrix_nodes, write_route_table
+from app.services.vrp_solver import SearchOptions, solve_vrp_with_time_windows
+
+MATRIX = np.array([[0, 100, 300], [100, 0, 200], [300, 200, 0]])
+ROUTES = [
+    [{"location_index": 0, "arrival_time": 28800}, {"location_index": 1, "arrival_time": 28900},
+     {"location_index": 2, "arrival_time": 29110}],
+    [{"location_index": 0, "arrival_time": 30000}, {"location_index": 3, "stop_index": 2, "arrival_time": 30300}],
+]
+DEMANDS, SERVICE_TIMES = [0, 4, 5, 6], [0, 10, 20, 30]
+
+
+def test_csv_route_table(tmp_path):
+    path = write_route_table(
+        str(tmp_path / "b_routes"), "B", ROUTES, [matrix_nodes(route) for route in ROUTES], MATRIX,
+        DEMANDS, SERVICE_TIMES,
+    )
+    assert path.endswith("b_routes.csv")
+
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ROUTE_COLUMNS
+    assert "arrival_time (sec)" in ROUTE_COLUMNS
+
+    first = [row for row in rows if row["vehicle_id"] == "0"]
+    assert [row["location_index"] for row in first] == ["0", "1", "2", "0"]
+    assert [row["leg_duration"] for row in first] == ["0", "100", "200", "300"]
+    # Depoya dönüş: 29110 + 20 servis + 300 yol
+    assert [row["arrival_time (sec)"] for row in first] == ["28800", "28900", "29110", "29430"]
+    assert first[-1]["cumulative_time"] == "630"
+    assert [float(row["load"]) for row in first] == [0, 4, 9, 9]
+
+    # Birleştirilmiş durağın siparişi, durağın matris düğümüyle yazılır
+    second = [row for row in rows if row["vehicle_id"] == "1"]
+    assert [row["leg_duration"] for row in second] == ["0", "300", "300"]
+
+
+def test_routes_stream_from_solution_extraction(tmp_path):
+    matrix = np.array([[0, 100, 300, 200], [100, 0, 200, 100], [300, 200, 0, 100], [200, 100, 100, 0]])
+    service_times = [0, 60, 60, 60]
+    with RouteTableWriter(str(tmp_path / "streamed")) as writer:
+        result = solve_vrp_with_time_windows(
+            matrix.tolist(), service_times, 2, 2, [0, 1, 1, 1], 0, [[0, 5000]] * 4, [],
+            search=SearchOptions(time_limit=1),
+            on_route=lambda route: writer.write_route("B", route, matrix, [0, 1, 1, 1], service_times),
+        )
+    assert writer.route_count == len(result["routes"]) == 2
+    batch = write_route_table(
+        str(tmp_path / "batch"), "B", result["routes"], [matrix_nodes(route) for route in result["routes"]],
+        matrix, [0, 1, 1, 1], service_times,
+    )
+    with open(writer.path) as streamed, open(batch) as written:
+        assert streamed.read() == written.read()
+
+
+def test_discarded_table_keeps_previous_file(tmp_path):
+    path = write_route_table(str(tmp_path / "b_routes"), "B", ROUTES[:1], [[0, 1, 2]], MATRIX, DEMANDS, SERVICE_TIMES)
+    with open(path) as f:
+        previous = f.read()
+    with pytest.raises(RuntimeError):
+        with RouteTableWriter(str(tmp_path / "b_routes")) as writer:
+            writer.write_route("B", ROUTES[1], MATRIX, DEMANDS, SERVICE_TIMES)
+            raise RuntimeError("solve failed")
+    with open(path) as f:
+        assert f.read() == previous
+    assert [p.name for p in tmp_path.iterdir()] == ["b_routes.csv"]
+
+
+def test_parquet_route_table(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = write_route_table(
+        str(tmp_path / "b_routes"), "B", ROUTES, [matrix_nodes(route) for route in ROUTES], MATRIX,
+        DEMANDS, SERVICE_TIMES, file_format="parquet",
+    )
+    assert path.endswith("b_routes.parquet")
+    parquet = pq.ParquetFile(path)
+    assert parquet.schema_arrow.names == ROUTE_COLUMNS
+    assert parquet.num_row_groups == len(ROUTES)  # araç başına bir satır grubu
+    table = parquet.read().to_pydict()
+    assert table["leg_duration"] == [0, 100, 200, 300, 0, 300, 300]
+    assert table["load"] == [0, 4, 9, 9, 0, 6, 6]
@@ -0,0 +1,45 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.distance_fetcher import next_departure_time
+from app.services.matrix_cache import load_tensor, save_tensor, slice_index, tensor_paths
+
+LOCATIONS = ["41.0,28.6", "41.01,28.61", "41.02,28.62"]
+
+
+def test_tensor_round_trip(tmp_path):
+    starts = [28800, 36000, 43200]
+    slices = [np.full((3, 3), 10 * (i + 1)) for i in range(len(starts))]
+    save_tensor(iter(slices), "b", starts, LOCATIONS, cache_dir=str(tmp_path))
+
+    tensor, meta = load_tensor("b", cache_dir=str(tmp_path))
+    assert tensor.shape == (3, 3, 3) and tensor.dtype == np.int32
+    np.testing.assert_array_equal(tensor, np.stack(slices))
+    assert meta["slice_starts"] == starts
+    assert meta["locations"] == LOCATIONS
+
+
+def test_tensor_with_missing_slices_is_not_saved(tmp_path):
+    with pytest.raises(ValueError):
+        save_tensor([np.zeros((3, 3))], "b", [0, 3600], cache_dir=str(tmp_path))
+    assert not os.path.exists(tensor_paths("b", str(tmp_path))[0])
+    assert [name for name in os.listdir(tmp_path) if not name.endswith(".lock")] == []
+
+
+def test_slice_index_clamps_to_first_and_last_slice():
+    starts = [28800, 36000, 43200]
+    assert slice_index(starts, 0) == 0
+    assert slice_index(starts, 28800) == 0
+    assert slice_index(starts, 40000) == 1
+    assert slice_index(starts, 90000) == 2
+
+
+def test_next_departure_is_the_coming_occurrence():
+    now = datetime(2026, 3, 2, 9, 30).timestamp()
+    assert datetime.fromtimestamp(next_departure_time(10 * 3600, now)) == datetime(2026, 3, 2, 10, 0)
+    # 08:00 geçti: ertesi gün
+    assert datetime.fromtimestamp(next_departure_time(8 * 3600, now)) == datetime(2026, 3, 3, 8, 0)
+    assert datetime.fromtimestamp(next_departure_time(9 * 3600 + 1800, now)) == datetime(2026, 3, 3, 9, 30)
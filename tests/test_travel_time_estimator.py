@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from app.services.matrix_cache import save_matrix
+from app.services.travel_time_estimator import (
+    SPEED_MODEL_FILE, SpeedModel, calibrate_speed_model, estimate_distance_matrix, haversine_matrix, parse_locations
+)
+
+LOCATIONS = [f"41.{i:02d},28.{3 * i:02d}" for i in range(6)]
+
+
+def test_too_few_samples_are_not_saved(tmp_path):
+    # Lokasyonsuz (eski JSON'dan taşınmış) cache kalibrasyona girmez
+    save_matrix(np.full((6, 6), 500), "legacy", None, str(tmp_path))
+    model = calibrate_speed_model(str(tmp_path))
+    assert model.samples == 0
+    assert not os.path.exists(tmp_path / SPEED_MODEL_FILE)
+
+
+def test_fit_on_cache_with_locations_is_saved(tmp_path):
+    meters = haversine_matrix(*parse_locations(LOCATIONS))
+    matrix = np.rint(meters * 0.1 + 30).astype(np.int32)
+    np.fill_diagonal(matrix, 0)
+    save_matrix(matrix, "b", LOCATIONS, str(tmp_path))
+
+    model = calibrate_speed_model(str(tmp_path))
+    assert model.samples == 30
+    assert abs(model.seconds_per_meter - 0.1) < 1e-3 and abs(model.intercept - 30) < 1
+    assert os.path.exists(tmp_path / SPEED_MODEL_FILE)
+
+
+def test_estimate_matrix_matches_model():
+    model = SpeedModel(60, 0.144)
+    matrix = estimate_distance_matrix(LOCATIONS, model)
+    meters = haversine_matrix(*parse_locations(LOCATIONS))
+    expected = np.where(meters > 0, np.rint(60 + 0.144 * meters), 0)
+    assert matrix.dtype == np.int32 and matrix.flags.c_contiguous
+    np.testing.assert_allclose(matrix, expected, atol=1)
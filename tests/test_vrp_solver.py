@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+from ortools.constraint_solver import pywrapcp
+
+from app.services.metrics import MetricsRecorder
+from app.services.vrp_solver import (
+    ImprovementMonitor, SearchOptions, SearchProgressMonitor, break_slack, build_demand_vector,
+    build_time_window_model, build_transit_matrix, make_search_parameters, periodic_checks,
+    solve_vrp_with_time_windows
+)
+
+# Düğümler bir doğru üzerinde: süre = konum farkı
+POSITIONS = np.array([0, 100, 200, 300])
+MATRIX = np.abs(POSITIONS[:, None] - POSITIONS[None, :]).tolist()
+
+
+def solve(vehicle_count, vehicle_capacity, service_times, time_windows, lunch_breaks=(), **kwargs):
+    return solve_vrp_with_time_windows(
+        distance_matrix=MATRIX,
+        service_times=service_times,
+        vehicle_count=vehicle_count,
+        vehicle_capacity=vehicle_capacity,
+        order_demands=[0, 1, 1, 1],
+        depot_index=0,
+        time_windows=time_windows,
+        lunch_breaks=list(lunch_breaks),
+        search=SearchOptions(time_limit=1),
+        **kwargs
+    )
+
+
+def test_every_vehicle_leaves_within_depot_window():
+    # Kapasite 2: üç durak için iki araç gerekir; ikisi de 1000'den önce çıkamaz
+    windows = [[1000, 5000]] + [[0, 5000]] * 3
+    result = solve(3, 2, [0, 60, 60, 60], windows, bound_starts=True)
+    assert result["status"] == "OK"
+    assert len(result["routes"]) >= 2
+    for route in result["routes"]:
+        assert route[0]["arrival_time"] >= 1000
+        assert all(step["arrival_time"] >= 1000 for step in route)
+
+
+def baseline_objective(service_times, time_windows, vehicle_count, vehicle_capacity):
+    # Depo penceresi düğüm indeksiyle verilir (yalnızca ilk aracın çıkışı sınırlanır)
+    manager = pywrapcp.RoutingIndexManager(len(MATRIX), vehicle_count, 0)
+    routing = pywrapcp.RoutingModel(manager)
+    transit = routing.RegisterTransitMatrix(build_transit_matrix(MATRIX, service_times))
+    routing.SetArcCostEvaluatorOfAllVehicles(transit)
+    routing.AddDimension(transit, 300, 72000, False, "Time")
+    time_dimension = routing.GetDimensionOrDie("Time")
+    for node, (start, end) in enumerate(time_windows):
+        time_dimension.CumulVar(manager.NodeToIndex(node)).SetRange(start, end)
+    demand = routing.RegisterUnaryTransitVector([0, 1, 1, 1])
+    routing.AddDimensionWithVehicleCapacity(demand, 0, [vehicle_capacity] * vehicle_count, True, "Capacity")
+    solution = routing.SolveWithParameters(make_search_parameters(time_limit=1))
+    return solution.ObjectiveValue() if solution else None
+
+
+def test_default_solve_keeps_unbounded_starts():
+    # Durak 3 en geç 1150'de: 1000'den önce çıkamayan araç ona yetişemez
+    windows = [[1000, 5000], [0, 5000], [0, 5000], [0, 1150]]
+    service = [0, 60, 60, 60]
+    manager, routing, time_dimension = build_time_window_model(MATRIX, service, 3, 2, [0, 1, 1, 1], 0, windows)
+    starts = [time_dimension.CumulVar(routing.Start(v)).Min() for v in range(3)]
+    assert starts == [1000, 0, 0]
+
+    solution = routing.SolveWithParameters(make_search_parameters(time_limit=1))
+    assert solution.ObjectiveValue() == baseline_objective(service, windows, 3, 2)
+    assert solve(3, 2, service, windows)["status"] == "OK"
+    assert solve(3, 2, service, windows, bound_starts=True)["status"] == "No solution found"
+
+
+def test_lunch_break_delays_route_between_services():
+    windows = [[0, 20000]] * 4
+    service = [0, 200, 200, 200]
+    plain = solve(1, 10, service, windows)
+    with_break = solve(1, 10, service, windows, [(300, 400)])
+    assert plain["status"] == with_break["status"] == "OK"
+
+    def last_arrival(result):
+        route = result["routes"][0]
+        return route[-1]["arrival_time"] - route[0]["arrival_time"]
+
+    # 1 -> 2 -> 3: hizmetler 100-300, 400-600, 700-900; mola (100 s, 300-400 arasında başlar)
+    # hizmeti bölemez, ancak iki ziyaret arasına girer
+    assert last_arrival(plain) == 700
+    assert last_arrival(with_break) >= 800
+
+
+def test_break_slack_holds_longest_break():
+    assert break_slack([]) == 300
+    assert break_slack([None, (43200, 46800)]) == 3600
+    assert break_slack([(100, 200)]) == 300
+
+
+def test_transit_matrix_folds_service_time_into_outgoing_arcs():
+    matrix = np.asarray(MATRIX, dtype=np.int32)
+    transit = build_transit_matrix(matrix, [0, 60, 60, 60])
+    assert transit[1][2] == 160 and transit[2][1] == 160 and transit[0][1] == 100
+    assert all(type(value) is int for row in transit for value in row)
+    assert build_transit_matrix(matrix) == MATRIX
+
+
+def test_demand_vector_rounds_up():
+    assert build_demand_vector([0, 1.2, 3, 2.0001]) == [0, 2, 3, 3]
+
+
+class StalledRouting:
+    """Routing stand-in for a search that finds no further solutions."""
+
+    def __init__(self):
+        self.cancelled = 0
+
+    def solver(self):
+        return self
+
+    def Branches(self):
+        return 0
+
+    def Failures(self):
+        return 0
+
+    def CancelSearch(self):
+        self.cancelled += 1
+
+
+def test_progress_is_sampled_while_no_solution_is_found():
+    metrics = MetricsRecorder()
+    progress = SearchProgressMonitor(StalledRouting(), metrics, interval=0.05)
+    with periodic_checks([progress.tick], 0.01):
+        time.sleep(0.3)
+    assert len(metrics.progress) >= 3
+
+
+def test_plateau_stops_search_without_new_solutions():
+    routing = StalledRouting()
+    monitor = ImprovementMonitor(routing, None, None, 1, plateau_window=0.1)
+    monitor.best, monitor.history = 100, [(0.0, 100)]
+    with periodic_checks([monitor.tick], 0.01):
+        time.sleep(0.3)
+    assert routing.cancelled == 1